@@ -0,0 +1,133 @@
+"""
+API调用引擎
+每次请求在echo后追加唯一编号，并登记一个等待响应的future
+收到echo匹配的响应时直接完成对应的future，调用方await即可拿到响应，无需广播给所有模块
+"""
+
+import time
+import asyncio
+import itertools
+import logger
+from utils.metrics import metrics
+from config import API_TIMEOUT
+from api.send_scheduler import send_scheduler, get_send_target
+from api.writer import get_writer
+
+# echo前缀与请求编号之间的分隔符
+ECHO_SEQ_SEPARATOR = "#"
+
+# 请求编号
+_seq = itertools.count(1)
+
+# 等待响应的请求，echo -> future
+_pending = {}
+
+# 有请求在等待响应时处于set状态
+_has_pending = asyncio.Event()
+
+metrics.register_gauge("api_pending_calls", lambda: len(_pending))
+
+
+async def call_api(
+    websocket, action, params=None, echo=None, timeout=API_TIMEOUT, priority=None
+):
+    """
+    调用OneBot API并等待响应
+
+    Args:
+        websocket: WebSocket连接对象
+        action (str): API名称
+        params (dict, optional): API参数
+        echo (str, optional): echo前缀，默认为action，实际发送的echo会追加"#请求编号"
+            如需自动撤回等功能依赖echo中的标识，请放在这里，如 "send_group_msg-del_msg=10"
+        timeout (float, optional): 超时时间，单位：秒，包括在发送调度器中排队限速的时间
+        priority (int, optional): 发送消息类请求的优先级，见api.send_scheduler，
+            默认发给管理员的私聊为高优先级，其余为普通优先级
+
+    Returns:
+        dict: 响应内容，格式为 {"status": ..., "retcode": ..., "data": ..., "echo": ...}
+        None: 等待响应超时
+
+    Raises:
+        Exception: 发送请求失败或连接断开
+    """
+    echo = f"{echo or action}{ECHO_SEQ_SEPARATOR}{next(_seq)}"
+    payload = {"action": action, "params": params or {}, "echo": echo}
+
+    future = asyncio.get_running_loop().create_future()
+    _pending[echo] = future
+    _has_pending.set()
+    metrics.inc("api_calls_total", action=action)
+    # 排队发送和等待响应共用一个截止时间
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        target = get_send_target(action, params)
+        if target is None:
+            send = get_writer(websocket).send(payload)
+        else:
+            # 发送消息类请求经过调度器限速后再写入，超时取消时调度器不再发送
+            send = send_scheduler.submit(websocket, payload, target, priority)
+        await asyncio.wait_for(send, timeout)
+        start_time = time.monotonic()
+        remaining = None if deadline is None else max(0, deadline - start_time)
+        response = await asyncio.wait_for(future, remaining)
+        elapsed = time.monotonic() - start_time
+        metrics.observe("api_call_seconds", elapsed, action=action)
+        logger.debug(f"[API]{action} 响应耗时 {elapsed * 1000:.1f}ms")
+        return response
+    except asyncio.TimeoutError:
+        metrics.inc("api_errors_total", action=action, reason="timeout")
+        logger.warning(f"[API]{action} 等待响应超时（{timeout}秒），echo: {echo}")
+        return None
+    except Exception:
+        metrics.inc("api_errors_total", action=action, reason="error")
+        raise
+    finally:
+        _pending.pop(echo, None)
+        if not _pending:
+            _has_pending.clear()
+
+
+def resolve_response(msg):
+    """
+    用收到的响应完成对应请求的future
+
+    Returns:
+        bool: 该响应是否属于call_api发出的请求
+    """
+    echo = msg.get("echo")
+    if not isinstance(echo, str):
+        return False
+    future = _pending.pop(echo, None)
+    if future is None:
+        return False
+    if not _pending:
+        _has_pending.clear()
+    if not future.done():
+        future.set_result(msg)
+    return True
+
+
+def has_pending_calls():
+    """
+    是否有请求在等待响应
+    """
+    return bool(_pending)
+
+
+async def wait_for_pending_calls():
+    """
+    等待直到有请求在等待响应
+    """
+    await _has_pending.wait()
+
+
+def fail_pending_calls(reason="连接已断开"):
+    """
+    连接断开时让所有等待中的请求立即失败，避免等待到超时
+    """
+    for future in _pending.values():
+        if not future.done():
+            future.set_exception(ConnectionError(reason))
+    _pending.clear()
+    _has_pending.clear()
@@ -1,5 +1,5 @@
-import json
 import logger
+from api.engine import call_api
 
 
 async def set_group_kick_members(
@@ -16,11 +16,7 @@ async def set_group_kick_members(
         note (str, optional): 附加说明，用于在响应处理中获取结果
 
     Returns:
-        bool: 操作是否成功，True表示成功，False表示失败
-
-    Note:
-        此函数通过WebSocket发送API请求到上游，由于WebSocket的特殊性，
-        无法直接获取响应结果，需要通过echo字段在响应处理中获取结果
+        dict: 响应内容，超时返回None，发送失败返回False
     """
     try:
         payload = {
@@ -32,9 +28,9 @@ async def set_group_kick_members(
             },
             "echo": f"set_group_kick_members-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行批量踢出群成员")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]批量踢出群成员失败: {e}")
         return False
@@ -53,11 +49,7 @@ async def set_group_kick(
         reject_add_request (bool, optional): 是否拒绝此人的加群请求，默认为False
 
     Returns:
-        bool: 操作是否成功，True表示成功，False表示失败
-
-    Note:
-        此函数通过WebSocket发送API请求到上游，由于WebSocket的特殊性，
-        无法直接获取响应结果，需要通过echo字段在响应处理中获取结果
+        dict: 响应内容，超时返回None，发送失败返回False
     """
     try:
         payload = {
@@ -69,9 +61,9 @@ async def set_group_kick(
             },
             "echo": "set_group_kick",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群踢人")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群踢人失败: {e}")
         return False
@@ -87,9 +79,9 @@ async def set_group_ban(websocket, group_id, user_id, duration):
             "params": {"group_id": group_id, "user_id": user_id, "duration": duration},
             "echo": "set_group_ban",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行群禁言")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]群禁言失败: {e}")
         return False
@@ -105,9 +97,9 @@ async def get_group_system_msg(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_system_msg",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群系统消息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群系统消息失败: {e}")
         return False
@@ -123,9 +115,9 @@ async def get_essence_msg_list(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_essence_msg_list",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取精华消息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取精华消息失败: {e}")
         return False
@@ -141,9 +133,9 @@ async def set_group_whole_ban(websocket, group_id, enable):
             "params": {"group_id": group_id, "enable": enable},
             "echo": "set_group_whole_ban",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行全体禁言")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]全体禁言失败: {e}")
         return False
@@ -159,9 +151,9 @@ async def set_group_portrait(websocket, group_id, file_path):
             "params": {"group_id": group_id, "file_path": file_path},
             "echo": "set_group_portrait",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群头像")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群头像失败: {e}")
         return False
@@ -177,9 +169,9 @@ async def set_group_admin(websocket, group_id, user_id, enable):
             "params": {"group_id": group_id, "user_id": user_id, "enable": enable},
             "echo": "set_group_admin",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群管理")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群管理失败: {e}")
         return False
@@ -195,9 +187,9 @@ async def set_group_essence_msg(websocket, group_id, message_id):
             "params": {"group_id": group_id, "message_id": message_id},
             "echo": "set_group_essence_msg",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群精华消息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群精华消息失败: {e}")
         return False
@@ -213,9 +205,9 @@ async def set_group_card(websocket, group_id, user_id, card):
             "params": {"group_id": group_id, "user_id": user_id, "card": card},
             "echo": "set_group_card",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群成员名片")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群成员名片失败: {e}")
         return False
@@ -231,9 +223,9 @@ async def delete_group_essence_msg(websocket, group_id, message_id):
             "params": {"group_id": group_id, "message_id": message_id},
             "echo": "delete_group_essence_msg",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行删除群精华消息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]删除群精华消息失败: {e}")
         return False
@@ -249,9 +241,9 @@ async def set_group_name(websocket, group_id, group_name):
             "params": {"group_id": group_id, "group_name": group_name},
             "echo": "set_group_name",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群名")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群名失败: {e}")
         return False
@@ -267,9 +259,9 @@ async def set_group_leave(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "set_group_leave",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行退群")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]退群失败: {e}")
         return False
@@ -289,9 +281,9 @@ async def _send_group_notice(websocket, group_id, content, image_path):
             },
             "echo": "_send_group_notice",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行发送群公告")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]发送群公告失败: {e}")
         return False
@@ -307,9 +299,9 @@ async def _get_group_notice(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "_get_group_notice",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群公告")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群公告失败: {e}")
         return False
@@ -329,9 +321,9 @@ async def set_group_special_title(websocket, group_id, user_id, special_title):
             },
             "echo": "set_group_special_title",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群头衔")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群头衔失败: {e}")
         return False
@@ -352,9 +344,9 @@ async def upload_group_file(websocket, group_id, file, name, folder_id):
             },
             "echo": "upload_group_file",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行上传群文件")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]上传群文件失败: {e}")
         return False
@@ -371,7 +363,7 @@ async def set_group_add_request(websocket, flag, approve, reason=""):
         reason (str): 拒绝理由,当approve为False时生效
 
     返回:
-        bool: 操作是否成功
+        dict: 响应内容，超时返回None，发送失败返回False
     """
     try:
         payload = {
@@ -379,9 +371,9 @@ async def set_group_add_request(websocket, flag, approve, reason=""):
             "params": {"flag": flag, "approve": approve, "reason": reason},
             "echo": "set_group_add_request",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行处理加群请求")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]处理加群请求失败: {e}")
         return False
@@ -394,21 +386,19 @@ async def get_group_info(websocket, group_id):
         websocket: WebSocket连接对象
         group_id (int/str): 群号，必填
     返回:
-        bool: 操作是否成功（仅表示API是否发送成功，具体响应需通过echo处理）
-    特别注意:
-        由于WebSocket的特殊性，无法一对一获取相应信息，需通过echo字段处理响应
+        dict: 响应内容，群信息在data字段中，超时返回None，发送失败返回False
     """
     try:
-        # 构造请求payload，action为get_group_info，params包含group_id，echo用于后续响应识别
+        # 构造请求payload，action为get_group_info，params包含group_id
         payload = {
             "action": "get_group_info",
             "params": {"group_id": group_id},
             "echo": "get_group_info",
         }
-        # 发送请求到上游WebSocket
-        await websocket.send(json.dumps(payload))
+        # 发送请求到上游WebSocket并等待响应
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群信息")
-        return True
+        return response
     except Exception as e:
         # 捕获异常并记录错误日志
         logger.error(f"[API]获取群信息失败: {e}")
@@ -425,9 +415,9 @@ async def get_group_info_ex(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_info_ex",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群信息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群信息失败: {e}")
         return False
@@ -443,9 +433,9 @@ async def create_group_file_folder(websocket, group_id, folder_name):
             "params": {"group_id": group_id, "folder_name": folder_name},
             "echo": "create_group_file_folder",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行创建群文件夹")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]创建群文件夹失败: {e}")
         return False
@@ -461,9 +451,9 @@ async def delete_group_file(websocket, group_id, file_id):
             "params": {"group_id": group_id, "file_id": file_id},
             "echo": "delete_group_file",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行删除群文件")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]删除群文件失败: {e}")
         return False
@@ -479,9 +469,9 @@ async def delete_group_folder(websocket, group_id, folder_id):
             "params": {"group_id": group_id, "folder_id": folder_id},
             "echo": "delete_group_folder",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行删除群文件夹")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]删除群文件夹失败: {e}")
         return False
@@ -497,9 +487,9 @@ async def get_group_file_system_info(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_file_system_info",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群文件系统信息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群文件系统信息失败: {e}")
         return False
@@ -515,9 +505,9 @@ async def get_group_root_files(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_root_files",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群根目录文件列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群根目录文件列表失败: {e}")
         return False
@@ -537,9 +527,9 @@ async def get_group_files_by_folder(websocket, group_id, folder_id, file_count):
             },
             "echo": "get_group_files_by_folder",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群子目录文件列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群子目录文件列表失败: {e}")
         return False
@@ -555,9 +545,9 @@ async def get_group_file_url(websocket, group_id, file_id):
             "params": {"group_id": group_id, "file_id": file_id},
             "echo": "get_group_file_url",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群文件资源链接")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群文件资源链接失败: {e}")
         return False
@@ -573,9 +563,9 @@ async def get_group_list(websocket, no_cache):
             "params": {"no_cache": no_cache},
             "echo": "get_group_list",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群列表失败: {e}")
         return False
@@ -591,9 +581,9 @@ async def get_group_member_info(websocket, group_id, user_id, no_cache):
             "params": {"group_id": group_id, "user_id": user_id, "no_cache": no_cache},
             "echo": "get_group_member_info",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群成员信息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群成员信息失败: {e}")
         return False
@@ -609,7 +599,7 @@ async def get_group_member_list(websocket, group_id, no_cache=False, note=""):
         no_cache (bool): 是否不使用缓存,可选
         note (str): 附加说明，用于在响应处理中获取结果
     返回:
-        bool: 操作是否成功
+        dict: 响应内容，超时返回None，发送失败返回False
     """
     try:
         payload = {
@@ -617,9 +607,9 @@ async def get_group_member_list(websocket, group_id, no_cache=False, note=""):
             "params": {"group_id": group_id, "no_cache": no_cache},
             "echo": f"get_group_member_list-group_id={group_id}-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群 {group_id} 成员列表，note={note}")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群成员列表失败: {e}")
         return False
@@ -635,9 +625,9 @@ async def get_group_honor_info(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_honor_info",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群荣誉信息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群荣誉信息失败: {e}")
         return False
@@ -653,9 +643,9 @@ async def get_group_at_all_remain(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_at_all_remain",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群at剩余次数")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群at剩余次数失败: {e}")
         return False
@@ -671,9 +661,9 @@ async def get_group_ignored_notifies(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "get_group_ignored_notifies",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群过滤系统消息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群被禁言成员列表失败: {e}")
         return False
@@ -689,9 +679,9 @@ async def set_group_sign(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "set_group_sign",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群打卡")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置群打卡失败: {e}")
         return False
@@ -707,9 +697,9 @@ async def send_group_sign(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "send_group_sign",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行发送群打卡")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]发送群打卡失败: {e}")
         return False
@@ -725,9 +715,9 @@ async def get_ai_characters(websocket, group_id, chat_type):
             "params": {"group_id": group_id, "chat_type": chat_type},
             "echo": "get_ai_characters",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取ai语音人物")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取ai语音人物失败: {e}")
         return False
@@ -747,9 +737,9 @@ async def send_group_ai_record(websocket, group_id, character_id, text):
             },
             "echo": "send_group_ai_record",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行发送群ai语音")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]发送群ai语音失败: {e}")
         return False
@@ -765,9 +755,9 @@ async def get_ai_record(websocket, group_id, character, text):
             "params": {"group_id": group_id, "character": character, "text": text},
             "echo": "get_ai_record",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取ai语音")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取群ai语音失败: {e}")
         return False
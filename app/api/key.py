@@ -1,5 +1,5 @@
-import json
 import logger
+from api.engine import call_api
 
 
 async def nc_get_rkey(websocket):
@@ -8,9 +8,9 @@ async def nc_get_rkey(websocket):
     """
     try:
         payload = {"action": "nc_get_rkey", "params": {}, "echo": "nc_get_rkey"}
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行nc获取rkey")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]nc获取rkey失败: {e}")
         return False
@@ -1,10 +1,10 @@
 import asyncio
-import json
 import logger
+from api.engine import call_api
 
 
 # 使用cq码发送群消息
-async def send_group_msg_with_cq(websocket, group_id, content, note=""):
+async def send_group_msg_with_cq(websocket, group_id, content, note="", priority=None):
     """
     发送群消息，使用旧的消息格式（cq码）
     如需自动撤回，请在note参数中添加"del_msg=秒数"
@@ -22,14 +22,15 @@ async def send_group_msg_with_cq(websocket, group_id, content, note=""):
             "params": {"group_id": group_id, "message": content},
             "echo": f"send_group_msg-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload, priority=priority)
         logger.info(f"[API]已执行发送群消息到群 {group_id}")
+        return response
     except Exception as e:
         logger.error(f"[API]执行发送群消息失败: {e}")
 
 
 # 使用cq码发送私聊消息
-async def send_private_msg_with_cq(websocket, user_id, content, note=""):
+async def send_private_msg_with_cq(websocket, user_id, content, note="", priority=None):
     """
     发送私聊消息，使用旧的消息格式（cq码）
     如需自动撤回，请在note参数中添加"del_msg=秒数"
@@ -47,13 +48,14 @@ async def send_private_msg_with_cq(websocket, user_id, content, note=""):
             "params": {"user_id": user_id, "message": content},
             "echo": f"send_private_msg-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload, priority=priority)
         logger.info(f"[API]已执行发送消息到用户 {user_id}")
+        return response
     except Exception as e:
         logger.error(f"[API]执行发送消息失败: {e}")
 
 
-async def send_group_msg(websocket, group_id, message, note=""):
+async def send_group_msg(websocket, group_id, message, note="", priority=None):
     """
     发送群聊消息，使用新的消息格式（消息段）
 
@@ -66,12 +68,10 @@ async def send_group_msg(websocket, group_id, message, note=""):
             - list: 消息段列表，包含多个消息段对象
         note (str, optional): 附加说明，支持以下功能：
             - "del_msg=秒数": 自动撤回消息，如 "del_msg=10" 表示10秒后撤回
+        priority (int, optional): 发送优先级，见api.send_scheduler，广播等批量发送建议使用PRIORITY_LOW
 
     Returns:
-        None
-
-    Raises:
-        Exception: 发送消息失败时抛出异常
+        dict: 响应内容，发送成功时data中包含message_id，超时或发送失败返回None
 
     Examples:
         # 发送纯文本消息
@@ -121,13 +121,14 @@ async def send_group_msg(websocket, group_id, message, note=""):
             },
             "echo": f"send_group_msg-{note}",
         }
-        await websocket.send(json.dumps(message_data))
+        response = await call_api(websocket, **message_data, priority=priority)
         logger.info(f"[API]已执行发送群聊消息到群 {group_id}")
+        return response
     except Exception as e:
         logger.error(f"[API]执行发送群聊消息失败: {e}")
 
 
-async def send_private_msg(websocket, user_id, message, note=""):
+async def send_private_msg(websocket, user_id, message, note="", priority=None):
     """
     发送私聊消息，使用新的消息格式（消息段）
     {
@@ -170,8 +171,9 @@ async def send_private_msg(websocket, user_id, message, note=""):
             "params": {"user_id": user_id, "message": message},
             "echo": f"send_private_msg-{note}",
         }
-        await websocket.send(json.dumps(message_data))
+        response = await call_api(websocket, **message_data, priority=priority)
         logger.info(f"[API]已执行发送私聊消息到用户 {user_id}")
+        return response
     except Exception as e:
         logger.error(f"[API]执行发送私聊消息失败: {e}")
 
@@ -186,8 +188,9 @@ async def mark_group_msg_as_read(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "mark_group_msg_as_read",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置群聊消息已读")
+        return response
     except Exception as e:
         logger.error(f"[API]执行设置群聊消息已读失败: {e}")
 
@@ -202,8 +205,9 @@ async def mark_private_msg_as_read(websocket, user_id):
             "params": {"user_id": user_id},
             "echo": "mark_private_msg_as_read",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置私聊消息已读")
+        return response
     except Exception as e:
         logger.error(f"[API]执行设置私聊消息已读失败: {e}")
 
@@ -214,8 +218,9 @@ async def _mark_all_as_read(websocket):
     """
     try:
         payload = {"action": "_mark_all_as_read", "echo": "_mark_all_as_read"}
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置所有消息已读")
+        return response
     except Exception as e:
         logger.error(f"[API]执行设置所有消息已读失败: {e}")
 
@@ -230,8 +235,9 @@ async def delete_msg(websocket, message_id):
             "params": {"message_id": message_id},
             "echo": "delete_msg",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行撤回消息：{message_id}")
+        return response
     except Exception as e:
         logger.error(f"[API]执行撤回消息失败: {e}")
 
@@ -246,11 +252,7 @@ async def get_msg(websocket, message_id, note=""):
         note: str 备注，可选，用于在响应中标识请求的字段，默认空字符串
 
     返回:
-        无返回值，通过websocket发送请求
-
-    说明:
-        由于websocket的特殊性，无法一对一获取响应信息
-        需要在echo字段中添加标识信息，以便在处理响应时进行匹配
+        dict: 响应内容，消息详情在data字段中，超时或发送失败返回None
     """
     try:
         payload = {
@@ -258,8 +260,9 @@ async def get_msg(websocket, message_id, note=""):
             "params": {"message_id": message_id},
             "echo": f"get_msg-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取消息详情")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取消息详情失败: {e}")
 
@@ -274,8 +277,9 @@ async def get_image(websocket, file_id):
             "params": {"file_id": file_id},
             "echo": "get_image",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取图片消息详情")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取图片消息详情失败: {e}")
 
@@ -290,8 +294,9 @@ async def get_record(websocket, file, out_format):
             "params": {"file": file, "out_format": out_format},
             "echo": "get_record",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取语音消息详情")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取语音消息详情失败: {e}")
 
@@ -306,8 +311,9 @@ async def get_file(websocket, file_id):
             "params": {"file_id": file_id},
             "echo": "get_file",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取文件消息")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取文件消息失败: {e}")
 
@@ -325,7 +331,7 @@ async def get_group_msg_history(websocket, group_id, count=20, message_seq=0, no
         note: 备注信息，默认为空字符串
 
     Returns:
-        None: 该函数通过websocket发送请求，不直接返回结果
+        dict: 响应内容，超时或发送失败返回None
     """
     try:
         payload = {
@@ -338,8 +344,9 @@ async def get_group_msg_history(websocket, group_id, count=20, message_seq=0, no
             },
             "echo": f"get_group_msg_history-{group_id}-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取群历史消息")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取群历史消息失败: {e}")
 
@@ -354,8 +361,9 @@ async def set_msg_emoji_like(websocket, message_id, emoji_id, set):
             "params": {"message_id": message_id, "emoji_id": emoji_id, "set": set},
             "echo": "set_msg_emoji_like",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置消息表情点赞")
+        return response
     except Exception as e:
         logger.error(f"[API]执行设置消息表情点赞失败: {e}")
 
@@ -377,8 +385,9 @@ async def get_friend_msg_history(
             },
             "echo": "get_friend_msg_history",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取好友历史消息")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取好友历史消息失败: {e}")
 
@@ -393,8 +402,9 @@ async def get_recent_contact(websocket, count):
             "params": {"count": count},
             "echo": "get_recent_contact",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取最近消息列表")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取最近消息列表失败: {e}")
 
@@ -416,8 +426,9 @@ async def fetch_emoji_like(websocket, message_id, emoji_id, emoji_type):
             },
             "echo": "fetch_emoji_like",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取消息表情点赞详情")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取消息表情点赞详情失败: {e}")
 
@@ -432,8 +443,9 @@ async def get_forward_msg(websocket, message_id, note=""):
             "params": {"message_id": message_id},
             "echo": f"get_forward_msg-{note}",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取合并转发消息")
+        return response
     except Exception as e:
         logger.error(f"[API]执行获取合并转发消息失败: {e}")
 
@@ -448,6 +460,7 @@ async def send_forward_msg(
     summary="消息摘要",
     source="消息来源",
     note="",
+    priority=None,
 ):
     """
     发送合并转发消息
@@ -462,10 +475,11 @@ async def send_forward_msg(
         summary (str, optional): 消息摘要 (默认值为“消息摘要”)
         source (str, optional): 消息来源 (默认值为“消息来源”)
         note (str, optional): 消息备注 (默认值为空字符串)
+        priority (int, optional): 发送优先级，见api.send_scheduler，广播等批量发送建议使用PRIORITY_LOW
 
 
     Returns:
-        bool: 发送是否成功
+        dict: 响应内容，超时或发送失败返回None
 
     Note:
         user_id和group_id必须提供其中一个，不能同时为空或同时提供
@@ -504,14 +518,17 @@ async def send_forward_msg(
         }
 
         # 发送请求
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload, priority=priority)
         logger.info(f"[API]已执行发送合并转发消息")
+        return response
 
     except Exception as e:
         logger.error(f"[API]执行发送合并转发消息失败: {e}")
 
 
-async def send_private_forward_msg(websocket, user_id, messages, note=""):
+async def send_private_forward_msg(
+    websocket, user_id, messages, note="", priority=None
+):
     """
     发送私聊合并转发消息
 
@@ -528,9 +545,10 @@ async def send_private_forward_msg(websocket, user_id, messages, note=""):
                 }
             }
         note (str, optional): 消息备注 (默认值为空字符串)
+        priority (int, optional): 发送优先级，见api.send_scheduler，广播等批量发送建议使用PRIORITY_LOW
 
     Returns:
-        None: 该函数通过websocket发送请求，不直接返回结果
+        dict: 响应内容，超时或发送失败返回None
 
     Example:
         messages = [
@@ -571,15 +589,24 @@ async def send_private_forward_msg(websocket, user_id, messages, note=""):
         }
 
         # 发送请求
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload, priority=priority)
         logger.info(f"[API]已执行发送私聊合并转发消息到用户 {user_id}")
+        return response
 
     except Exception as e:
         logger.error(f"[API]执行发送私聊合并转发消息失败: {e}")
 
 
 async def send_group_forward_msg(
-    websocket, group_id, messages, source, news, prompt, summary, note=""
+    websocket,
+    group_id,
+    messages,
+    source,
+    news,
+    prompt,
+    summary,
+    note="",
+    priority=None,
 ):
     """
     发送群聊合并转发消息
@@ -602,9 +629,10 @@ async def send_group_forward_msg(
         summary (str): 底下文本 (必填)
         prompt (str): 消息外显 (必填)
         note (str, optional): 消息备注 (默认值为空字符串)
+        priority (int, optional): 发送优先级，见api.send_scheduler，广播等批量发送建议使用PRIORITY_LOW
 
     Returns:
-        None: 该函数通过websocket发送请求，不直接返回结果
+        dict: 响应内容，超时或发送失败返回None
 
     Example:
         messages = [
@@ -669,14 +697,15 @@ async def send_group_forward_msg(
         }
 
         # 发送请求
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload, priority=priority)
         logger.info(f"[API]已执行发送群聊合并转发消息到群 {group_id}")
+        return response
 
     except Exception as e:
         logger.error(f"[API]执行发送群聊合并转发消息失败: {e}")
 
 
-async def group_poke(websocket, group_id, user_id):
+async def group_poke(websocket, group_id, user_id, priority=None):
     """
     发送戳一戳
 
@@ -684,9 +713,10 @@ async def group_poke(websocket, group_id, user_id):
         websocket: WebSocket连接实例
         group_id (Union[int, str]): 群号 (必填)
         user_id (Union[int, str]): 群友的QQ号 (必填)
+        priority (int, optional): 发送优先级，见api.send_scheduler，广播等批量发送建议使用PRIORITY_LOW
 
     Returns:
-        bool: 发送是否成功
+        dict: 响应内容，超时或发送失败返回None
     """
     try:
         if not user_id:
@@ -697,7 +727,8 @@ async def group_poke(websocket, group_id, user_id):
             "params": {"group_id": group_id, "user_id": user_id},
             "echo": "group_poke",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload, priority=priority)
         logger.info(f"[API]已执行发送戳一戳")
+        return response
     except Exception as e:
         logger.error(f"[API]执行发送戳一戳失败: {e}")
@@ -0,0 +1,317 @@
+"""
+发送消息调度器
+所有发送消息类请求统一在这里排队，按优先级和目标（群/用户）调度后再交给写入器写入websocket
+每个群、每个用户各有一个令牌桶限速，另有一个全局令牌桶限制总发送速率
+同一优先级内各目标轮流发送，避免某个群刷屏时其他群的回复被饿死
+在发送队列中等待的时间单独记录（见 QueueWaitTracker），不计入模块处理消息的超时时间
+"""
+
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+import logger
+from api.writer import get_writer
+from utils.metrics import metrics
+from config import (
+    OWNER_ID,
+    SEND_GROUP_RATE,
+    SEND_GROUP_BURST,
+    SEND_PRIVATE_RATE,
+    SEND_PRIVATE_BURST,
+    SEND_GLOBAL_RATE,
+    SEND_GLOBAL_BURST,
+)
+
+# 优先级，数值越小越优先
+PRIORITY_HIGH = 0  # 管理员回复等
+PRIORITY_NORMAL = 1  # 普通回复
+PRIORITY_LOW = 2  # 广播、批量通知等
+
+# 发送消息类API及其目标字段，优先取群号
+SEND_ACTIONS = {
+    "send_group_msg": ("group_id",),
+    "send_private_msg": ("user_id",),
+    "send_forward_msg": ("group_id", "user_id"),
+    "send_group_forward_msg": ("group_id",),
+    "send_private_forward_msg": ("user_id",),
+    "group_poke": ("group_id",),
+}
+
+
+def get_send_target(action, params):
+    """
+    获取发送消息类请求的目标
+    返回值: ("group", 群号) 或 ("private", QQ号)，非发送消息类请求返回None
+    """
+    fields = SEND_ACTIONS.get(action)
+    if not fields or not params:
+        return None
+    for field in fields:
+        target_id = params.get(field)
+        if target_id:
+            return ("group" if field == "group_id" else "private", str(target_id))
+    return None
+
+
+def get_default_priority(target):
+    """
+    未指定优先级时，发给管理员的私聊为高优先级，其余为普通优先级
+    """
+    if target == ("private", str(OWNER_ID)):
+        return PRIORITY_HIGH
+    return PRIORITY_NORMAL
+
+
+class TokenBucket:
+    """
+    令牌桶
+    rate: 每秒补充的令牌数
+    burst: 桶容量，即允许的突发数量
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+        self.updated = now
+
+    def wait_time(self, now):
+        """
+        距离有可用令牌还需等待的秒数，0表示现在就可以发送
+        """
+        self._refill(now)
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """
+        消耗一个令牌
+        """
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        """
+        令牌是否已补满，补满的桶可以回收
+        """
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class QueueWaitTracker:
+    """
+    记录一次事件处理在发送队列中等待的总时间
+    并发发送时重叠的等待只计一次
+    """
+
+    def __init__(self):
+        self.total = 0
+        self._waiting = 0
+        self._since = None
+
+    def begin(self):
+        if self._waiting == 0:
+            self._since = time.monotonic()
+        self._waiting += 1
+
+    def end(self):
+        self._waiting -= 1
+        if self._waiting == 0:
+            self.total += time.monotonic() - self._since
+            self._since = None
+
+    def elapsed(self, now):
+        """
+        到now为止在发送队列中等待的秒数，包括正在进行的等待
+        """
+        if self._waiting:
+            return self.total + now - self._since
+        return self.total
+
+
+# 当前事件处理的等待记录，由 track_queue_wait 在处理前设置
+_queue_wait = contextvars.ContextVar("send_queue_wait", default=None)
+
+
+def track_queue_wait():
+    """
+    开始记录当前任务（及之后创建的子任务）在发送队列中等待的时间
+    返回值: QueueWaitTracker
+    """
+    tracker = QueueWaitTracker()
+    _queue_wait.set(tracker)
+    return tracker
+
+
+class SendScheduler:
+    """
+    发送消息调度器
+    """
+
+    def __init__(self):
+        # 每个优先级一个有序字典：目标 -> 待发送队列，字典顺序即轮转顺序
+        self._queues = [
+            OrderedDict() for _ in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+        ]
+        # 目标 -> 令牌桶
+        self._buckets = {}
+        self._global_bucket = TokenBucket(SEND_GLOBAL_RATE, SEND_GLOBAL_BURST)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._pending = 0
+
+        # 统计信息
+        self.sent = 0
+        self.failed = 0
+
+    def qsize(self):
+        """
+        待发送的消息数量
+        """
+        return self._pending
+
+    def stats(self):
+        """
+        获取调度器统计信息
+        """
+        return {
+            "pending": self._pending,
+            "pending_by_priority": [
+                sum(len(items) for items in queue.values()) for queue in self._queues
+            ],
+            "targets": sum(len(queue) for queue in self._queues),
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+    async def submit(self, websocket, payload, target, priority=None):
+        """
+        提交一条发送消息请求，等待轮到它写入websocket后返回
+        写入失败时抛出异常
+        """
+        if priority is None:
+            priority = get_default_priority(target)
+        priority = min(max(priority, PRIORITY_HIGH), PRIORITY_LOW)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(target, deque()).append(
+            (websocket, payload, future)
+        )
+        self._pending += 1
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+        tracker = _queue_wait.get()
+        if tracker is None:
+            await future
+            return
+        tracker.begin()
+        try:
+            await future
+        finally:
+            tracker.end()
+
+    def _bucket(self, target):
+        bucket = self._buckets.get(target)
+        if bucket is None:
+            if target[0] == "group":
+                bucket = TokenBucket(SEND_GROUP_RATE, SEND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(SEND_PRIVATE_RATE, SEND_PRIVATE_BURST)
+            self._buckets[target] = bucket
+        return bucket
+
+    def _next(self):
+        """
+        取出下一条可以发送的消息
+        返回值: (消息, None) 或 (None, 需要等待的秒数)，没有待发送消息时等待秒数为None
+        """
+        now = time.monotonic()
+        if self._pending and self._global_bucket.wait_time(now) > 0:
+            return None, self._global_bucket.wait_time(now)
+
+        min_wait = None
+        for queue in self._queues:
+            for target in list(queue):
+                wait = self._bucket(target).wait_time(now)
+                if wait > 0:
+                    min_wait = wait if min_wait is None else min(min_wait, wait)
+                    continue
+
+                items = queue[target]
+                # 丢弃调用方已经放弃等待（超时或被取消）的消息，不消耗令牌
+                while items and items[0][2].done():
+                    items.popleft()
+                    self._pending -= 1
+                if not items:
+                    del queue[target]
+                    continue
+                item = items.popleft()
+                self._pending -= 1
+                if items:
+                    # 本目标还有消息，轮转到队尾
+                    queue.move_to_end(target)
+                else:
+                    del queue[target]
+                self._bucket(target).consume(now)
+                self._global_bucket.consume(now)
+                return item, None
+        return None, min_wait
+
+    def _gc_buckets(self):
+        """
+        回收已补满且没有待发送消息的令牌桶
+        """
+        now = time.monotonic()
+        for target in list(self._buckets):
+            if self._buckets[target].is_full(now) and not any(
+                target in queue for queue in self._queues
+            ):
+                del self._buckets[target]
+
+    async def _run(self):
+        """
+        调度协程
+        """
+        while True:
+            item, delay = self._next()
+            if item is None:
+                self._wakeup.clear()
+                if delay is None:
+                    self._gc_buckets()
+                    await self._wakeup.wait()
+                else:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+
+            websocket, payload, future = item
+            try:
+                await get_writer(websocket).send(payload)
+                self.sent += 1
+                # 发送期间调用方可能已经超时或被取消，消息已发出，不算作失败
+                if not future.done():
+                    future.set_result(None)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[API]发送 {payload.get('action')} 失败: {e}")
+                if not future.done():
+                    future.set_exception(e)
+
+
+# 全局调度器实例
+send_scheduler = SendScheduler()
+metrics.register_gauge("send_queue_depth", send_scheduler.qsize)
@@ -1,5 +1,5 @@
-import json
 import logger
+from api.engine import call_api
 
 
 async def set_qq_profile(websocket, nickname, personal_note, sex):
@@ -16,9 +16,9 @@ async def set_qq_profile(websocket, nickname, personal_note, sex):
             },
             "echo": "set_qq_profile",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置账号信息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置账号信息失败: {e}")
         return False
@@ -38,9 +38,9 @@ async def ArkSharePeer(websocket, group_id, user_id, phoneNumber):
             },
             "echo": "ArkSharePeer",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取推荐好友/群聊卡片")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取推荐好友/群聊卡片失败: {e}")
         return False
@@ -56,9 +56,9 @@ async def ArkShareGroup(websocket, group_id):
             "params": {"group_id": group_id},
             "echo": "ArkShareGroup",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取推荐群聊卡片")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取推荐群聊卡片失败: {e}")
         return False
@@ -78,9 +78,9 @@ async def set_online_status(websocket, status, ext_status, battery_status):
             },
             "echo": "set_online_status",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置在线状态")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置在线状态失败: {e}")
         return False
@@ -95,9 +95,9 @@ async def get_friends_with_category(websocket):
             "action": "get_friends_with_category",
             "echo": "get_friends_with_category",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取好友分组列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取好友分组列表失败: {e}")
         return False
@@ -113,9 +113,9 @@ async def set_qq_avatar(websocket, file):
             "params": {"file": file},
             "echo": "set_qq_avatar",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置头像")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置头像失败: {e}")
         return False
@@ -131,9 +131,9 @@ async def send_like(websocket, user_id, times=1):
             "params": {"user_id": user_id, "times": times},
             "echo": "send_like",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行点赞")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]点赞失败: {e}")
         return False
@@ -149,9 +149,9 @@ async def create_collection(websocket, raw_data, brief):
             "params": {"rawData": raw_data, "brief": brief},
             "echo": "create_collection",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行创建收藏")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]创建收藏失败: {e}")
         return False
@@ -171,9 +171,9 @@ async def set_friend_add_request(websocket, flag, approve, remark=""):
             "params": {"flag": flag, "approve": approve, "remark": remark},
             "echo": "set_friend_add_request",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行处理好友请求")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]处理好友请求失败: {e}")
         return False
@@ -193,9 +193,9 @@ async def set_group_add_request(websocket, flag, approve, reason=""):
             "params": {"flag": flag, "approve": approve, "reason": reason},
             "echo": "set_group_add_request",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行处理群请求")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]处理群请求失败: {e}")
         return False
@@ -211,9 +211,9 @@ async def set_self_longnick(websocket, long_nick):
             "params": {"longNick": long_nick},
             "echo": "set_self_longnick",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行设置个性签名")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]设置个性签名失败: {e}")
         return False
@@ -229,9 +229,9 @@ async def get_stranger_info(websocket, user_id):
             "params": {"user_id": user_id},
             "echo": "get_stranger_info",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取账号信息")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取账号信息失败: {e}")
         return False
@@ -247,9 +247,9 @@ async def get_friend_list(websocket, no_cache=False):
             "params": {"no_cache": no_cache},
             "echo": "get_friend_list",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取好友列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取好友列表失败: {e}")
         return False
@@ -261,9 +261,9 @@ async def get_like_list(websocket):
     """
     try:
         payload = {"action": "get_like_list", "echo": "get_like_list"}
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取点赞列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取点赞列表失败: {e}")
         return False
@@ -275,9 +275,9 @@ async def get_collection_list(websocket):
     """
     try:
         payload = {"action": "get_collection_list", "echo": "get_collection_list"}
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取收藏列表")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取收藏列表失败: {e}")
         return False
@@ -289,9 +289,9 @@ async def get_collection_emoji(websocket):
     """
     try:
         payload = {"action": "get_collection_emoji", "echo": "get_collection_emoji"}
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取收藏表情")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取收藏表情失败: {e}")
         return False
@@ -307,9 +307,9 @@ async def upload_private_file(websocket, user_id, file, name):
             "params": {"user_id": user_id, "file": file, "name": name},
             "echo": "upload_private_file",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行上传私聊文件")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]上传私聊文件失败: {e}")
         return False
@@ -332,9 +332,9 @@ async def delete_friend(
             },
             "echo": "delete_friend",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行删除好友")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]删除好友失败: {e}")
         return False
@@ -350,9 +350,9 @@ async def get_user_status(websocket, user_id):
             "params": {"user_id": user_id},
             "echo": "get_user_status",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取用户状态")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取用户状态失败: {e}")
         return False
@@ -368,9 +368,9 @@ async def get_mini_app_card(websocket, app_id):
             "params": {"app_id": app_id},
             "echo": "get_mini_app_card",
         }
-        await websocket.send(json.dumps(payload))
+        response = await call_api(websocket, **payload)
         logger.info(f"[API]已执行获取小程序卡片")
-        return True
+        return response
     except Exception as e:
         logger.error(f"[API]获取小程序卡片失败: {e}")
         return False
@@ -0,0 +1,173 @@
+"""
+websocket写入器
+每个websocket连接只有一个写入协程，所有待发送的请求先进入队列，由写入协程统一序列化并写入
+每次唤醒时把队列中已积累的请求一次性取出连续写入，避免大量协程同时调用websocket.send互相争抢
+安装了orjson时使用orjson序列化，否则使用标准库json
+"""
+
+import json
+import time
+import asyncio
+import weakref
+from collections import deque
+import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_payload(payload):
+    """
+    序列化请求为文本帧
+    orjson不支持的内容（如超过64位的整数）回退到标准库json
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(payload)
+
+
+class WebsocketWriter:
+    """
+    单个websocket连接的写入器
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        # 队列元素为 (请求, future, 入队时间)
+        self._queue = deque()
+        # 队列非空时处于set状态
+        self._ready = asyncio.Event()
+        self._task = None
+        # 写入协程正在写入的一批请求
+        self._batch = []
+
+        # 统计信息
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def qsize(self):
+        """
+        待写入的请求数量
+        """
+        return len(self._queue)
+
+    def stats(self):
+        """
+        获取写入统计信息，延迟单位：毫秒，为入队到写入完成的耗时
+        """
+        return {
+            "queue_depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "batches": self.batches,
+            "max_batch": self.max_batch,
+            "avg_latency_ms": (
+                round(self.total_latency / self.sent * 1000, 2) if self.sent else 0
+            ),
+            "max_latency_ms": round(self.max_latency * 1000, 2),
+        }
+
+    async def send(self, payload):
+        """
+        提交一个请求，等待写入websocket后返回
+        写入失败时抛出异常
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((payload, future, time.monotonic()))
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._ready.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        await future
+
+    def close(self, reason="连接已断开"):
+        """
+        停止写入协程，未写入的请求立即失败
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for _, future, _ in [*self._batch, *self._queue]:
+            if not future.done():
+                future.set_exception(ConnectionError(reason))
+        self._batch = []
+        self._queue.clear()
+
+    async def _run(self):
+        """
+        写入协程，每次取出队列中已积累的全部请求连续写入
+        """
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            self._batch = list(self._queue)
+            self._queue.clear()
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(self._batch))
+
+            for payload, future, enqueued_at in self._batch:
+                # 调用方已经放弃等待（被取消），不再写入
+                if future.done():
+                    continue
+                try:
+                    await self.websocket.send(encode_payload(payload))
+                except Exception as e:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+
+                latency = time.monotonic() - enqueued_at
+                self.sent += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                if not future.done():
+                    future.set_result(None)
+            self._batch = []
+
+
+# websocket连接 -> 写入器
+_writers = weakref.WeakKeyDictionary()
+# 已断开的websocket连接，重连后仍在排队的旧请求不再为其创建写入器
+_closed = weakref.WeakSet()
+
+
+def get_writer(websocket):
+    """
+    获取websocket连接对应的写入器，不存在时创建
+    连接已断开时抛出ConnectionError
+    """
+    if websocket in _closed:
+        raise ConnectionError("连接已断开")
+    writer = _writers.get(websocket)
+    if writer is None:
+        writer = WebsocketWriter(websocket)
+        _writers[websocket] = writer
+    return writer
+
+
+def close_writer(websocket, reason="连接已断开"):
+    """
+    连接断开时关闭对应的写入器
+    """
+    _closed.add(websocket)
+    writer = _writers.pop(websocket, None)
+    if writer is not None:
+        writer.close(reason)
+        logger.info(f"[API]写入器已关闭，统计信息: {writer.stats()}")
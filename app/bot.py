@@ -1,12 +1,19 @@
+import time
 import websockets
 from config import WS_URL, TOKEN
 from logger import logger
-from handle_events import EventHandler
-import asyncio
+from dispatcher import EventDispatcher
+from api.engine import fail_pending_calls
+from api.writer import close_writer
 
 
-async def connect_to_bot():
-    """连接到机器人并开始接收消息"""
+async def connect_to_bot(handler):
+    """
+    连接到机器人并开始接收消息
+    handler: 已加载模块的EventHandler实例，连接建立后绑定到新连接
+
+    返回值: 连接建立后断开时返回连接持续的秒数，连接失败返回None
+    """
 
     if WS_URL is None:
         logger.error("WS_URL未设置，请在环境变量中设置")
@@ -19,22 +26,35 @@ async def connect_to_bot():
 
     logger.info(f"正在连接到机器人,连接地址: {connection_url}")
 
+    connected_at = None
     try:
         # 连接到 WebSocket
         async with websockets.connect(connection_url) as websocket:
+            connected_at = time.monotonic()
+            logger.success("已连接到机器人")
+            # 模块已在启动时加载，这里只需绑定新连接
+            handler.bind(websocket)
+            # 消息进入有界队列，由固定数量的工作协程处理，积压过多时暂停读取
+            dispatcher = EventDispatcher(handler, websocket)
+            dispatcher.start()
             try:
-                handler = EventHandler(websocket)  # 为每个连接创建一个独立实例
                 async for message in websocket:
                     try:
-                        # 异步处理消息，不阻塞当前循环
-                        # 使用create_task确保即使处理消息耗时，也不会阻塞后续消息接收
-                        asyncio.create_task(handler.handle_message(websocket, message))
+                        await dispatcher.submit(message)
                     except Exception as e:
                         logger.error(f"处理消息时出错: {e}")
                         logger.error(f"消息内容: {message}")
             except Exception as e:
                 logger.error(f"WebSocket连接出错: {e}")
                 raise
+            finally:
+                handler.unbind()
+                await dispatcher.stop()
+                # 连接断开后等待中的API调用不会再收到响应
+                fail_pending_calls()
+                close_writer(websocket)
     except Exception as e:
-        logger.error(f"WebSocket连接失败: {e}")
-        return None
+        if connected_at is None:
+            logger.error(f"WebSocket连接失败: {e}")
+            return None
+    return time.monotonic() - connected_at
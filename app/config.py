@@ -21,4 +21,96 @@ FEISHU_BOT_URL = os.getenv("FEISHU_BOT_URL")
 # 飞书机器人Secret，选填，掉线时使用
 FEISHU_BOT_SECRET = os.getenv("FEISHU_BOT_SECRET")
 
+# ==================== 事件处理配置（选填） ====================
+
+# 处理事件的分片工作协程数量，同一群/用户的事件总是由同一个协程按顺序处理
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", "8"))
+
+# 事件队列高水位，积压达到该值时执行溢出策略，仍无法缓解则暂停读取websocket，
+# 暂停期间为等待API响应继续读取时，积压达到高水位的2倍后丢弃新事件
+EVENT_QUEUE_HIGH_WATER = int(os.getenv("EVENT_QUEUE_HIGH_WATER", "1000"))
+
+# 事件队列低水位，暂停读取后积压降到该值时恢复读取
+EVENT_QUEUE_LOW_WATER = int(os.getenv("EVENT_QUEUE_LOW_WATER", "500"))
+
+# 事件队列溢出策略
+# block: 不丢弃事件，直接暂停读取
+# drop_heartbeat: 丢弃队列中最早的心跳事件
+# drop_low_priority: 丢弃低优先级事件（元事件、戳一戳、输入状态等通知）
+EVENT_QUEUE_OVERFLOW_POLICY = os.getenv("EVENT_QUEUE_OVERFLOW_POLICY", "drop_heartbeat")
+
+# 重复事件的去重有效期，单位：秒，设为0关闭去重
+EVENT_DEDUP_TTL = float(os.getenv("EVENT_DEDUP_TTL", "300"))
+# 去重最多记录的事件数量
+EVENT_DEDUP_SIZE = int(os.getenv("EVENT_DEDUP_SIZE", "10000"))
+
+# 每个模块处理单条消息的超时时间，超时后取消，单位：秒，0为不限制
+# 在发送队列中排队限速的时间不计入超时时间
+# 模块可以在模块文件（核心模块）或模块包的__init__.py中声明 HANDLER_TIMEOUT 单独设置
+HANDLER_TIMEOUT = float(os.getenv("HANDLER_TIMEOUT", "60"))
+# 事件循环阻塞超过该时间时记录调用栈，单位：秒，0为关闭监测
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "1"))
+# 模块在时间窗口内超时或阻塞事件循环达到该次数后熔断，暂停处理事件，核心模块不熔断
+HANDLER_QUARANTINE_THRESHOLD = int(os.getenv("HANDLER_QUARANTINE_THRESHOLD", "3"))
+# 统计违规次数的时间窗口，单位：秒
+HANDLER_QUARANTINE_WINDOW = float(os.getenv("HANDLER_QUARANTINE_WINDOW", "300"))
+# 熔断持续时间，单位：秒
+HANDLER_QUARANTINE_TIME = float(os.getenv("HANDLER_QUARANTINE_TIME", "600"))
+
+# ==================== API调用配置（选填） ====================
+
+# 调用API等待响应的超时时间，单位：秒
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "30"))
+
+# ==================== 发送限速配置（选填） ====================
+
+# 每个群每秒允许发送的消息数，及允许的突发数量
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", "1"))
+SEND_GROUP_BURST = int(os.getenv("SEND_GROUP_BURST", "5"))
+
+# 每个私聊用户每秒允许发送的消息数，及允许的突发数量
+SEND_PRIVATE_RATE = float(os.getenv("SEND_PRIVATE_RATE", "1"))
+SEND_PRIVATE_BURST = int(os.getenv("SEND_PRIVATE_BURST", "5"))
+
+# 全局每秒允许发送的消息数，及允许的突发数量
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "10"))
+SEND_GLOBAL_BURST = int(os.getenv("SEND_GLOBAL_BURST", "20"))
+
+# ==================== 自动撤回配置（选填） ====================
+
+# 全局每秒撤回的消息数，及允许的突发数量
+RECALL_RATE = float(os.getenv("RECALL_RATE", "5"))
+RECALL_BURST = int(os.getenv("RECALL_BURST", "10"))
+# 每批最多同时撤回的消息数
+RECALL_BATCH_SIZE = int(os.getenv("RECALL_BATCH_SIZE", "20"))
+# 撤回时间超过该值的任务会持久化到本地，重启后恢复，单位：秒
+RECALL_PERSIST_THRESHOLD = float(os.getenv("RECALL_PERSIST_THRESHOLD", "120"))
+
+# ==================== 群成员缓存配置（选填） ====================
+
+# 全量刷新所有群成员列表的间隔，成员变化由通知增量更新，全量刷新只用于校正，单位：秒
+GROUP_MEMBER_REFRESH_INTERVAL = float(
+    os.getenv("GROUP_MEMBER_REFRESH_INTERVAL", "3600")
+)
+# 全量刷新时同时请求群成员列表的最大数量
+GROUP_MEMBER_REFRESH_CONCURRENCY = int(
+    os.getenv("GROUP_MEMBER_REFRESH_CONCURRENCY", "3")
+)
+
+# ==================== 运行指标配置（选填） ====================
+
+# 指标HTTP接口端口，开启后可在 http://地址:端口/metrics 获取Prometheus格式的指标，0为关闭
+METRICS_HTTP_PORT = int(os.getenv("METRICS_HTTP_PORT", "0"))
+# 指标HTTP接口监听地址，默认只允许本机访问
+METRICS_HTTP_HOST = os.getenv("METRICS_HTTP_HOST", "127.0.0.1")
+
+# ==================== 重连配置（选填） ====================
+
+# 连接断开后首次重连的等待时间，之后每次失败翻倍，单位：秒
+RECONNECT_MIN_DELAY = float(os.getenv("RECONNECT_MIN_DELAY", "2"))
+# 重连等待时间的上限，单位：秒
+RECONNECT_MAX_DELAY = float(os.getenv("RECONNECT_MAX_DELAY", "60"))
+# 连接保持超过该时间后断开，重连等待时间恢复为初始值，单位：秒
+RECONNECT_RESET_AFTER = float(os.getenv("RECONNECT_RESET_AFTER", "60"))
+
 # ==================== 配置项结束 ====================
@@ -1,42 +1,36 @@
 """
 自动撤回自己发送的消息
+所有待撤回消息由一个撤回调度器统一管理，按撤回时间放在最小堆中，
+只有一个协程睡眠到最早的撤回时间后批量撤回，并按全局速率限速
+撤回时间超过 RECALL_PERSIST_THRESHOLD 的任务持久化到 data/Core/del_msg.db（见core/recall_store.py），
+重连后恢复
 """
 
 import logger
 import re
 import asyncio
+import heapq
+from itertools import count
 from api.message import delete_msg
-import os
-import json
+from api.send_scheduler import TokenBucket
+from utils.metrics import metrics
+from core.recall_store import RecallStore
+from config import (
+    RECALL_RATE,
+    RECALL_BURST,
+    RECALL_BATCH_SIZE,
+    RECALL_PERSIST_THRESHOLD,
+)
 import time
 
-DEL_MSG_DB_PATH = os.path.join("data", "Core", "del_msg.json")
+# 订阅连接事件和发送消息类API的响应
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "meta_event", "meta_event_type": "lifecycle"},
+    {"echo": "send_"},
+]
 
-
-def load_del_msg_data():
-    """
-    加载待撤回消息数据
-    """
-    try:
-        if os.path.exists(DEL_MSG_DB_PATH):
-            with open(DEL_MSG_DB_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        logger.error(f"加载撤回消息数据失败: {e}")
-        return {}
-
-
-def save_del_msg_data(data):
-    """
-    保存待撤回消息数据
-    """
-    try:
-        os.makedirs(os.path.dirname(DEL_MSG_DB_PATH), exist_ok=True)
-        with open(DEL_MSG_DB_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"保存撤回消息数据失败: {e}")
+_store = RecallStore()
+_store.import_json_tasks()
 
 
 def add_del_msg_task(msg_id, del_time):
@@ -44,75 +38,197 @@ def add_del_msg_task(msg_id, del_time):
     添加待撤回消息任务到本地存储
     """
     try:
-        data = load_del_msg_data()
-        delete_timestamp = time.time() + del_time
-        data[str(msg_id)] = {
-            "message_id": msg_id,
-            "delete_timestamp": delete_timestamp,
-            "del_time": del_time,
-        }
-        save_del_msg_data(data)
+        _store.add(msg_id, del_time)
         logger.info(f"已添加消息 {msg_id} 到撤回任务列表，将在 {del_time} 秒后撤回")
     except Exception as e:
         logger.error(f"添加撤回消息任务失败: {e}")
 
 
-def remove_del_msg_task(msg_id):
+def remove_del_msg_tasks(msg_ids):
     """
     从本地存储中移除已撤回的消息任务
     """
     try:
-        data = load_del_msg_data()
-        if str(msg_id) in data:
-            del data[str(msg_id)]
-            save_del_msg_data(data)
-            logger.info(f"已从撤回任务列表中移除消息 {msg_id}")
+        _store.remove_many(msg_ids)
+        logger.info(f"已从撤回任务列表中移除 {len(msg_ids)} 条消息")
     except Exception as e:
         logger.error(f"移除撤回消息任务失败: {e}")
 
 
+class RecallScheduler:
+    """
+    撤回调度器
+    待撤回消息按撤回时间放在最小堆中，添加任务为O(log n)，协程数量不随待撤回消息数量增长
+    rate/burst: 全局每秒撤回的消息数及允许的突发数量
+    batch_size: 每批最多同时撤回的消息数
+    """
+
+    def __init__(
+        self, rate=RECALL_RATE, burst=RECALL_BURST, batch_size=RECALL_BATCH_SIZE
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.batch_size = max(1, batch_size)
+        # 撤回使用最新的连接
+        self.websocket = None
+        # (撤回时间, 序号, 消息ID) 最小堆
+        self._heap = []
+        # 消息ID -> 最新序号，同一消息重复添加时，堆中序号不一致的旧记录在弹出时跳过
+        self._pending = {}
+        # 已持久化到本地存储的消息ID，撤回后需要从本地存储中移除
+        self._persisted = set()
+        self._seq = count()
+        self._wakeup = None
+        self._task = None
+
+        # 统计信息
+        self.recalled = 0
+        self.failed = 0
+
+    def schedule(self, websocket, message_id, delay, persisted=False):
+        """
+        添加撤回任务，delay秒后撤回
+        persisted: 该任务是否已持久化到本地存储
+        """
+        self.websocket = websocket
+        deadline = time.monotonic() + max(0, delay)
+        seq = next(self._seq)
+        self._pending[message_id] = seq
+        if persisted:
+            self._persisted.add(message_id)
+        heapq.heappush(self._heap, (deadline, seq, message_id))
+        self._ensure_running()
+        # 新任务成为最早的任务时，唤醒调度协程重新计算睡眠时间
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def _ensure_running(self):
+        """
+        调度协程未运行时启动
+        """
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """
+        调度协程，睡眠到最早的撤回时间，或被更早的新任务唤醒
+        """
+        while True:
+            batch = self._pop_due()
+            if batch:
+                await self._recall_batch(batch)
+                continue
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _pop_due(self):
+        """
+        弹出已到撤回时间的任务，最多batch_size个
+        """
+        now = time.monotonic()
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            _, seq, message_id = heapq.heappop(self._heap)
+            if self._pending.get(message_id) != seq:
+                continue
+            del self._pending[message_id]
+            batch.append(message_id)
+        return batch
+
+    async def _recall_batch(self, batch):
+        """
+        按全局速率限速，同时撤回一批消息
+        """
+        tasks = []
+        for message_id in batch:
+            wait = self.bucket.wait_time(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.bucket.consume(time.monotonic())
+            tasks.append(asyncio.create_task(self._recall(message_id)))
+        await asyncio.gather(*tasks)
+
+        # 无论撤回成功与否都从本地存储中移除，避免重复尝试
+        persisted = [
+            message_id for message_id in batch if message_id in self._persisted
+        ]
+        if persisted:
+            self._persisted.difference_update(persisted)
+            remove_del_msg_tasks(persisted)
+
+    async def _recall(self, message_id):
+        """
+        撤回单条消息
+        """
+        try:
+            response = await delete_msg(self.websocket, message_id)
+            if response and response.get("status") == "ok":
+                self.recalled += 1
+            else:
+                self.failed += 1
+                logger.error(f"撤回消息 {message_id} 失败: {response}")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"撤回消息 {message_id} 失败: {e}")
+
+    def qsize(self):
+        """
+        待撤回的消息数
+        """
+        return len(self._pending)
+
+    def stats(self):
+        """
+        获取撤回统计信息
+        """
+        return {
+            "pending": len(self._pending),
+            "heap": len(self._heap),
+            "recalled": self.recalled,
+            "failed": self.failed,
+        }
+
+
+# 全局撤回调度器
+recall_scheduler = RecallScheduler()
+metrics.register_gauge("recall_pending", recall_scheduler.qsize)
+
+
 async def restore_del_msg_tasks(websocket):
     """
     恢复重启前的撤回消息任务
     """
     try:
-        data = load_del_msg_data()
+        # 重连后未到期的任务使用新连接撤回
+        recall_scheduler.websocket = websocket
         current_time = time.time()
 
-        for msg_id, task_info in list(data.items()):
-            delete_timestamp = task_info.get("delete_timestamp", 0)
+        for msg_id, delete_timestamp in _store.get_all():
             remaining_time = delete_timestamp - current_time
 
             if remaining_time > 0:
-                # 如果还没到撤回时间，重新创建任务
+                # 如果还没到撤回时间，重新添加任务
                 logger.info(
                     f"恢复撤回任务: 消息 {msg_id} 将在 {remaining_time:.1f} 秒后撤回"
                 )
-                asyncio.create_task(
-                    del_self_msg(websocket, int(msg_id), remaining_time)
-                )
             else:
                 # 如果已经超过撤回时间，立即撤回
                 logger.info(f"立即撤回过期消息: {msg_id}")
-                asyncio.create_task(del_self_msg(websocket, int(msg_id), 0))
+            del_self_msg(websocket, msg_id, remaining_time, persisted=True)
     except Exception as e:
         logger.error(f"恢复撤回消息任务失败: {e}")
 
 
-async def del_self_msg(websocket, msg_id, del_time):
+def del_self_msg(websocket, msg_id, del_time, persisted=False):
     """
-    定时撤回消息
+    定时撤回消息，添加到撤回调度器
     """
-    logger.info(f"自动撤回消息: {msg_id} 将在 {del_time} 秒后撤回")
-    await asyncio.sleep(del_time)
-    try:
-        await delete_msg(websocket, msg_id)
-        # 撤回成功后从本地存储中移除
-        remove_del_msg_task(msg_id)
-    except Exception as e:
-        logger.error(f"撤回消息 {msg_id} 失败: {e}")
-        # 撤回失败也要移除任务，避免重复尝试
-        remove_del_msg_task(msg_id)
+    logger.info(f"自动撤回消息: {msg_id} 将在 {max(0, del_time):.0f} 秒后撤回")
+    recall_scheduler.schedule(websocket, msg_id, del_time, persisted)
 
 
 async def handle_events(websocket, msg):
@@ -138,11 +254,16 @@ async def handle_events(websocket, msg):
                 del_time = int(res.group(1))
                 message_id = msg.get("data", {}).get("message_id")
 
-                if del_time > 120:  # 只对超过120秒的进行存储
+                if message_id is None:
+                    return
+
+                # 只对超过持久化阈值的进行存储
+                persisted = del_time > RECALL_PERSIST_THRESHOLD
+                if persisted:
                     add_del_msg_task(message_id, del_time)
                     logger.success(f"[Core]待撤回消息已存储到本地: 消息 {message_id}")
 
-                # 无论是否存储，都创建撤回任务
-                asyncio.create_task(del_self_msg(websocket, message_id, del_time))
+                # 无论是否存储，都添加撤回任务
+                del_self_msg(websocket, message_id, del_time, persisted)
     except Exception as e:
         logger.error(f"自动撤回发送的消息失败: {e}")
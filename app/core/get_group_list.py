@@ -1,17 +1,20 @@
+import asyncio
 import logger
 from config import OWNER_ID
 from api.group import get_group_list
 from api.message import send_private_msg
 import os
 import json
-import time
 
 DATA_DIR = os.path.join("data", "Core", "get_group_list.json")
 
-# 全局变量，记录上次请求时间
-last_request_time = 0
 REQUEST_INTERVAL = 300  # 5分钟，单位：秒
 
+# 订阅通知事件（群名变更）
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "notice"},
+]
+
 
 def save_group_list_to_file(item):
     """
@@ -24,6 +27,180 @@ def save_group_list_to_file(item):
         json.dump(item, f, ensure_ascii=False, indent=2)
 
 
+class GroupDirectory:
+    """
+    群目录
+    在内存中保存最新的群列表，按群号索引，查询群名、成员数等为O(1)
+    首次查询时从 data/Core/get_group_list.json 加载，更新后在后台线程中保存快照
+    群信息变化时通知监听器，监听器参数为 (群号, 旧信息, 新信息)，
+    新增的群旧信息为None，退出的群新信息为None
+    """
+
+    def __init__(self, path=DATA_DIR):
+        self.path = path
+        # 群号 -> 群信息
+        self._groups = {}
+        self._loaded = False
+        # 启动后首次用服务器返回的群列表更新完成
+        self._refreshed = asyncio.Event()
+        self._listeners = []
+        # 保存快照的后台任务，保存期间再次更新时保存完成后再保存一次
+        self._save_task = None
+        self._dirty = False
+
+    def _ensure_loaded(self):
+        """
+        首次使用时从文件加载
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            logger.warning(f"[Core]群列表文件不存在: {self.path}")
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                group_list = json.load(f)
+            self._groups = {
+                str(group["group_id"]): group
+                for group in group_list
+                if group.get("group_id")
+            }
+        except Exception as e:
+            logger.error(f"[Core]加载群列表失败: {e}")
+
+    def add_listener(self, listener):
+        """
+        注册群信息变化监听器
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, group_id, old, new):
+        for listener in self._listeners:
+            try:
+                listener(group_id, old, new)
+            except Exception as e:
+                logger.error(f"[Core]群信息变化监听器执行失败: {e}")
+
+    def update(self, group_list):
+        """
+        用get_group_list的响应数据整体更新群目录
+        返回值: 信息发生变化的群数量（包括新增和退出的群）
+        """
+        self._ensure_loaded()
+        old_groups = self._groups
+        self._groups = {
+            str(group["group_id"]): group
+            for group in group_list
+            if group.get("group_id")
+        }
+
+        changed = 0
+        for group_id, group in self._groups.items():
+            old = old_groups.get(group_id)
+            if old != group:
+                changed += 1
+                self._notify(group_id, old, group)
+        for group_id, old in old_groups.items():
+            if group_id not in self._groups:
+                changed += 1
+                self._notify(group_id, old, None)
+
+        self._refreshed.set()
+        if changed:
+            self._schedule_save()
+        return changed
+
+    async def wait_refreshed(self, timeout):
+        """
+        等待启动后首次从服务器更新群目录，首次启动时群列表文件为空，需要等待更新后才有群号
+        返回值: 是否已更新，超时返回False
+        """
+        try:
+            await asyncio.wait_for(self._refreshed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def update_group(self, group_id, **fields):
+        """
+        更新单个群的部分字段，如群名变更通知中的新群名
+        返回值: 是否有变化，群不在目录中时不更新，返回False
+        """
+        self._ensure_loaded()
+        group_id = str(group_id)
+        old = self._groups.get(group_id)
+        if old is None:
+            return False
+        group = {**old, **fields}
+        if group == old:
+            return False
+        self._groups[group_id] = group
+        self._notify(group_id, old, group)
+        self._schedule_save()
+        return True
+
+    def _schedule_save(self):
+        """
+        在后台线程中保存快照，没有运行中的事件循环时直接保存
+        """
+        self._dirty = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._save_now()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save())
+
+    def _save_now(self):
+        self._dirty = False
+        save_group_list_to_file(list(self._groups.values()))
+
+    async def _save(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await asyncio.to_thread(
+                    save_group_list_to_file, list(self._groups.values())
+                )
+            except Exception as e:
+                logger.error(f"[Core]保存群列表失败: {e}")
+
+    def get(self, group_id):
+        """
+        获取群信息，不存在时返回None，返回的字典请勿修改
+        """
+        self._ensure_loaded()
+        return self._groups.get(str(group_id))
+
+    def get_field(self, group_id, field):
+        """
+        获取群信息的某个字段，群不存在时返回None
+        """
+        group = self.get(group_id)
+        return group.get(field) if group else None
+
+    def group_ids(self):
+        """
+        获取所有群号
+        """
+        self._ensure_loaded()
+        return list(self._groups)
+
+    def __contains__(self, group_id):
+        self._ensure_loaded()
+        return str(group_id) in self._groups
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._groups)
+
+
+# 全局群目录
+group_directory = GroupDirectory()
+
+
 def get_group_name_by_id(group_id):
     """
     根据群号获取群名
@@ -34,30 +211,24 @@ def get_group_name_by_id(group_id):
     Returns:
         str: 群名称，如果找不到则返回None
     """
-    try:
-        # 确保群号是字符串格式
-        group_id = str(group_id)
-
-        # 检查文件是否存在
-        if not os.path.exists(DATA_DIR):
-            logger.warning(f"[Core]群列表文件不存在: {DATA_DIR}")
-            return None
+    group_name = group_directory.get_field(group_id, "group_name")
+    if group_name is None:
+        logger.warning(f"[Core]未找到群号 {group_id} 对应的群名")
+    return group_name
 
-        # 读取群列表文件
-        with open(DATA_DIR, "r", encoding="utf-8") as f:
-            group_list = json.load(f)
 
-        # 查找匹配的群号
-        for group in group_list:
-            if str(group.get("group_id")) == group_id:
-                return group.get("group_name")
+def get_group_member_count(group_id):
+    """
+    根据群号获取群成员数量，找不到时返回None
+    """
+    return group_directory.get_field(group_id, "member_count")
 
-        logger.warning(f"[Core]未找到群号 {group_id} 对应的群名")
-        return None
 
-    except Exception as e:
-        logger.error(f"[Core]获取群名失败: {e}")
-        return None
+def get_group_max_member_count(group_id):
+    """
+    根据群号获取群最大成员数量，找不到时返回None
+    """
+    return group_directory.get_field(group_id, "max_member_count")
 
 
 def get_all_group_ids():
@@ -67,32 +238,12 @@ def get_all_group_ids():
     Returns:
         list: 群号列表，如果获取失败则返回空列表
     """
-    try:
-        # 检查文件是否存在
-        if not os.path.exists(DATA_DIR):
-            logger.warning(f"[Core]群列表文件不存在: {DATA_DIR}")
-            return []
-
-        # 读取群列表文件
-        with open(DATA_DIR, "r", encoding="utf-8") as f:
-            group_list = json.load(f)
+    return group_directory.group_ids()
 
-        # 提取所有群号
-        group_ids = [
-            str(group.get("group_id")) for group in group_list if group.get("group_id")
-        ]
 
-        logger.success(f"[Core]获取到 {len(group_ids)} 个群号, 群号列表: {group_ids}")
-        return group_ids
-
-    except Exception as e:
-        logger.error(f"[Core]获取所有群号失败: {e}")
-        return []
-
-
-async def handle_events(websocket, msg):
+async def refresh_group_list(websocket):
     """
-    处理回应事件
+    请求群列表并保存到文件
     响应示例:
     {
         "status": "ok",            // 状态，"ok"表示成功
@@ -112,27 +263,48 @@ async def handle_events(websocket, msg):
         "echo": null                // 回显字段，通常用于请求和响应的匹配
     }
     """
-    global last_request_time
+    response = await get_group_list(websocket, no_cache=True)
+    if response and response.get("status") == "ok":
+        # 更新群目录，有变化时在后台保存
+        changed = group_directory.update(response.get("data", []))
+        logger.success(f"[Core]已更新群列表，{changed} 个群信息有变化")
+
+
+async def scheduled_refresh_group_list(websocket):
+    """
+    定时刷新群列表
+    """
+    try:
+        await refresh_group_list(websocket)
+    except Exception as e:
+        logger.error(f"[Core]获取群列表失败: {e}")
+        await send_private_msg(websocket, OWNER_ID, f"[Core]获取群列表失败: {e}")
+
+
+# 定时刷新群列表
+SCHEDULED_JOBS = [
+    {
+        "name": "refresh_group_list",
+        "func": scheduled_refresh_group_list,
+        "interval": REQUEST_INTERVAL,
+    },
+]
+
+
+async def handle_events(websocket, msg):
+    """
+    群名变更时立即刷新群列表
+    """
     try:
-        current_time = int(time.time())
-        # 检查距离上次请求是否已超过指定时间
-        if current_time - last_request_time >= REQUEST_INTERVAL:
-            # 发送获取群列表的请求
-            await get_group_list(websocket, no_cache=True)
-            last_request_time = current_time
-
-        # 如果有修改群名的通知
-        if msg.get("sub_type") == "group_name":
-            # 发送获取群列表的请求
-            await get_group_list(websocket, no_cache=True)
-            last_request_time = current_time
-
-        if msg.get("status") == "ok":
-            echo = msg.get("echo", "")
-            if echo == "get_group_list":
-                # 保存data
-                save_group_list_to_file(msg.get("data", []))
-                logger.success(f"[Core]已保存群列表")
+        if msg.get("sub_type") != "group_name":
+            return
+        # 通知中带有新群名时直接更新，否则重新获取群列表
+        group_id = msg.get("group_id")
+        name_new = msg.get("name_new")
+        if name_new is not None and group_id in group_directory:
+            group_directory.update_group(group_id, group_name=name_new)
+        else:
+            await refresh_group_list(websocket)
     except Exception as e:
         logger.error(f"[Core]获取群列表失败: {e}")
         await send_private_msg(websocket, OWNER_ID, f"[Core]获取群列表失败: {e}")
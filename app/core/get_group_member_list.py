@@ -1,32 +1,50 @@
+"""
+群成员列表
+群成员存储在 data/Core/group_member.db 中（见core/member_store.py），
+进群、退群、群名片、管理员、禁言通知直接增量更新，定时全量刷新只用于校正
+全量刷新时，成员数量与群列表不一致的群优先刷新，其余的群均匀分散在刷新间隔内，
+同时进行的请求数量不超过 GROUP_MEMBER_REFRESH_CONCURRENCY
+"""
+
 import asyncio
-import re
 import logger
-from config import OWNER_ID
-from api.group import get_group_member_list
+from config import (
+    OWNER_ID,
+    GROUP_MEMBER_REFRESH_INTERVAL,
+    GROUP_MEMBER_REFRESH_CONCURRENCY,
+)
+from api.group import get_group_member_list, get_group_member_info
 from api.message import send_private_msg
-import os
-import json
-import time
-from .get_group_list import get_all_group_ids
+from .get_group_list import get_all_group_ids, get_group_member_count, group_directory
+from .get_group_list import get_group_name_by_id as get_name_from_list
+from .member_store import MemberStore
+from .member_search import MemberSearch, MATCH_FUZZY
+from utils.metrics import metrics
 
-DATA_DIR = os.path.join("data", "Core", "group_member_list")
+# 订阅群成员变化的通知
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "notice", "notice_type": "group_increase"},
+    {"post_type": "notice", "notice_type": "group_decrease"},
+    {"post_type": "notice", "notice_type": "group_card"},
+    {"post_type": "notice", "notice_type": "group_admin"},
+    {"post_type": "notice", "notice_type": "group_ban"},
+]
 
-# 全局变量，记录上次请求时间
-last_request_time = 0
-REQUEST_INTERVAL = 300  # 5分钟，单位：秒
+# 成员数量未变化的群分散在刷新间隔的这一比例内刷新，留出余量避免与下一次刷新重叠
+REFRESH_SPREAD_RATIO = 0.8
 
+# 全量刷新前等待群列表首次更新的最长时间，单位：秒
+# 与刷新群列表同时在连接后执行，群列表未更新时首次启动没有群号可以刷新
+GROUP_LIST_WAIT_TIMEOUT = 60
 
-def save_group_member_list_to_file(group_id, data):
-    """
-    保存群成员列表信息到文件，确保文件夹存在
-    """
-    # 文件路径
-    file_path = os.path.join(DATA_DIR, f"{group_id}.json")
-    # 确保文件夹存在
-    os.makedirs(DATA_DIR, exist_ok=True)
-    # 保存数据
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+_store = MemberStore()
+_store.import_json_members()
+# 启动时建立反向索引，避免首次查询时阻塞事件循环
+_store.build_user_index()
+# 所有群的名称索引较大，在后台线程中建立
+_search = MemberSearch(_store)
+_search.start_global_index_build()
+metrics.register_gauge("member_cache_members", _store.cached_member_count)
 
 
 def get_group_member_user_ids(group_id):
@@ -40,85 +58,125 @@ def get_group_member_user_ids(group_id):
         list: QQ号列表，如果找不到则返回空列表，QQ号是str类型
     """
     try:
-        # 确保群号是字符串格式
-        group_id = str(group_id)
+        return _store.get_user_ids(group_id)
+    except Exception as e:
+        logger.error(f"[Core]获取群成员QQ号列表失败: {e}")
+        return []
 
-        # 构建文件路径
-        file_path = os.path.join(DATA_DIR, f"{group_id}.json")
 
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            logger.warning(f"[Core]群成员列表文件不存在: {file_path}")
-            return []
+def get_group_member(group_id, user_id):
+    """
+    获取单个群成员的信息
 
-        # 读取群成员列表文件
-        with open(file_path, "r", encoding="utf-8") as f:
-            member_list = json.load(f)
+    Args:
+        group_id (str或int): 群号
+        user_id (str或int): QQ号
 
-        # 提取所有成员的QQ号
-        user_ids = []
-        for member in member_list:
-            user_id = member.get("user_id")
-            if user_id:
-                user_ids.append(str(user_id))
+    Returns:
+        dict: 成员信息，字段见 core/member_store.py 的 MEMBER_FIELDS，不在群中时返回None
+    """
+    try:
+        member = _store.get_member(group_id, user_id)
+        return member.to_dict() if member else None
+    except Exception as e:
+        logger.error(f"[Core]获取群成员信息失败: {e}")
+        return None
 
-        logger.info(
-            f"[Core]成功获取群 {group_id} 的成员QQ号列表，共 {len(user_ids)} 个成员"
-        )
-        return user_ids
 
+def get_group_members(group_id):
+    """
+    获取群的所有成员，成员对象的字段见 core/member_store.py 的 GroupMember
+
+    Args:
+        group_id (str或int): 群号
+
+    Returns:
+        dict: {QQ号: GroupMember}，请勿修改，找不到则返回空字典
+    """
+    try:
+        return _store.get_group_members(group_id)
     except Exception as e:
-        logger.error(f"[Core]获取群成员QQ号列表失败: {e}")
-        return []
+        logger.error(f"[Core]获取群成员失败: {e}")
+        return {}
 
 
-def get_group_name_by_id(group_id):
+def get_member_memory_stats():
+    """
+    统计内存中群成员缓存占用的内存
+
+    Returns:
+        dict: {"groups_loaded": 已加载的群数, "members": 成员数, "bytes": 占用字节数}
+    """
+    return _store.memory_stats()
+
+
+def get_user_group_ids(user_id):
     """
-    根据群号获取群名
+    获取用户所在的所有群号，用于全局黑名单等跨群查询
 
     Args:
-        group_id (str或int): 群号
+        user_id (str或int): QQ号
 
     Returns:
-        str: 群名称，如果找不到则返回None
+        frozenset: 群号集合，群号是str类型
     """
     try:
-        # 确保群号是字符串格式
-        group_id = str(group_id)
+        return _store.get_user_groups(user_id)
+    except Exception as e:
+        logger.error(f"[Core]获取用户所在群失败: {e}")
+        return frozenset()
 
-        # 构建文件路径
-        file_path = os.path.join(DATA_DIR, f"{group_id}.json")
 
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            logger.warning(f"[Core]群成员列表文件不存在: {file_path}")
-            return None
+def search_group_members(group_id, query, mode=MATCH_FUZZY, limit=10):
+    """
+    在群中按群名片或昵称查找成员，不区分大小写
 
-        # 读取群成员列表文件
-        with open(file_path, "r", encoding="utf-8") as f:
-            member_list = json.load(f)
+    Args:
+        group_id (str或int): 群号
+        query (str): 查找的名称
+        mode (str): 匹配方式，exact（精确）、prefix（前缀）或 fuzzy（模糊，按匹配程度排序）
+        limit (int): 最多返回的成员数
 
-        # 从第一个成员中获取群号，验证是否匹配
-        if member_list and len(member_list) > 0:
-            stored_group_id = str(member_list[0].get("group_id", ""))
-            if stored_group_id == group_id:
-                # 这里需要从群列表中获取群名，而不是从成员列表
-                # 成员列表中没有群名信息，需要调用群列表相关函数
-                from .get_group_list import get_group_name_by_id as get_name_from_list
+    Returns:
+        list: GroupMember列表，找不到则返回空列表
+    """
+    try:
+        return _search.search(group_id, query, mode, limit)
+    except Exception as e:
+        logger.error(f"[Core]查找群成员失败: {e}")
+        return []
 
-                return get_name_from_list(group_id)
 
-        logger.warning(f"[Core]未找到群号 {group_id} 对应的群成员信息")
-        return None
+def search_members(query, mode=MATCH_FUZZY, limit=10):
+    """
+    在所有群中按群名片或昵称查找成员，参数同 search_group_members
 
+    Returns:
+        list: (群号, GroupMember) 列表，找不到或启动后索引还未建立完成时返回空列表
+    """
+    try:
+        return _search.search_global(query, mode, limit)
     except Exception as e:
-        logger.error(f"[Core]获取群名失败: {e}")
-        return None
+        logger.error(f"[Core]查找群成员失败: {e}")
+        return []
 
 
-async def handle_events(websocket, msg):
+def get_group_name_by_id(group_id):
     """
-    处理群成员列表回应事件
+    根据群号获取群名，与 core.get_group_list.get_group_name_by_id 相同
+
+    Args:
+        group_id (str或int): 群号
+
+    Returns:
+        str: 群名称，如果找不到则返回None
+    """
+    return get_name_from_list(group_id)
+
+
+async def refresh_group_member_list(websocket, group_id):
+    """
+    请求群成员列表并保存到文件
     响应示例（群成员列表）:
     {
         "status": "ok",              # 状态，"ok"表示成功
@@ -150,46 +208,161 @@ async def handle_events(websocket, msg):
         "echo": null                  # 回显字段，用于请求和响应的匹配
     }
     """
-    global last_request_time
+    response = await get_group_member_list(websocket, group_id)
+    if not response or response.get("status") != "ok":
+        return
+    if response.get("data", []):
+        # 只写入有变化的成员
+        changed, removed = _store.sync_group(group_id, response.get("data", []))
+        if changed or removed:
+            logger.success(
+                f"[Core]已同步群 {group_id} 的成员列表，"
+                f"更新 {len(changed)} 人，移除 {len(removed)} 人"
+            )
+    else:
+        logger.warning(
+            f"[Core]群 {group_id} 的成员列表为空，跳过保存，可能是机器人非管理员"
+        )
+
+
+async def refresh_group_member(websocket, group_id, user_id):
+    """
+    请求单个群成员的信息并保存
+    """
+    response = await get_group_member_info(websocket, group_id, user_id, True)
+    if response and response.get("status") == "ok" and response.get("data"):
+        _store.upsert_member(group_id, {**response["data"], "user_id": user_id})
+
+
+def get_refresh_plan():
+    """
+    获取全量刷新的顺序
+    返回值: (需要优先刷新的群号列表, 成员数量未变化的群号列表)
+    群列表中的成员数量与已保存的成员数量不一致（包括还没有保存过成员）的群需要优先刷新
+    """
+    stored_counts = _store.count_members()
+    urgent, normal = [], []
+    for group_id in get_all_group_ids():
+        if get_group_member_count(group_id) == stored_counts[group_id]:
+            normal.append(group_id)
+        else:
+            urgent.append(group_id)
+    return urgent, normal
+
+
+async def _refresh_with_limit(semaphore, websocket, group_id):
+    """
+    刷新群成员列表，完成后释放并发名额
+    """
+    try:
+        await refresh_group_member_list(websocket, group_id)
+    except Exception as e:
+        logger.error(f"[Core]刷新群 {group_id} 成员列表失败: {e}")
+    finally:
+        semaphore.release()
+
+
+async def refresh_all_group_member_list(websocket):
+    """
+    定时全量刷新所有群的成员列表，校正通知遗漏的变化
+    """
     try:
-        current_time = int(time.time())
-        # 检查距离上次请求是否已超过指定时间
-        if current_time - last_request_time >= REQUEST_INTERVAL:
-            # 直接发送获取所有群的群成员信息请求
-            group_ids = get_all_group_ids()
-            for group_id in group_ids:
-                await get_group_member_list(websocket, group_id)
-            last_request_time = current_time
-
-        # 群通知事件
-        # 如果有进群退群的通知（系统触发，不受请求间隔限制）
-        if (
-            msg.get("notice_type") == "group_increase"
-            or msg.get("notice_type") == "group_decrease"
-        ):
-            group_id = str(msg.get("group_id"))
-            # 发送获取该群的群成员列表的请求
-            await get_group_member_list(websocket, group_id)
-
-        # 回应消息事件
-        if msg.get("status") == "ok":
-            echo = msg.get("echo", "")
-            if echo.startswith("get_group_member_list"):
-                # 正则提取group_id
-                group_id = re.search(r"group_id=(\d+)", echo)
-                if group_id:
-                    if msg.get("data", []):
-                        # 保存data
-                        save_group_member_list_to_file(
-                            group_id.group(1), msg.get("data", [])
-                        )
-                        logger.success(f"[Core]已保存群 {group_id.group(1)} 的成员列表")
-                    else:
-                        logger.warning(
-                            f"[Core]群 {group_id.group(1)} 的成员列表为空，跳过保存，可能是机器人非管理员"
-                        )
-                else:
-                    logger.error(f"[Core]无法提取群号: {echo}")
+        if not await group_directory.wait_refreshed(GROUP_LIST_WAIT_TIMEOUT):
+            logger.warning(
+                f"[Core]{GROUP_LIST_WAIT_TIMEOUT}秒内未获取到群列表，使用本地保存的群列表刷新群成员"
+            )
+        urgent, normal = get_refresh_plan()
+        if not urgent and not normal:
+            return
+        logger.info(
+            f"[Core]开始全量刷新群成员列表，优先刷新 {len(urgent)} 个群，"
+            f"其余 {len(normal)} 个群分散刷新"
+        )
+        semaphore = asyncio.Semaphore(max(1, GROUP_MEMBER_REFRESH_CONCURRENCY))
+        spacing = (
+            GROUP_MEMBER_REFRESH_INTERVAL * REFRESH_SPREAD_RATIO / len(normal)
+            if normal
+            else 0
+        )
+        tasks = []
+        try:
+            for index, group_id in enumerate(urgent + normal):
+                # 成员数量未变化的群依次间隔发出请求
+                if index >= len(urgent) and index > 0:
+                    await asyncio.sleep(spacing)
+                await semaphore.acquire()
+                tasks.append(
+                    asyncio.create_task(
+                        _refresh_with_limit(semaphore, websocket, group_id)
+                    )
+                )
+            await asyncio.gather(*tasks)
+        finally:
+            # 中途被取消（如连接断开）时，取消已发出的刷新，不在已关闭的连接上继续执行
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        stored_counts = _store.count_members()
+        stats = get_member_memory_stats()
+        logger.info(
+            f"[Core]全量刷新群成员列表完成，共保存 {len(stored_counts)} 个群，"
+            f"{sum(stored_counts.values())} 人；内存缓存已加载 {stats['groups_loaded']} 个群，"
+            f"{stats['members']} 人，占用 {stats['bytes'] / 1024 / 1024:.1f} MB"
+        )
     except Exception as e:
         logger.error(f"[Core]获取群成员列表失败: {e}")
         await send_private_msg(websocket, OWNER_ID, f"[Core]获取群成员列表失败: {e}")
+
+
+# 定时全量刷新所有群的成员列表，与刷新群列表错开
+SCHEDULED_JOBS = [
+    {
+        "name": "refresh_all_group_member_list",
+        "func": refresh_all_group_member_list,
+        "interval": GROUP_MEMBER_REFRESH_INTERVAL,
+        "jitter": 30,
+    },
+]
+
+
+async def handle_events(websocket, msg):
+    """
+    根据群成员变化的通知增量更新群成员
+    """
+    try:
+        notice_type = msg.get("notice_type")
+        sub_type = msg.get("sub_type")
+        group_id = str(msg.get("group_id"))
+        user_id = str(msg.get("user_id"))
+        is_self = user_id == str(msg.get("self_id"))
+
+        if notice_type == "group_increase":
+            if is_self:
+                # 机器人进群，获取该群完整的成员列表
+                await refresh_group_member_list(websocket, group_id)
+                return
+            # 先记录进群，再获取该成员的详细信息
+            _store.upsert_member(
+                group_id, {"user_id": user_id, "join_time": msg.get("time")}
+            )
+            await refresh_group_member(websocket, group_id, user_id)
+        elif notice_type == "group_decrease":
+            if is_self or sub_type == "kick_me":
+                _store.remove_group(group_id)
+            else:
+                _store.remove_member(group_id, user_id)
+        elif notice_type == "group_card":
+            _store.update_member(group_id, user_id, card=msg.get("card_new", ""))
+        elif notice_type == "group_admin":
+            role = "admin" if sub_type == "set" else "member"
+            _store.update_member(group_id, user_id, role=role)
+        elif notice_type == "group_ban" and user_id != "0":
+            # user_id为0表示全员禁言
+            shut_up_timestamp = (
+                int(msg.get("time", 0)) + int(msg.get("duration", 0))
+                if sub_type == "ban"
+                else 0
+            )
+            _store.update_member(group_id, user_id, shut_up_timestamp=shut_up_timestamp)
+    except Exception as e:
+        logger.error(f"[Core]更新群成员失败: {e}")
@@ -0,0 +1,379 @@
+"""
+群成员名称搜索
+按群名片和昵称查找群成员，支持精确、前缀和模糊匹配，可以在单个群或所有群中查找
+每个群的索引在首次查找时从成员缓存建立，所有群的索引在启动时由后台线程直接从数据库建立，
+之后随成员变化（进群、退群、群名片变更、新群首次同步等）增量更新，
+所有群的索引建立完成前在所有群中查找返回空列表
+名称比较不区分大小写
+"""
+
+import time
+import heapq
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from operator import itemgetter
+import logger
+
+MATCH_EXACT = "exact"
+MATCH_PREFIX = "prefix"
+MATCH_FUZZY = "fuzzy"
+
+# 模糊匹配的最低相似度，按二元组计算 Dice 系数
+FUZZY_MIN_SCORE = 0.4
+
+# 批量建立索引时每块排序的名称数量
+SORT_CHUNK_SIZE = 20000
+
+
+def normalize_name(name):
+    """
+    统一名称格式，去掉首尾空白并忽略大小写
+    """
+    return name.strip().casefold()
+
+
+def get_bigrams(name):
+    """
+    获取名称的二元组集合，单个字的名称返回自身
+    """
+    if len(name) < 2:
+        return {name} if name else set()
+    return {name[index : index + 2] for index in range(len(name) - 1)}
+
+
+class NameIndex:
+    """
+    名称索引，每个键可以有多个名称（群名片和昵称），多个键也可以有相同的名称
+    精确匹配使用字典，前缀匹配使用有序列表二分查找，
+    模糊匹配使用 二元组 -> 名称 的倒排索引，按共享的二元组数量直接计算相似度
+    """
+
+    def __init__(self):
+        # 键 -> 名称元组
+        self._names = {}
+        # 名称 -> 键元组，使用不可变的元组，建立后不需要垃圾回收扫描
+        self._exact = {}
+        # 按名称排序的 (名称, 键) 列表，名称相同的项顺序不定
+        self._sorted = []
+        # 二元组 -> 名称集合
+        self._grams = defaultdict(set)
+        # 名称 -> 二元组数量
+        self._gram_counts = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def keys(self):
+        return self._names.keys()
+
+    def add(self, key, names):
+        """
+        添加或更新键的名称
+        """
+        for name in self._set_names(key, names):
+            insort(self._sorted, (name, key))
+
+    def add_many(self, items):
+        """
+        批量添加 (键, 名称) ，最后统一排序，建立较大的索引时使用
+        """
+        pairs = [
+            (name, key) for key, names in items for name in self._set_names(key, names)
+        ]
+        if not pairs:
+            return
+        # 分块排序后归并，排序时不会长时间占用GIL，在后台线程建立时不阻塞事件循环
+        chunks = [self._sorted] + [
+            sorted(pairs[start : start + SORT_CHUNK_SIZE], key=itemgetter(0))
+            for start in range(0, len(pairs), SORT_CHUNK_SIZE)
+        ]
+        self._sorted = list(heapq.merge(*chunks, key=itemgetter(0)))
+
+    def _set_names(self, key, names):
+        """
+        更新键的名称和精确、二元组索引
+        返回值: 需要加入有序列表的名称，名称未变化时为空
+        """
+        names = tuple(
+            sorted({normalize_name(name) for name in names if name and name.strip()})
+        )
+        if self._names.get(key) == names:
+            return ()
+        self.remove(key)
+        if not names:
+            return ()
+        self._names[key] = names
+        for name in names:
+            keys = self._exact.get(name)
+            if keys is not None:
+                self._exact[name] = keys + (key,)
+                continue
+            self._exact[name] = (key,)
+            grams = get_bigrams(name)
+            self._gram_counts[name] = len(grams)
+            for gram in grams:
+                self._grams[gram].add(name)
+        return names
+
+    def remove(self, key):
+        """
+        移除键
+        """
+        names = self._names.pop(key, None)
+        if not names:
+            return
+        for name in names:
+            # 相同名称的项相邻，从第一项开始查找
+            index = bisect_left(self._sorted, (name,))
+            while index < len(self._sorted) and self._sorted[index][0] == name:
+                if self._sorted[index][1] == key:
+                    del self._sorted[index]
+                    break
+                index += 1
+            keys = tuple(other for other in self._exact[name] if other != key)
+            if keys:
+                self._exact[name] = keys
+                continue
+            # 没有键使用的名称从二元组索引中移除
+            del self._exact[name]
+            del self._gram_counts[name]
+            for gram in get_bigrams(name):
+                names_with_gram = self._grams[gram]
+                names_with_gram.discard(name)
+                if not names_with_gram:
+                    del self._grams[gram]
+
+    def exact(self, query):
+        """
+        精确匹配
+        """
+        return list(self._exact.get(normalize_name(query), ()))
+
+    def prefix(self, query, limit):
+        """
+        前缀匹配，按名称排序
+        """
+        query = normalize_name(query)
+        keys = []
+        index = bisect_left(self._sorted, (query,))
+        while index < len(self._sorted) and len(keys) < limit:
+            name, key = self._sorted[index]
+            if not name.startswith(query):
+                break
+            if key not in keys:
+                keys.append(key)
+            index += 1
+        return keys
+
+    def fuzzy(self, query, limit):
+        """
+        模糊匹配，按匹配程度排序：精确 > 前缀 > 包含 > 二元组相似度
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        if len(query) < 2:
+            # 单个字无法使用二元组索引，只查找以该字开头的名称（完全相同的排在最前），
+            # 不扫描所有名称
+            return self.prefix(query, limit)
+        query_grams = get_bigrams(query)
+        shared_counts = Counter()
+        for gram in query_grams:
+            shared_counts.update(self._grams.get(gram, ()))
+
+        # 键 -> 最高匹配程度
+        scores = {}
+        for name, shared in shared_counts.items():
+            score = _score(query, len(query_grams), name, shared, self._gram_counts)
+            if score < FUZZY_MIN_SCORE:
+                continue
+            for key in self._exact[name]:
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+    def search(self, query, mode=MATCH_FUZZY, limit=10):
+        """
+        按匹配方式查找，返回键列表
+        """
+        if mode == MATCH_EXACT:
+            return self.exact(query)[:limit]
+        if mode == MATCH_PREFIX:
+            return self.prefix(query, limit)
+        if mode == MATCH_FUZZY:
+            return self.fuzzy(query, limit)
+        raise ValueError(f"未知的匹配方式: {mode}")
+
+
+def _score(query, query_gram_count, name, shared, gram_counts):
+    """
+    计算名称与查询的匹配程度
+    包含查询的名称必然包含查询的所有二元组，只有这时才需要比较字符串
+    """
+    if shared >= query_gram_count and query in name:
+        if name == query:
+            return 3
+        if name.startswith(query):
+            return 2
+        return 1 + len(query) / len(name) / 2
+    return 2 * shared / (query_gram_count + gram_counts[name])
+
+
+def _build_global_index(rows):
+    """
+    用 (群号, QQ号, 群名片, 昵称) 建立全局索引
+    返回值: (NameIndex, 群号 -> QQ号集合)
+    """
+    index = NameIndex()
+    index.add_many(
+        ((group_id, user_id), (card, nickname))
+        for group_id, user_id, card, nickname in rows
+    )
+    groups = defaultdict(set)
+    for group_id, user_id in index.keys():
+        groups[group_id].add(user_id)
+    return index, groups
+
+
+class MemberSearch:
+    """
+    群成员名称搜索
+    单个群的索引以QQ号为键，全局索引以 (群号, QQ号) 为键
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # 群号 -> NameIndex
+        self._group_indexes = {}
+        self._global_index = None
+        # 群号 -> 全局索引中该群的QQ号集合，整个群被移除时使用
+        self._global_groups = None
+        # 后台建立全局索引的线程及结果
+        self._build_thread = None
+        self._built = None
+        # 后台建立期间的成员变化，建立完成后按顺序补上
+        self._pending_changes = []
+        store.add_listener(self._on_member_change)
+
+    def start_global_index_build(self):
+        """
+        在后台线程中直接从数据库建立所有群的索引，不阻塞事件循环，也不加载成员缓存
+        """
+        if self._global_index is not None or self._build_thread is not None:
+            return
+        self._build_thread = threading.Thread(
+            target=self._build_in_thread, name="member-search-index", daemon=True
+        )
+        self._build_thread.start()
+
+    def _build_in_thread(self):
+        start_time = time.monotonic()
+        try:
+            # 使用单独的数据库连接，WAL模式下读取不影响主线程写入
+            conn = sqlite3.connect(self.store.db_path)
+            try:
+                rows = self.store.get_all_member_names(conn)
+            finally:
+                conn.close()
+            self._built = _build_global_index(rows)
+            logger.info(
+                f"[Core]群成员名称索引已建立，共 {len(self._built[0])} 人次，"
+                f"耗时 {time.monotonic() - start_time:.1f} 秒"
+            )
+        except Exception as e:
+            logger.error(f"[Core]后台建立群成员名称索引失败，将在下次查找时重试: {e}")
+
+    def _install_global_index(self):
+        """
+        后台建立完成后启用全局索引，并补上建立期间的成员变化
+        不等待建立完成，也不在事件循环中建立，后台建立失败时下次查找时重新启动
+        返回值: 全局索引是否可用
+        """
+        if self._global_index is not None:
+            return True
+        if self._build_thread is None or self._build_thread.is_alive():
+            return False
+        self._build_thread = None
+        if self._built is None:
+            # 建立失败，重新建立时会从数据库读取，之前的变化不再需要补上
+            self._pending_changes = []
+            return False
+        self._global_index, self._global_groups = self._built
+        self._built = None
+        pending, self._pending_changes = self._pending_changes, []
+        for change in pending:
+            self._apply_global_change(*change)
+        return True
+
+    def _on_member_change(self, group_id, user_id, member):
+        """
+        成员变化时更新已建立的索引
+        """
+        names = (member.card, member.nickname) if member is not None else None
+        if user_id is None:
+            # 整个群被移除
+            self._group_indexes.pop(group_id, None)
+        else:
+            group_index = self._group_indexes.get(group_id)
+            if group_index is not None:
+                group_index.add(user_id, names or ())
+
+        if self._install_global_index():
+            self._apply_global_change(group_id, user_id, names)
+        elif self._build_thread is not None:
+            self._pending_changes.append((group_id, user_id, names))
+
+    def _apply_global_change(self, group_id, user_id, names):
+        """
+        更新全局索引，user_id为None表示整个群被移除，names为None表示成员被移除
+        """
+        if user_id is None:
+            for user_id in self._global_groups.pop(group_id, ()):
+                self._global_index.remove((group_id, user_id))
+            return
+        self._global_index.add((group_id, user_id), names or ())
+        if names is not None:
+            self._global_groups[group_id].add(user_id)
+        elif group_id in self._global_groups:
+            self._global_groups[group_id].discard(user_id)
+
+    def _get_group_index(self, group_id):
+        group_id = str(group_id)
+        index = self._group_indexes.get(group_id)
+        if index is None:
+            index = self._group_indexes[group_id] = NameIndex()
+            index.add_many(
+                (user_id, (member.card, member.nickname))
+                for user_id, member in self.store.get_group_members(group_id).items()
+            )
+        return index
+
+    def search(self, group_id, query, mode=MATCH_FUZZY, limit=10):
+        """
+        在单个群中按群名片或昵称查找成员
+        返回值: GroupMember列表
+        """
+        members = self.store.get_group_members(group_id)
+        return [
+            members[user_id]
+            for user_id in self._get_group_index(group_id).search(query, mode, limit)
+            if user_id in members
+        ]
+
+    def search_global(self, query, mode=MATCH_FUZZY, limit=10):
+        """
+        在所有群中按群名片或昵称查找成员
+        全局索引还在后台建立时返回空列表，不阻塞事件循环
+        返回值: (群号, GroupMember) 列表
+        """
+        if not self._install_global_index():
+            self.start_global_index_build()
+            return []
+        results = []
+        for group_id, user_id in self._global_index.search(query, mode, limit):
+            member = self.store.get_group_members(group_id).get(user_id)
+            if member is not None:
+                results.append((group_id, member))
+        return results
@@ -0,0 +1,461 @@
+"""
+群成员存储
+所有群的成员存储在 data/Core/group_member.db（SQLite，WAL模式）中，以 (group_id, user_id) 为主键
+进群、退群、群名片、管理员、禁言等通知直接增量更新单个成员，
+定时全量刷新时只写入有变化的成员
+内存中维护 QQ号 -> 所在群号集合 的反向索引，跨群查询用户所在的群为O(1)
+各群成员在首次查询时从数据库加载到内存，使用 __slots__ 的 GroupMember 保存，
+角色、性别、等级等取值有限的字符串共享同一对象，之后随成员变化增量更新
+成员变化时通知监听器（包括尚未加载到内存的群），参数为 (群号, QQ号, GroupMember)，
+成员移除时为None，整个群被移除时QQ号和成员都为None
+首次启动时自动导入原有的 data/Core/group_member_list/<群号>.json
+"""
+
+import os
+import sys
+import json
+import logger
+from collections import Counter, defaultdict
+from .sqlite_store import SQLiteStore
+
+MEMBER_DB_PATH = os.path.join("data", "Core", "group_member.db")
+
+# 原群成员列表目录，首次启动时导入
+MEMBER_JSON_DIR = os.path.join("data", "Core", "group_member_list")
+
+# 保存的成员字段，其余字段（年龄、地区、QQ等级等）不保存
+# 最后发言时间变化频繁，保存后每次全量刷新几乎都要重写所有成员，因此也不保存
+MEMBER_FIELDS = (
+    "nickname",
+    "card",
+    "role",
+    "sex",
+    "level",
+    "title",
+    "join_time",
+    "shut_up_timestamp",
+)
+
+# 各字段的默认值
+MEMBER_DEFAULTS = {
+    "nickname": "",
+    "card": "",
+    "role": "member",
+    "sex": "unknown",
+    "level": "",
+    "title": "",
+    "join_time": 0,
+    "shut_up_timestamp": 0,
+}
+
+
+# 取值有限的字段，加载到内存时共享同一字符串对象
+INTERNED_FIELDS = ("role", "sex", "level")
+
+
+def member_to_row(member):
+    """
+    将get_group_member_list响应中的成员转换为字段元组，顺序同 MEMBER_FIELDS
+    """
+    return tuple(
+        (
+            str(member.get(field) or MEMBER_DEFAULTS[field])
+            if isinstance(MEMBER_DEFAULTS[field], str)
+            else int(member.get(field) or 0)
+        )
+        for field in MEMBER_FIELDS
+    )
+
+
+class GroupMember:
+    """
+    内存中的群成员，只保存 MEMBER_FIELDS 中的字段
+    """
+
+    __slots__ = ("user_id",) + MEMBER_FIELDS
+
+    def __init__(self, user_id, row):
+        # 同一用户在多个群中共享同一QQ号字符串
+        self.user_id = sys.intern(user_id)
+        for field, value in zip(MEMBER_FIELDS, row):
+            self.set(field, value)
+
+    def set(self, field, value):
+        """
+        设置字段，取值有限的字段共享同一字符串对象
+        """
+        if field in INTERNED_FIELDS:
+            value = sys.intern(value)
+        setattr(self, field, value)
+
+    @property
+    def display_name(self):
+        """
+        群名片，未设置时为昵称
+        """
+        return self.card or self.nickname
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"GroupMember({self.to_dict()})"
+
+
+class MemberStore(SQLiteStore):
+    def __init__(self, db_path=MEMBER_DB_PATH):
+        super().__init__(db_path)
+        # 群号 -> 上一次全量同步的成员哈希，成员列表未变化时跳过比对和写入，增量更新后失效
+        self._group_hashes = {}
+        # QQ号 -> 所在群号集合，从数据库建立后随成员变化增量更新
+        self._user_groups = None
+        # 群号 -> {QQ号: GroupMember}，只包含已加载的群
+        self._groups = {}
+        self._listeners = []
+        columns = ", ".join(MEMBER_FIELDS)
+        placeholders = ", ".join("?" for _ in MEMBER_FIELDS)
+        self._select_sql = f"SELECT user_id, {columns} FROM group_member"
+        self._upsert_sql = (
+            f"INSERT OR REPLACE INTO group_member (group_id, user_id, {columns}) "
+            f"VALUES (?, ?, {placeholders})"
+        )
+        # 导入原有文件时不覆盖已有的成员
+        self._import_sql = self._upsert_sql.replace("OR REPLACE", "OR IGNORE", 1)
+
+    def _create_table(self):
+        """建表函数，如果表不存在则创建"""
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS group_member (
+                group_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                nickname TEXT NOT NULL,
+                card TEXT NOT NULL,
+                role TEXT NOT NULL,
+                sex TEXT NOT NULL,
+                level TEXT NOT NULL,
+                title TEXT NOT NULL,
+                join_time INTEGER NOT NULL,
+                shut_up_timestamp INTEGER NOT NULL,
+                PRIMARY KEY (group_id, user_id)
+            ) WITHOUT ROWID"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_group_member_user "
+                "ON group_member (user_id, group_id)"
+            )
+
+    def import_json_members(self, json_dir=MEMBER_JSON_DIR):
+        """
+        导入原有的群成员列表文件，只在首次启动时执行一次
+        原文件保留不删除，导入后不再读取
+        """
+
+        def import_members():
+            imported = 0
+            if not os.path.isdir(json_dir):
+                return imported
+            for file_name in sorted(os.listdir(json_dir)):
+                group_id, ext = os.path.splitext(file_name)
+                if ext != ".json":
+                    continue
+                try:
+                    with open(
+                        os.path.join(json_dir, file_name), "r", encoding="utf-8"
+                    ) as f:
+                        members = json.load(f)
+                except (json.JSONDecodeError, IOError) as e:
+                    logger.error(f"[Core]导入群 {group_id} 成员列表失败: {e}")
+                    raise
+                self.conn.executemany(
+                    self._import_sql,
+                    [
+                        (group_id, str(member["user_id"]), *member_to_row(member))
+                        for member in members
+                        if member.get("user_id")
+                    ],
+                )
+                imported += 1
+            return imported
+
+        imported = self.run_json_import(import_members)
+        if imported:
+            logger.success(f"已将 {imported} 个群的成员列表导入群成员数据库")
+
+    def get_group_rows(self, group_id):
+        """
+        获取某群所有成员，返回 {QQ号: 字段元组}，字段顺序同 MEMBER_FIELDS
+        """
+        rows = self.conn.execute(
+            f"{self._select_sql} WHERE group_id = ?", (str(group_id),)
+        ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def get_group_members(self, group_id):
+        """
+        获取某群所有成员，返回 {QQ号: GroupMember}，首次查询时从数据库加载
+        返回的字典和成员对象请勿修改
+        """
+        group_id = str(group_id)
+        members = self._groups.get(group_id)
+        if members is None:
+            members = self._groups[group_id] = {
+                user_id: GroupMember(user_id, row)
+                for user_id, row in self.get_group_rows(group_id).items()
+            }
+        return members
+
+    def get_member(self, group_id, user_id):
+        """
+        获取单个成员，不存在时返回None
+        """
+        return self.get_group_members(group_id).get(str(user_id))
+
+    def get_user_ids(self, group_id):
+        """
+        获取某群所有成员的QQ号
+        """
+        return list(self.get_group_members(group_id))
+
+    def memory_stats(self):
+        """
+        统计已加载到内存的成员占用的内存，字符串按对象去重后计算，耗时与成员数量成正比
+        """
+        size = sys.getsizeof(self._groups)
+        seen = set()
+        members = 0
+        for group_id, group in self._groups.items():
+            size += sys.getsizeof(group_id) + sys.getsizeof(group)
+            for member in group.values():
+                members += 1
+                size += sys.getsizeof(member)
+                for field in GroupMember.__slots__:
+                    value = getattr(member, field)
+                    if id(value) not in seen:
+                        seen.add(id(value))
+                        size += sys.getsizeof(value)
+        return {
+            "groups_loaded": len(self._groups),
+            "members": members,
+            "bytes": size,
+        }
+
+    def cached_member_count(self):
+        """
+        已加载到内存的成员数量
+        """
+        return sum(len(group) for group in self._groups.values())
+
+    def add_listener(self, listener):
+        """
+        注册成员变化监听器
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, group_id, user_id, member):
+        for listener in self._listeners:
+            try:
+                listener(group_id, user_id, member)
+            except Exception as e:
+                logger.error(f"[Core]群成员变化监听器执行失败: {e}")
+
+    def _cache_put(self, group_id, user_id, row):
+        member = GroupMember(user_id, row)
+        group = self._groups.get(group_id)
+        if group is not None:
+            group[user_id] = member
+        self._notify(group_id, user_id, member)
+
+    def _cache_remove(self, group_id, user_id):
+        group = self._groups.get(group_id)
+        if group is not None:
+            group.pop(user_id, None)
+        self._notify(group_id, user_id, None)
+
+    def _get_row(self, group_id, user_id):
+        """
+        从数据库读取单个成员的字段元组，不存在时返回None
+        """
+        row = self.conn.execute(
+            f"{self._select_sql} WHERE group_id = ? AND user_id = ?",
+            (group_id, user_id),
+        ).fetchone()
+        return row[1:] if row else None
+
+    def get_all_member_names(self, conn=None):
+        """
+        获取所有群所有成员的名称，返回 [(群号, QQ号, 群名片, 昵称)]，不加载到内存缓存
+        conn: 在其他线程中读取时传入该线程的数据库连接
+        """
+        return (conn or self.conn).execute(
+            "SELECT group_id, user_id, card, nickname FROM group_member"
+        ).fetchall()
+
+    def get_group_ids(self):
+        """
+        获取所有保存了成员的群号
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT group_id FROM group_member"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def build_user_index(self):
+        """
+        从数据库建立反向索引，未调用时在首次查询时建立
+        """
+        if self._user_groups is not None:
+            return
+        self._user_groups = defaultdict(set)
+        for user_id, group_id in self.conn.execute(
+            "SELECT user_id, group_id FROM group_member"
+        ):
+            self._user_groups[user_id].add(group_id)
+
+    def _index_add(self, group_id, user_ids):
+        if self._user_groups is None:
+            return
+        for user_id in user_ids:
+            self._user_groups[user_id].add(group_id)
+
+    def _index_remove(self, group_id, user_ids):
+        if self._user_groups is None:
+            return
+        for user_id in user_ids:
+            groups = self._user_groups.get(user_id)
+            if groups is None:
+                continue
+            groups.discard(group_id)
+            if not groups:
+                del self._user_groups[user_id]
+
+    def get_user_groups(self, user_id):
+        """
+        获取用户所在的所有群号
+        """
+        self.build_user_index()
+        return frozenset(self._user_groups.get(str(user_id), ()))
+
+    def count_members(self):
+        """
+        获取各群保存的成员数量，返回 {群号: 成员数量}
+        """
+        rows = self.conn.execute(
+            "SELECT group_id, COUNT(*) FROM group_member GROUP BY group_id"
+        ).fetchall()
+        return Counter(dict(rows))
+
+    def upsert_member(self, group_id, member):
+        """
+        新增或整体替换单个成员，member为响应中的成员字典
+        """
+        group_id, user_id = str(group_id), str(member["user_id"])
+        row = member_to_row(member)
+        self._group_hashes.pop(group_id, None)
+        with self.conn:
+            self.conn.execute(self._upsert_sql, (group_id, user_id, *row))
+        self._index_add(group_id, (user_id,))
+        self._cache_put(group_id, user_id, row)
+
+    def update_member(self, group_id, user_id, **fields):
+        """
+        更新单个成员的部分字段
+        返回值: 成员是否存在
+        """
+        fields = {
+            field: value for field, value in fields.items() if field in MEMBER_FIELDS
+        }
+        if not fields:
+            return False
+        self._group_hashes.pop(str(group_id), None)
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self.conn:
+            cursor = self.conn.execute(
+                f"UPDATE group_member SET {assignments} "
+                "WHERE group_id = ? AND user_id = ?",
+                (*fields.values(), str(group_id), str(user_id)),
+            )
+        if cursor.rowcount == 0:
+            return False
+        group_id, user_id = str(group_id), str(user_id)
+        member = self._groups.get(group_id, {}).get(user_id)
+        if member is not None:
+            for field, value in fields.items():
+                member.set(field, value)
+            self._notify(group_id, user_id, member)
+        elif self._listeners:
+            # 群尚未加载时从数据库读取完整字段通知监听器
+            row = self._get_row(group_id, user_id)
+            if row is not None:
+                self._notify(group_id, user_id, GroupMember(user_id, row))
+        return True
+
+    def remove_member(self, group_id, user_id):
+        """
+        移除单个成员
+        """
+        self._group_hashes.pop(str(group_id), None)
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM group_member WHERE group_id = ? AND user_id = ?",
+                (str(group_id), str(user_id)),
+            )
+        self._index_remove(str(group_id), (str(user_id),))
+        self._cache_remove(str(group_id), str(user_id))
+
+    def remove_group(self, group_id):
+        """
+        移除某群的所有成员，机器人退群时使用
+        """
+        group_id = str(group_id)
+        self._group_hashes.pop(group_id, None)
+        user_ids = self.get_user_ids(group_id)
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM group_member WHERE group_id = ?", (group_id,)
+            )
+        self._index_remove(group_id, user_ids)
+        self._groups.pop(group_id, None)
+        self._notify(group_id, None, None)
+
+    def sync_group(self, group_id, members):
+        """
+        用全量成员列表同步某群，只写入有变化的成员，删除已不在群中的成员
+        与上一次同步相比没有变化时直接返回，不读取数据库
+        返回值: (新增或变化的成员 {QQ号: 字段元组}, 移除的QQ号列表)
+        """
+        group_id = str(group_id)
+        new_rows = {
+            str(member["user_id"]): member_to_row(member)
+            for member in members
+            if member.get("user_id")
+        }
+        members_hash = hash(frozenset(new_rows.items()))
+        if self._group_hashes.get(group_id) == members_hash:
+            return {}, []
+
+        old_rows = self.get_group_rows(group_id)
+        changed = {
+            user_id: row
+            for user_id, row in new_rows.items()
+            if old_rows.get(user_id) != row
+        }
+        removed = [user_id for user_id in old_rows if user_id not in new_rows]
+        if changed or removed:
+            with self.conn:
+                self.conn.executemany(
+                    self._upsert_sql,
+                    [(group_id, user_id, *row) for user_id, row in changed.items()],
+                )
+                self.conn.executemany(
+                    "DELETE FROM group_member WHERE group_id = ? AND user_id = ?",
+                    [(group_id, user_id) for user_id in removed],
+                )
+            self._index_add(group_id, changed)
+            self._index_remove(group_id, removed)
+            for user_id, row in changed.items():
+                self._cache_put(group_id, user_id, row)
+            for user_id in removed:
+                self._cache_remove(group_id, user_id)
+        self._group_hashes[group_id] = members_hash
+        return changed, removed
@@ -8,6 +8,11 @@ from api.message import send_group_msg, send_private_msg
 # 菜单命令
 MENU_COMMAND = "menu"
 
+# 只处理消息事件
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "message"},
+]
+
 
 class MenuManager:
     """菜单管理器 - 用于收集和展示所有模块的菜单信息"""
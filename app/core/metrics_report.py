@@ -0,0 +1,37 @@
+"""
+运行指标命令
+管理员私聊发送 metrics 查看各模块、各类事件和API调用的耗时分位数及计数
+"""
+
+import logger
+from utils.auth import is_system_admin
+from utils.generate import generate_reply_message, generate_text_message
+from utils.metrics import metrics
+from api.message import send_private_msg
+
+METRICS_COMMAND = "metrics"
+
+# 只处理私聊消息
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "message", "message_type": "private"},
+]
+
+
+async def handle_events(websocket, message):
+    """
+    处理管理员的 metrics 命令
+    """
+    try:
+        raw_message = message.get("raw_message", "").strip().lower()
+        if raw_message != METRICS_COMMAND:
+            return
+
+        user_id = str(message.get("user_id", ""))
+        if not is_system_admin(user_id):
+            return
+
+        reply_message = generate_reply_message(message.get("message_id", ""))
+        text_message = generate_text_message(metrics.format_report())
+        await send_private_msg(websocket, user_id, [reply_message, text_message])
+    except Exception as e:
+        logger.error(f"[MetricsReport]处理运行指标命令失败: {e}")
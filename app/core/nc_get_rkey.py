@@ -1,3 +1,12 @@
+"""
+rkey缓存
+图片链接中的rkey会过期，转发图片前需要替换为最新的rkey
+rkey按类型缓存在内存中，过期时间由响应中的 time 和 ttl 计算，
+刷新任务按最早的过期时间安排在过期前 REFRESH_AHEAD 秒执行，获取失败时每 RETRY_INTERVAL 秒重试，
+获取到的rkey保存到文件供重启后使用
+replace_rkey 一次扫描完成替换，支持CQ码字符串和消息段数组
+"""
+
 import logger
 from config import OWNER_ID
 from api.key import nc_get_rkey
@@ -9,70 +18,153 @@ import time
 
 DATA_DIR = os.path.join("data", "Core", "nc_get_rkey.json")
 
-# 全局变量，记录上次请求时间
-last_request_time = 0
-REQUEST_INTERVAL = 600  # 10分钟，单位：秒
+# 缓存缺失或获取失败时的重试间隔，单位：秒
+RETRY_INTERVAL = 60
+
+# 在过期前多久刷新，单位：秒
+REFRESH_AHEAD = 300
+
+# 响应中没有ttl时使用的有效期，单位：秒
+DEFAULT_TTL = 600
+
+# 替换图片链接时使用的rkey类型
+IMAGE_RKEY_TYPE = 20
+
+# 包含rkey的CQ图片码
+CQ_IMAGE_RKEY_PATTERN = re.compile(r"\[CQ:image,[^\]]*rkey=[^\]]*\]")
+
+# rkey参数的值，到 , ] & 为止
+RKEY_PARAM_PATTERN = re.compile(r"rkey=[^,\]&]+")
+
+
+class RkeyCache:
+    """
+    按类型缓存rkey，首次使用时从文件加载
+    """
+
+    def __init__(self, data_path=DATA_DIR):
+        self.data_path = data_path
+        # 类型 -> (rkey, 过期时间戳)
+        self._rkeys = None
+
+    def _ensure_loaded(self):
+        if self._rkeys is not None:
+            return
+        self._rkeys = {}
+        if not os.path.exists(self.data_path):
+            return
+        try:
+            with open(self.data_path, "r", encoding="utf-8") as f:
+                self.update(json.load(f))
+        except Exception as e:
+            logger.error(f"读取本地rkey失败: {e}")
+
+    def update(self, data_list):
+        """
+        用nc_get_rkey响应的data更新缓存
+        """
+        if self._rkeys is None:
+            self._rkeys = {}
+        for rkey_item in data_list:
+            rkey = rkey_item.get("rkey")
+            if not rkey:
+                continue
+            # 去掉rkey值开头的&rkey=前缀，只保留实际的rkey值
+            if rkey.startswith("&rkey="):
+                rkey = rkey[6:]
+            try:
+                ttl = int(rkey_item.get("ttl") or DEFAULT_TTL)
+                issued_at = float(rkey_item.get("time") or time.time())
+            except (TypeError, ValueError):
+                ttl, issued_at = DEFAULT_TTL, time.time()
+            self._rkeys[rkey_item.get("type")] = (rkey, issued_at + ttl)
+
+    def get(self, rkey_type=IMAGE_RKEY_TYPE):
+        """
+        获取某类型的rkey，没有时返回None
+        已过期的rkey仍然返回，比原链接中的rkey更可能有效
+        """
+        self._ensure_loaded()
+        item = self._rkeys.get(rkey_type)
+        return item[0] if item else None
+
+    def expires_in(self):
+        """
+        最早过期的rkey距离过期的秒数，没有rkey时返回None
+        """
+        self._ensure_loaded()
+        if not self._rkeys:
+            return None
+        return min(expires_at for _, expires_at in self._rkeys.values()) - time.time()
+
+    def needs_refresh(self):
+        expires_in = self.expires_in()
+        return expires_in is None or expires_in <= REFRESH_AHEAD
+
+
+rkey_cache = RkeyCache()
 
 
-# 如果字符串中有图片（包含rkey），则替换为本地缓存的rkey
 def replace_rkey_match(match):
     """
     替换匹配对象中的rkey参数
     """
-    try:
-        cq_img = match.group(0)
-        # 查找rkey参数
-        rkey_pattern = r"rkey=([^,^\]]+)"
-        rkey_search = re.search(rkey_pattern, cq_img)
-        if rkey_search:
-            # 读取本地rkey
-            with open(DATA_DIR, "r", encoding="utf-8") as f:
-                rkey_json = json.load(f)
-
-            # 只使用type=20的rkey
-            new_rkey = None
-            for rkey_item in rkey_json:
-                if rkey_item.get("type") == 20:
-                    new_rkey = rkey_item.get("rkey")
-                    break
-
-            if new_rkey:
-                # 去掉rkey值开头的&rkey=前缀，只保留实际的rkey值
-                if new_rkey.startswith("&rkey="):
-                    new_rkey = new_rkey[6:]  # 去掉"&rkey="前缀
-
-                # 替换rkey参数
-                new_cq_img = re.sub(rkey_pattern, f"rkey={new_rkey}", cq_img)
-                logger.info(f"替换rkey成功: {new_cq_img}")
-                return new_cq_img
-            else:
-                logger.warning("未找到type=20的rkey，跳过替换")
-    except Exception as e:
-        logger.error(f"本地rkey替换失败: {e}")
-    return match.group(0)
+    rkey = rkey_cache.get()
+    if not rkey:
+        return match.group(0)
+    return RKEY_PARAM_PATTERN.sub(lambda _: f"rkey={rkey}", match.group(0))
 
 
-def replace_rkey(text):
+def _replace_segment_rkey(segment, rkey):
     """
-    在文本中查找并替换所有包含rkey的CQ图片码
+    替换图片消息段链接中的rkey，有变化时返回新的消息段，不修改原消息段
+    """
+    if not isinstance(segment, dict) or segment.get("type") != "image":
+        return segment
+    data = segment.get("data") or {}
+    url = data.get("url")
+    if not isinstance(url, str) or "rkey=" not in url:
+        return segment
+    new_url = RKEY_PARAM_PATTERN.sub(lambda _: f"rkey={rkey}", url)
+    if new_url == url:
+        return segment
+    return {**segment, "data": {**data, "url": new_url}}
+
+
+def replace_rkey(message):
+    """
+    将消息中图片的rkey替换为本地缓存的rkey
     参数:
-        text: str 包含可能的CQ图片码的文本
+        message: str 包含可能的CQ图片码的文本，或消息段数组
     返回:
-        str 替换后的文本
+        替换后的文本或消息段数组，没有需要替换的内容时返回原对象
     """
     try:
-        if not text or not isinstance(text, str):
-            return text
-
-        # 查找所有CQ图片码模式，包含rkey参数的
-        cq_img_pattern = r"\[CQ:image,[^\]]*rkey=[^\]]*\]"
-
-        # 使用re.sub替换所有匹配的图片码
-        result = re.sub(cq_img_pattern, replace_rkey_match, text)
-        return result
+        if not message:
+            return message
+        rkey = rkey_cache.get()
+        if not rkey:
+            return message
+
+        if isinstance(message, str):
+            if "rkey=" not in message:
+                return message
+            replacement = f"rkey={rkey}"
+            return CQ_IMAGE_RKEY_PATTERN.sub(
+                lambda match: RKEY_PARAM_PATTERN.sub(
+                    lambda _: replacement, match.group(0)
+                ),
+                message,
+            )
+
+        if isinstance(message, list):
+            segments = [_replace_segment_rkey(segment, rkey) for segment in message]
+            if all(new is old for new, old in zip(segments, message)):
+                return message
+            return segments
     except Exception as e:
         logger.error(f"替换rkey失败: {e}")
-        return text
+    return message
 
 
 def save_rkey_to_file(data_list):
@@ -86,9 +178,9 @@ def save_rkey_to_file(data_list):
         json.dump(data_list, f, ensure_ascii=False, indent=2)
 
 
-async def handle_events(websocket, msg):
+async def refresh_rkey(websocket):
     """
-    处理回应事件
+    请求rkey，更新缓存并保存到文件
     响应示例:
     {
         "status": "ok",
@@ -106,24 +198,46 @@ async def handle_events(websocket, msg):
         "echo": "string"
     }
     """
-    global last_request_time
+    response = await nc_get_rkey(websocket)
+    if response and response.get("status") == "ok":
+        data_list = response.get("data", [])
+        rkey_cache.update(data_list)
+        save_rkey_to_file(data_list)
+        expires_in = rkey_cache.expires_in()
+        if expires_in is None:
+            logger.warning("获取到的nc_get_rkey为空")
+            return
+        logger.success(f"获取到nc_get_rkey，已保存到文件，{expires_in:.0f}秒后过期")
+
+
+def next_refresh_delay():
+    """
+    距离下一次刷新的秒数：在最早的rkey过期前 REFRESH_AHEAD 秒刷新，
+    缓存缺失或已到刷新时间（即获取失败）时 RETRY_INTERVAL 秒后重试
+    """
+    expires_in = rkey_cache.expires_in()
+    if expires_in is None or expires_in <= REFRESH_AHEAD:
+        return RETRY_INTERVAL
+    return expires_in - REFRESH_AHEAD
+
+
+async def scheduled_refresh_rkey(websocket):
+    """
+    定时刷新rkey，连接后首次执行时缓存仍有效则跳过
+    """
     try:
-        current_time = int(time.time())
-        # 检查距离上次请求是否已超过10分钟
-        if current_time - last_request_time >= REQUEST_INTERVAL:
-            # 发送nc_get_rkey请求
-            await nc_get_rkey(websocket)
-            last_request_time = current_time
-
-        if msg.get("status") == "ok":
-            echo = msg.get("echo", "")
-            # 格式：nc_get_rkey
-            match = re.search(r"nc_get_rkey", echo)
-            if match:
-                data_list = msg.get("data", [])
-                # 保存到文件
-                save_rkey_to_file(data_list)
-                logger.success(f"获取到nc_get_rkey，已保存到文件")
+        if rkey_cache.needs_refresh():
+            await refresh_rkey(websocket)
     except Exception as e:
         logger.error(f"自动刷新rkey失败: {e}")
         await send_private_msg(websocket, OWNER_ID, f"自动刷新rkey失败: {e}")
+
+
+# 在rkey即将过期时刷新，每次执行后按新的过期时间安排下一次
+SCHEDULED_JOBS = [
+    {
+        "name": "refresh_rkey",
+        "func": scheduled_refresh_rkey,
+        "delay": next_refresh_delay,
+    },
+]
@@ -3,16 +3,26 @@ from config import OWNER_ID
 from api.message import send_private_msg
 from utils.feishu import send_feishu_msg
 import time
+import asyncio
+
+# 订阅元事件（生命周期和心跳）
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "meta_event"},
+]
 
 # 全局变量
 is_online = None  # 初始状态为None
 last_state_change_time = 0
 last_report_time = 0
+last_connect_notify_time = 0  # 上次发送上线通知的时间
+
+# 上线通知的最小间隔（秒），连接反复闪断时不重复通知管理员
+CONNECT_NOTIFY_INTERVAL = 600
 
 
 async def handle_events(websocket, message):
     """处理心跳事件，检测在线状态"""
-    global is_online, last_state_change_time, last_report_time
+    global is_online, last_state_change_time, last_report_time, last_connect_notify_time
 
     try:
         # 处理首次连接事件
@@ -30,6 +40,11 @@ async def handle_events(websocket, message):
                 f"机器人连接成功，当前在线状态: {is_online}，心跳间隔: {message.get('interval', 0)/1000}秒，机器人ID: {message.get('self_id')}，管理员ID: {OWNER_ID}"
             )
 
+            # 间隔时间内重连不再重复通知
+            if time.time() - last_connect_notify_time < CONNECT_NOTIFY_INTERVAL:
+                return
+            last_connect_notify_time = time.time()
+
             # 向管理员发送私聊消息
             try:
                 await send_private_msg(websocket, OWNER_ID, connect_msg)
@@ -74,8 +89,10 @@ async def handle_events(websocket, message):
                 )
 
                 try:
-                    # 发送飞书通知
-                    feishu_result = send_feishu_msg(title, content)
+                    # 发送飞书通知，同步请求放到线程中执行，避免阻塞事件循环
+                    feishu_result = await asyncio.to_thread(
+                        send_feishu_msg, title, content
+                    )
                     if "error" in feishu_result:
                         logger.error(f"发送飞书通知失败: {feishu_result.get('error')}")
 
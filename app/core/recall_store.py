@@ -0,0 +1,102 @@
+"""
+撤回任务存储
+需要持久化的撤回任务存储在 data/Core/del_msg.db（SQLite，WAL模式）中，
+添加和移除任务都只写一行，不再整体重写文件，崩溃时已提交的任务不会丢失
+首次启动时自动导入原有的 del_msg.json
+"""
+
+import os
+import json
+import time
+import logger
+from .sqlite_store import SQLiteStore
+
+RECALL_DB_PATH = os.path.join("data", "Core", "del_msg.db")
+
+# 原撤回任务文件，首次启动时导入
+RECALL_JSON_PATH = os.path.join("data", "Core", "del_msg.json")
+
+
+class RecallStore(SQLiteStore):
+    def __init__(self, db_path=RECALL_DB_PATH):
+        super().__init__(db_path)
+
+    def _create_table(self):
+        """建表函数，如果表不存在则创建"""
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS recall_task (
+                message_id INTEGER PRIMARY KEY,
+                delete_timestamp REAL NOT NULL,
+                del_time REAL NOT NULL
+            )"""
+            )
+
+    def import_json_tasks(self, json_path=RECALL_JSON_PATH):
+        """
+        导入原有的 del_msg.json，只在首次启动时执行一次
+        原文件保留不删除，导入后不再读取
+        """
+
+        def import_tasks():
+            tasks = {}
+            if os.path.isfile(json_path):
+                try:
+                    with open(json_path, "r", encoding="utf-8") as f:
+                        tasks = json.load(f)
+                except (json.JSONDecodeError, IOError) as e:
+                    logger.error(f"导入撤回任务文件失败: {e}")
+                    raise
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO recall_task "
+                "(message_id, delete_timestamp, del_time) VALUES (?, ?, ?)",
+                [
+                    (
+                        int(message_id),
+                        task.get("delete_timestamp", 0),
+                        task.get("del_time", 0),
+                    )
+                    for message_id, task in tasks.items()
+                ],
+            )
+            return len(tasks)
+
+        imported = self.run_json_import(import_tasks)
+        if imported:
+            logger.success(f"已将 {imported} 个撤回任务导入撤回任务数据库")
+
+    def add(self, message_id, del_time):
+        """
+        添加撤回任务
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO recall_task "
+                "(message_id, delete_timestamp, del_time) VALUES (?, ?, ?)",
+                (int(message_id), time.time() + del_time, del_time),
+            )
+
+    def remove_many(self, message_ids):
+        """
+        在一个事务中移除多个撤回任务
+        """
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM recall_task WHERE message_id = ?",
+                [(int(message_id),) for message_id in message_ids],
+            )
+
+    def get_all(self):
+        """
+        获取所有撤回任务，返回 [(消息ID, 撤回时间戳)]，按撤回时间排序
+        """
+        return self.conn.execute(
+            "SELECT message_id, delete_timestamp FROM recall_task "
+            "ORDER BY delete_timestamp"
+        ).fetchall()
+
+    def count(self):
+        """
+        撤回任务数量
+        """
+        return self.conn.execute("SELECT COUNT(*) FROM recall_task").fetchone()[0]
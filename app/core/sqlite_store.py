@@ -0,0 +1,62 @@
+"""
+SQLite存储基类
+开关、撤回任务、群成员等存储共用：创建目录和连接、WAL模式、meta表，
+以及首次启动时导入原有json文件的一次性导入
+"""
+
+import os
+import sqlite3
+import logger
+
+
+class SQLiteStore:
+    """
+    SQLite存储基类，子类在 _create_table 中创建自己的表
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )"""
+            )
+        self._create_table()
+
+    def _create_table(self):
+        """建表函数，由子类实现"""
+
+    def get_meta(self, key):
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def run_json_import(self, import_func):
+        """
+        执行一次性的json导入，已导入过时直接返回None
+        import_func 在同一个事务中执行，返回导入的数量，导入完成后记录已导入
+        import_func 抛出异常（如文件解析失败）时回滚，不记录已导入，下次启动时重试，
+        因此导入请使用 INSERT OR IGNORE，重试时不覆盖之后写入的数据
+        """
+        if self.get_meta("json_imported") is not None:
+            return None
+        try:
+            with self.conn:
+                imported = import_func()
+                self.set_meta("json_imported", "1")
+        except Exception as e:
+            logger.error(f"导入原有数据到 {self.db_path} 失败，下次启动时重试: {e}")
+            return None
+        return imported
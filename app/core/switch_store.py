@@ -0,0 +1,184 @@
+"""
+开关存储
+所有模块的开关统一存储在 data/Core/switch.db（SQLite，WAL模式）中
+群聊开关表以 (group_id, module) 为主键，另建 (module, group_id) 索引，
+按群查询已开启的模块和按模块查询已开启的群都是索引查找
+首次启动时自动导入各模块目录下原有的 switch.json
+"""
+
+import os
+import json
+import logger
+from .sqlite_store import SQLiteStore
+
+SWITCH_DB_PATH = os.path.join("data", "Core", "switch.db")
+
+
+class SwitchStore(SQLiteStore):
+    def __init__(self, db_path=SWITCH_DB_PATH):
+        super().__init__(db_path)
+
+    def _create_table(self):
+        """建表函数，如果表不存在则创建"""
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS group_switch (
+                group_id TEXT NOT NULL,
+                module TEXT NOT NULL,
+                enabled INTEGER NOT NULL,
+                PRIMARY KEY (group_id, module)
+            ) WITHOUT ROWID"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_group_switch_module "
+                "ON group_switch (module, group_id)"
+            )
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS private_switch (
+                module TEXT PRIMARY KEY,
+                enabled INTEGER NOT NULL
+            )"""
+            )
+
+    def import_json_switches(self, data_root_dir):
+        """
+        导入各模块目录下原有的 switch.json，只在首次启动时执行一次
+        原文件保留不删除，导入后不再读取
+        """
+        if not os.path.isdir(data_root_dir):
+            return
+
+        def import_switches():
+            imported = 0
+            for module in sorted(os.listdir(data_root_dir)):
+                switch_path = os.path.join(data_root_dir, module, "switch.json")
+                if not os.path.isfile(switch_path):
+                    continue
+                try:
+                    with open(switch_path, "r", encoding="utf-8") as f:
+                        switch = json.load(f)
+                except (json.JSONDecodeError, IOError) as e:
+                    logger.error(f"[{module}]导入开关文件失败: {e}")
+                    raise
+                self._write_module_switch(module, switch, overwrite=False)
+                imported += 1
+            return imported
+
+        imported = self.run_json_import(import_switches)
+        if imported:
+            logger.success(f"已将 {imported} 个模块的 switch.json 导入开关数据库")
+
+    def get_module_switch(self, module):
+        """
+        获取某模块的开关，格式与原 switch.json 相同：
+        {"group": {"群号": True/False}, "private": True/False}
+        """
+        rows = self.conn.execute(
+            "SELECT group_id, enabled FROM group_switch WHERE module = ?", (module,)
+        ).fetchall()
+        row = self.conn.execute(
+            "SELECT enabled FROM private_switch WHERE module = ?", (module,)
+        ).fetchone()
+        return {
+            "group": {group_id: bool(enabled) for group_id, enabled in rows},
+            "private": bool(row[0]) if row else False,
+        }
+
+    def replace_module_switch(self, module, switch):
+        """
+        用开关数据整体替换某模块的开关
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM group_switch WHERE module = ?", (module,))
+            self._write_module_switch(module, switch)
+
+    def _write_module_switch(self, module, switch, overwrite=True):
+        """
+        写入某模块的开关，overwrite为False时不覆盖已有的开关
+        """
+        conflict = "REPLACE" if overwrite else "IGNORE"
+        self.conn.executemany(
+            f"INSERT OR {conflict} INTO group_switch (group_id, module, enabled) "
+            "VALUES (?, ?, ?)",
+            [
+                (str(group_id), module, int(bool(enabled)))
+                for group_id, enabled in switch.get("group", {}).items()
+            ],
+        )
+        self.conn.execute(
+            f"INSERT OR {conflict} INTO private_switch (module, enabled) VALUES (?, ?)",
+            (module, int(bool(switch.get("private", False)))),
+        )
+
+    def set_group_switch(self, module, group_id, enabled):
+        """
+        设置某模块在某群的开关
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO group_switch (group_id, module, enabled) "
+                "VALUES (?, ?, ?)",
+                (str(group_id), module, int(bool(enabled))),
+            )
+
+    def set_group_switches(self, module, group_ids, enabled):
+        """
+        在一个事务中设置某模块在多个群的开关
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO group_switch (group_id, module, enabled) "
+                "VALUES (?, ?, ?)",
+                [
+                    (str(group_id), module, int(bool(enabled)))
+                    for group_id in group_ids
+                ],
+            )
+
+    def set_private_switch(self, module, enabled):
+        """
+        设置某模块的私聊开关
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO private_switch (module, enabled) VALUES (?, ?)",
+                (module, int(bool(enabled))),
+            )
+
+    def get_group_switches(self, group_id):
+        """
+        获取某群所有设置过开关的模块，返回 {模块名称: True/False}
+        """
+        rows = self.conn.execute(
+            "SELECT module, enabled FROM group_switch WHERE group_id = ? "
+            "ORDER BY module",
+            (str(group_id),),
+        ).fetchall()
+        return {module: bool(enabled) for module, enabled in rows}
+
+    def get_enabled_modules(self, group_id):
+        """
+        获取某群已开启的模块列表
+        """
+        rows = self.conn.execute(
+            "SELECT module FROM group_switch WHERE group_id = ? AND enabled = 1 "
+            "ORDER BY module",
+            (str(group_id),),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_enabled_groups(self, module):
+        """
+        获取某模块已开启的群列表
+        """
+        rows = self.conn.execute(
+            "SELECT group_id FROM group_switch WHERE module = ? AND enabled = 1",
+            (module,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def data_version(self):
+        """
+        数据库被其他连接修改时变化，用于检测手动修改
+        """
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
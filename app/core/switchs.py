@@ -1,7 +1,8 @@
 """
 开关存储
-每个模块的开关群记录和数据都存储在data/module_name目录下
-开关文件为switch.json，存储结构为：
+所有模块的开关存储在 data/Core/switch.db 中（见core/switch_store.py），
+首次启动时自动导入原有的 data/module_name/switch.json
+load_switch 返回的结构与原 switch.json 相同：
 //群聊开关
 {
     "group": {
@@ -10,24 +11,65 @@
     },
     "private": True
 }
+
+开关在内存中缓存，写入时同步更新缓存；手动修改数据库后，最多SWITCH_CACHE_CHECK_INTERVAL秒内
+通过数据库的data_version检测到变化并重新加载
 """
 
 import os
-import json
+import copy
+import time
 import logger
+from core.switch_store import SwitchStore
+from core.get_group_list import get_all_group_ids
+from core.menu_manager import MenuManager
+from utils.metrics import metrics
 from utils.generate import generate_reply_message, generate_text_message
 from api.message import send_private_msg, send_group_msg
 from utils.auth import is_system_admin, is_group_admin
 
 SWITCH_COMMAND = "switch"
 
+# 管理员私聊批量开关命令
+BULK_SWITCH_USAGE = (
+    "批量开关命令（仅管理员私聊可用），模块可以是模块名称或开关名称，群号用空格分隔，all表示所有群：\n"
+    "switch list 模块：查看模块在各群的开关\n"
+    "switch on 模块 all|群号...：批量开启\n"
+    "switch off 模块 all|群号...：批量关闭\n"
+    "switch diff 模块 on|off all|群号...：预览批量开关将改变的群，不写入"
+)
+
+# 只处理消息事件
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "message"},
+]
+
 # 数据根目录
 DATA_ROOT_DIR = "data"
 
+# 检查数据库是否被手动修改的最小间隔，单位：秒
+SWITCH_CACHE_CHECK_INTERVAL = 5
+
+# 开关缓存，模块名称 -> 开关数据
+_switch_cache = {}
+
+# 群开关缓存，群号 -> 本群已开启的模块集合
+_group_enabled_cache = {}
+
+# 缓存状态，data_version为上次检查时数据库的版本
+_switch_cache_state = {"data_version": None, "checked_at": 0}
+
+# 缓存统计信息
+_switch_cache_stats = {"hits": 0, "misses": 0}
+
 
 # 确保数据目录存在
 os.makedirs(DATA_ROOT_DIR, exist_ok=True)
 
+# 开关数据库
+_store = SwitchStore()
+_store.import_json_switches(DATA_ROOT_DIR)
+
 
 # 是否开启群聊开关
 def is_group_switch_on(group_id, MODULE_NAME):
@@ -39,8 +81,8 @@ def is_group_switch_on(group_id, MODULE_NAME):
     True: 开启
     False: 关闭
     """
-    switch = load_switch(MODULE_NAME)
-    return switch["group"].get(group_id, False)
+    switch = _get_switch(MODULE_NAME)
+    return switch["group"].get(str(group_id), False)
 
 
 # 是否开启私聊开关
@@ -52,7 +94,7 @@ def is_private_switch_on(MODULE_NAME):
     True: 开启
     False: 关闭
     """
-    switch = load_switch(MODULE_NAME)
+    switch = _get_switch(MODULE_NAME)
     return switch.get("private", False)
 
 
@@ -80,29 +122,75 @@ def toggle_private_switch(MODULE_NAME):
         return False
 
 
+def _check_data_version():
+    """
+    距上次检查超过SWITCH_CACHE_CHECK_INTERVAL秒时检查数据库版本，数据库被手动修改则清空缓存
+    """
+    now = time.monotonic()
+    if now - _switch_cache_state["checked_at"] < SWITCH_CACHE_CHECK_INTERVAL:
+        return
+    _switch_cache_state["checked_at"] = now
+    data_version = _store.data_version()
+    if data_version != _switch_cache_state["data_version"]:
+        _switch_cache_state["data_version"] = data_version
+        _switch_cache.clear()
+        _group_enabled_cache.clear()
+
+
+def _get_switch(MODULE_NAME):
+    """
+    从缓存获取某模块的开关，返回的是缓存本身，请勿修改
+    """
+    _check_data_version()
+    switch = _switch_cache.get(MODULE_NAME)
+    if switch is not None:
+        _switch_cache_stats["hits"] += 1
+        return switch
+
+    _switch_cache_stats["misses"] += 1
+    switch = _store.get_module_switch(MODULE_NAME)
+    _switch_cache[MODULE_NAME] = switch
+    return switch
+
+
+def get_group_enabled_modules(group_id):
+    """
+    获取某群已开启的模块集合，用于分发事件前过滤未开启的模块
+    """
+    _check_data_version()
+    group_id = str(group_id)
+    enabled = _group_enabled_cache.get(group_id)
+    if enabled is None:
+        enabled = frozenset(_store.get_enabled_modules(group_id))
+        _group_enabled_cache[group_id] = enabled
+    return enabled
+
+
+def get_switch_cache_stats():
+    """
+    获取开关缓存统计信息
+    """
+    hits = _switch_cache_stats["hits"]
+    total = hits + _switch_cache_stats["misses"]
+    return {
+        "modules": len(_switch_cache),
+        "hits": hits,
+        "misses": _switch_cache_stats["misses"],
+        "hit_rate": round(hits / total, 4) if total else 0,
+    }
+
+
+metrics.register_gauge(
+    "switch_cache_hit_rate", lambda: get_switch_cache_stats()["hit_rate"]
+)
+
+
 def load_switch(MODULE_NAME):
     """
     加载某模块的开关
+    返回的是缓存的副本，修改后需要调用save_switch保存
     """
-    try:
-        SWITCH_PATH = os.path.join(DATA_ROOT_DIR, MODULE_NAME, "switch.json")
-        os.makedirs(os.path.dirname(SWITCH_PATH), exist_ok=True)
-        if os.path.exists(SWITCH_PATH):
-            with open(SWITCH_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        else:
-            # 如果文件不存在，则创建一个默认的开关文件
-            switch = {"group": {}, "private": False}
-            with open(SWITCH_PATH, "w", encoding="utf-8") as f:
-                json.dump(switch, f, ensure_ascii=False, indent=4)
-            return switch
-    except (json.JSONDecodeError, IOError) as e:
-        logger.error(f"[{MODULE_NAME}]加载开关文件失败: {e}")
-        # 如果文件出错或不存在，则创建一个默认的开关文件
-        switch = {"group": {}, "private": False}
-        with open(SWITCH_PATH, "w", encoding="utf-8") as f:
-            json.dump(switch, f, ensure_ascii=False, indent=4)
-        return switch
+    return copy.deepcopy(_get_switch(MODULE_NAME))
 
 
 def save_switch(switch, MODULE_NAME):
@@ -110,12 +198,12 @@ def save_switch(switch, MODULE_NAME):
     保存某模块的开关
     """
     try:
-        SWITCH_PATH = os.path.join(DATA_ROOT_DIR, MODULE_NAME, "switch.json")
-        os.makedirs(os.path.dirname(SWITCH_PATH), exist_ok=True)
-        with open(SWITCH_PATH, "w", encoding="utf-8") as f:
-            json.dump(switch, f, ensure_ascii=False, indent=4)
-    except IOError as e:
-        logger.error(f"[{MODULE_NAME}]保存开关文件失败: {e}")
+        _store.replace_module_switch(MODULE_NAME, switch)
+        # 写入后同步更新缓存
+        _switch_cache[MODULE_NAME] = copy.deepcopy(switch)
+        _group_enabled_cache.clear()
+    except Exception as e:
+        logger.error(f"[{MODULE_NAME}]保存开关失败: {e}")
 
 
 def toggle_switch(switch_type, MODULE_NAME, group_id="0"):
@@ -126,18 +214,19 @@ def toggle_switch(switch_type, MODULE_NAME, group_id="0"):
     MODULE_NAME: 模块名称
     """
     try:
-        switch = load_switch(MODULE_NAME)
+        switch = _get_switch(MODULE_NAME)
         if switch_type == "group":
-            # 如果没有群号键则直接写入
-            if group_id not in switch["group"]:
-                switch["group"][group_id] = True
-            else:
-                switch["group"][group_id] = not switch["group"][group_id]
-            result = switch["group"][group_id]
+            # 缓存与数据库一样以str类型的群号为键
+            group_id = str(group_id)
+            # 没有群号记录时视为关闭，切换后开启
+            result = not switch["group"].get(group_id, False)
+            _store.set_group_switch(MODULE_NAME, group_id, result)
+            switch["group"][group_id] = result
+            _group_enabled_cache.pop(group_id, None)
         elif switch_type == "private":
-            switch["private"] = not switch["private"]
-            result = switch["private"]
-        save_switch(switch, MODULE_NAME)
+            result = not switch["private"]
+            _store.set_private_switch(MODULE_NAME, result)
+            switch["private"] = result
         return result
     except Exception as e:
         logger.error(f"[{MODULE_NAME}]切换开关失败: {e}")
@@ -155,16 +244,11 @@ def load_group_all_switch(group_id):
         }
     }
     """
-    switch = {group_id: {}}
-    # 遍历所有数据目录，100次遍历大概消耗0.02秒
-    for module_name in os.listdir(DATA_ROOT_DIR):
-        try:
-            switch_data = load_switch(module_name)
-            if group_id in switch_data.get("group", {}):
-                switch[group_id][module_name] = switch_data["group"][group_id]
-        except Exception as e:
-            logger.error(f"加载模块 {module_name} 的开关数据失败: {e}")
-    return switch
+    try:
+        return {group_id: _store.get_group_switches(group_id)}
+    except Exception as e:
+        logger.error(f"加载群 {group_id} 的开关数据失败: {e}")
+        return {group_id: {}}
 
 
 def get_all_enabled_groups(MODULE_NAME):
@@ -173,10 +257,156 @@ def get_all_enabled_groups(MODULE_NAME):
     MODULE_NAME: 模块名称
     返回值: 开启的群号列表
     """
-    switch = load_switch(MODULE_NAME)
+    switch = _get_switch(MODULE_NAME)
     return [group_id for group_id, status in switch.get("group", {}).items() if status]
 
 
+def resolve_group_ids(groups=None, predicate=None):
+    """
+    解析批量操作的目标群
+    groups: 群号列表，为None时使用所有群（get_all_group_ids）
+    predicate: 过滤函数，参数为群号，返回True的群才会被操作
+    返回值: 去重后的群号列表
+    """
+    if groups is None:
+        groups = get_all_group_ids()
+    group_ids = list(dict.fromkeys(str(group_id) for group_id in groups))
+    if predicate is not None:
+        group_ids = [group_id for group_id in group_ids if predicate(group_id)]
+    return group_ids
+
+
+def diff_group_switches(MODULE_NAME, enabled, groups=None, predicate=None):
+    """
+    预览批量设置群聊开关后状态会改变的群，不写入
+    返回值: 状态会改变的群号列表
+    """
+    switch = _get_switch(MODULE_NAME)
+    return [
+        group_id
+        for group_id in resolve_group_ids(groups, predicate)
+        if switch["group"].get(group_id, False) != enabled
+    ]
+
+
+def bulk_set_group_switch(MODULE_NAME, enabled, groups=None, predicate=None):
+    """
+    批量设置某模块的群聊开关，在一个事务中写入
+    MODULE_NAME: 模块名称
+    enabled: 开启或关闭
+    groups: 群号列表，为None时操作所有群
+    predicate: 过滤函数，参数为群号
+    返回值: 状态发生改变的群号列表
+    """
+    try:
+        changed = diff_group_switches(MODULE_NAME, enabled, groups, predicate)
+        if not changed:
+            return []
+        _store.set_group_switches(MODULE_NAME, changed, enabled)
+        switch = _get_switch(MODULE_NAME)
+        for group_id in changed:
+            switch["group"][group_id] = enabled
+            _group_enabled_cache.pop(group_id, None)
+        logger.info(
+            f"[{MODULE_NAME}]已批量{'开启' if enabled else '关闭'} {len(changed)} 个群的开关"
+        )
+        return changed
+    except Exception as e:
+        logger.error(f"[{MODULE_NAME}]批量设置群聊开关失败: {e}")
+        return []
+
+
+def list_group_switches(MODULE_NAME, groups=None):
+    """
+    列出某模块在各群的开关
+    groups: 群号列表，为None时使用所有群
+    返回值: {"enabled": [...], "disabled": [...], "unset": [...]}
+    unset为没有设置过开关（默认关闭）的群，开启和关闭的群包含不在群列表中的记录
+    """
+    switch = _get_switch(MODULE_NAME)
+    result = {"enabled": [], "disabled": [], "unset": []}
+    for group_id, status in switch["group"].items():
+        result["enabled" if status else "disabled"].append(group_id)
+    result["unset"] = [
+        group_id
+        for group_id in resolve_group_ids(groups)
+        if group_id not in switch["group"]
+    ]
+    return result
+
+
+def _resolve_module_name(name):
+    """
+    根据模块名称或开关名称获取模块名称
+    """
+    for module_name in MenuManager.get_all_modules():
+        menu_info = MenuManager.get_module_menu_info(module_name)
+        if not menu_info:
+            continue
+        if name.lower() in (
+            str(menu_info["name"]).lower(),
+            str(menu_info["switch_name"]).lower(),
+        ):
+            return menu_info["name"]
+    return name
+
+
+def _format_group_ids(group_ids, limit=50):
+    """
+    格式化群号列表，过长时截断
+    """
+    if not group_ids:
+        return "无"
+    text = "、".join(group_ids[:limit])
+    if len(group_ids) > limit:
+        text += f" 等{len(group_ids)}个"
+    return text
+
+
+def handle_bulk_switch_command(raw_message):
+    """
+    处理管理员私聊批量开关命令
+    返回值: 回复文本
+    """
+    args = raw_message.split()[1:]
+    if len(args) < 2:
+        return BULK_SWITCH_USAGE
+
+    action, module_name = args[0].lower(), _resolve_module_name(args[1])
+
+    if action == "list":
+        result = list_group_switches(module_name)
+        return (
+            f"[{module_name}]群聊开关：\n"
+            f"开启（{len(result['enabled'])}）：{_format_group_ids(result['enabled'])}\n"
+            f"关闭（{len(result['disabled'])}）：{_format_group_ids(result['disabled'])}\n"
+            f"未设置（{len(result['unset'])}）：{_format_group_ids(result['unset'])}"
+        )
+
+    # diff 命令多一个 on|off 参数
+    dry_run = action == "diff"
+    if dry_run:
+        action = args[2].lower() if len(args) > 2 else ""
+        args = args[1:]
+    if action not in ("on", "off") or len(args) < 3:
+        return BULK_SWITCH_USAGE
+
+    enabled = action == "on"
+    groups = None if args[2].lower() == "all" else args[2:]
+    action_text = "开启" if enabled else "关闭"
+    if dry_run:
+        changed = diff_group_switches(module_name, enabled, groups)
+        return (
+            f"[{module_name}]批量{action_text}将改变 {len(changed)} 个群：\n"
+            f"{_format_group_ids(changed)}"
+        )
+    changed = bulk_set_group_switch(module_name, enabled, groups)
+    return (
+        f"[{module_name}]已批量{action_text} {len(changed)} 个群：\n"
+        f"{_format_group_ids(changed)}"
+    )
+
+
 async def handle_module_private_switch(MODULE_NAME, websocket, user_id, message_id):
     """
     处理模块私聊开关命令
@@ -222,22 +452,40 @@ async def handle_module_group_switch(MODULE_NAME, websocket, group_id, message_i
 
 async def handle_events(websocket, message):
     """
-    统一处理 switch 命令，支持群聊
-    用来扫描本群已开启的模块
+    统一处理 switch 命令
+    群聊中用来扫描本群已开启的模块，管理员私聊中用来批量操作开关
     """
     try:
         # 只处理文本消息
         if message.get("post_type") != "message":
             return
-        raw_message = message.get("raw_message", "").lower()
-        if raw_message != SWITCH_COMMAND:
-            return
+        raw_message = message.get("raw_message", "")
 
         # 获取基本信息
         user_id = str(message.get("user_id", ""))
         message_type = message.get("message_type", "")
         role = message.get("sender", {}).get("role", "")
 
+        # 管理员私聊批量开关命令
+        if (
+            message_type == "private"
+            and raw_message.lower().split(" ", 1)[0] == SWITCH_COMMAND
+            and is_system_admin(user_id)
+        ):
+            reply_text = handle_bulk_switch_command(raw_message)
+            await send_private_msg(
+                websocket,
+                user_id,
+                [
+                    generate_reply_message(message.get("message_id", "")),
+                    generate_text_message(reply_text),
+                ],
+            )
+            return
+
+        if raw_message.lower() != SWITCH_COMMAND:
+            return
+
         # 鉴权 - 根据消息类型进行不同的权限检查
         if message_type == "group":
             group_id = str(message.get("group_id", ""))
@@ -249,11 +497,8 @@ async def handle_events(websocket, message):
         reply_message = generate_reply_message(message_id)
 
         if message_type == "group":
-            # 扫描本群已开启的模块
-            enabled_modules = []
-            for module_name in os.listdir(DATA_ROOT_DIR):
-                if is_group_switch_on(group_id, module_name):
-                    enabled_modules.append(module_name)
+            # 查询本群已开启的模块
+            enabled_modules = _store.get_enabled_modules(group_id)
 
             if enabled_modules:
                 switch_text = f"本群（{group_id}）已开启的模块：\n"
@@ -0,0 +1,398 @@
+"""
+事件分发器
+websocket读取到的消息按会话（群号或QQ号）分片进入队列，每个分片由一个工作协程按到达顺序串行处理
+同一会话的事件不会乱序，不同会话的事件在各分片间并行处理
+队列总积压达到高水位时按溢出策略丢弃低价值事件，仍无法缓解则暂停读取websocket，
+暂停期间为了收到API响应仍会读取，积压达到硬上限（高水位的 HARD_CAP_RATIO 倍）后丢弃新事件
+call_api发出请求的响应在读取时直接交给等待方，不进入积压计算
+重复推送的事件在入队前丢弃
+"""
+
+import json
+import asyncio
+from collections import deque
+import logger
+from utils.metrics import metrics
+from api.engine import resolve_response, has_pending_calls, wait_for_pending_calls
+from config import (
+    EVENT_WORKERS,
+    EVENT_QUEUE_HIGH_WATER,
+    EVENT_QUEUE_LOW_WATER,
+    EVENT_QUEUE_OVERFLOW_POLICY,
+)
+
+# 溢出策略
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_HEARTBEAT = "drop_heartbeat"
+OVERFLOW_DROP_LOW_PRIORITY = "drop_low_priority"
+
+OVERFLOW_POLICIES = (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_HEARTBEAT,
+    OVERFLOW_DROP_LOW_PRIORITY,
+)
+
+# 积压硬上限与高水位的比例，暂停读取期间积压达到硬上限后丢弃新事件（包括block策略）
+HARD_CAP_RATIO = 2
+
+# 低优先级的通知子类型
+LOW_PRIORITY_NOTIFY_SUB_TYPES = ("poke", "input_status", "profile_like")
+
+
+def is_heartbeat(msg):
+    """
+    判断是否为心跳事件
+    """
+    return (
+        msg.get("post_type") == "meta_event"
+        and msg.get("meta_event_type") == "heartbeat"
+    )
+
+
+def is_low_priority(msg):
+    """
+    判断是否为低优先级事件
+    低优先级事件：心跳元事件，以及戳一戳、输入状态、点赞等通知
+    """
+    if is_heartbeat(msg):
+        return True
+    return (
+        msg.get("post_type") == "notice"
+        and msg.get("notice_type") == "notify"
+        and msg.get("sub_type") in LOW_PRIORITY_NOTIFY_SUB_TYPES
+    )
+
+
+def get_conversation_key(msg):
+    """
+    获取事件所属的会话
+    群事件按群号，其他带QQ号的事件按QQ号，元事件等按post_type保持顺序
+    API响应不属于任何会话，返回None
+    """
+    group_id = msg.get("group_id")
+    if group_id:
+        return ("group", str(group_id))
+    user_id = msg.get("user_id")
+    if user_id:
+        return ("user", str(user_id))
+    post_type = msg.get("post_type")
+    if post_type:
+        return ("post_type", post_type)
+    return None
+
+
+class _Shard:
+    """
+    单个分片的事件队列
+    """
+
+    def __init__(self):
+        # 队列元素为 (消息, 是否为call_api请求的响应)
+        self.queue = deque()
+        # 队列非空时处于set状态
+        self.ready = asyncio.Event()
+
+
+class EventDispatcher:
+    """
+    按会话分片的有界事件队列
+    每个分片由一个工作协程串行处理，每个websocket连接对应一个实例
+    """
+
+    def __init__(
+        self,
+        handler,
+        websocket,
+        workers=EVENT_WORKERS,
+        high_water=EVENT_QUEUE_HIGH_WATER,
+        low_water=EVENT_QUEUE_LOW_WATER,
+        overflow_policy=EVENT_QUEUE_OVERFLOW_POLICY,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(
+                f"[Dispatcher]未知的溢出策略: {overflow_policy}，使用 {OVERFLOW_BLOCK}"
+            )
+            overflow_policy = OVERFLOW_BLOCK
+
+        self.handler = handler
+        self.websocket = websocket
+        # 分片数量，即工作协程数量
+        self.workers = max(1, workers)
+        self.high_water = max(1, high_water)
+        self.low_water = min(max(0, low_water), self.high_water - 1)
+        self.hard_cap = self.high_water * HARD_CAP_RATIO
+        self.overflow_policy = overflow_policy
+
+        self.shards = [_Shard() for _ in range(self.workers)]
+        # 所有分片的积压总数
+        self._depth = 0
+        # 不属于任何会话的API响应轮流分配到各分片
+        self._next_shard = 0
+        # 未暂停时处于set状态，暂停读取时clear
+        self._resume = asyncio.Event()
+        self._resume.set()
+        self._worker_tasks = []
+
+        # 统计信息
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.hard_cap_dropped = 0
+        self.pause_count = 0
+
+    def qsize(self):
+        """
+        当前所有分片的积压总数
+        """
+        return self._depth
+
+    @property
+    def paused(self):
+        """
+        是否已暂停读取websocket
+        """
+        return not self._resume.is_set()
+
+    def stats(self):
+        """
+        获取队列统计信息
+        """
+        return {
+            "queue_depth": self._depth,
+            "shard_depths": [len(shard.queue) for shard in self.shards],
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "hard_cap_dropped": self.hard_cap_dropped,
+            "pause_count": self.pause_count,
+            "paused": self.paused,
+        }
+
+    def start(self):
+        """
+        启动工作协程
+        """
+        for index, shard in enumerate(self.shards):
+            self._worker_tasks.append(asyncio.create_task(self._worker(index, shard)))
+        metrics.register_gauge("event_queue_depth", self.qsize)
+        logger.info(
+            f"[Dispatcher]已启动 {self.workers} 个分片工作协程，高水位: {self.high_water}，"
+            f"低水位: {self.low_water}，溢出策略: {self.overflow_policy}"
+        )
+
+    async def stop(self):
+        """
+        停止工作协程，丢弃未处理的事件
+        """
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._depth:
+            logger.warning(f"[Dispatcher]连接关闭，丢弃 {self._depth} 个未处理事件")
+            for shard in self.shards:
+                shard.queue.clear()
+            self._depth = 0
+        self._resume.set()
+
+    async def submit(self, message):
+        """
+        提交一条websocket消息
+        积压过多时会阻塞，直到队列降到低水位，从而暂停读取websocket
+        """
+        msg = self._parse(message)
+        if (
+            msg is None
+            or self._accept_response(msg, message)
+            or self._is_duplicate(msg)
+        ):
+            return
+
+        if self._depth >= self.high_water:
+            # 先尝试按溢出策略丢弃低价值事件
+            if self._shed(msg):
+                return
+            # 丢弃后仍然积压，暂停读取直到降到低水位
+            if self._depth >= self.high_water:
+                await self._pause()
+
+        self._enqueue(msg, message)
+
+    def _parse(self, message):
+        """
+        解析websocket消息，解析失败返回None
+        """
+        try:
+            msg = json.loads(message)
+        except Exception as e:
+            logger.error(f"[Dispatcher]解析websocket消息失败: {e}，消息内容: {message}")
+            return None
+        self.received += 1
+        metrics.inc("events_received_total")
+        return msg
+
+    def _accept_response(self, msg, raw):
+        """
+        处理call_api发出请求的响应
+        响应直接交给等待方，只分发给显式订阅了该echo前缀的模块，且不受积压限制
+        返回值:
+        True: 该消息是call_api请求的响应，已处理
+        False: 普通消息，需要继续入队
+        """
+        if "post_type" in msg or not resolve_response(msg):
+            return False
+        if self.handler.router.route(msg, include_catch_all=False):
+            self._enqueue(msg, raw, api_response=True)
+        return True
+
+    def _is_duplicate(self, msg):
+        """
+        判断是否为已处理过的重复事件，重复事件直接丢弃
+        """
+        if not self.handler.dedup.is_duplicate(msg):
+            return False
+        metrics.inc("events_dropped_total", reason="duplicate")
+        logger.debug(f"[Dispatcher]丢弃重复事件: {msg}")
+        return True
+
+    def _enqueue(self, msg, raw, api_response=False):
+        """
+        消息放入所属分片的队列
+        raw: 原始消息文本，用于记录日志，避免在事件循环中格式化消息字典
+        """
+        shard = self._select_shard(msg)
+        shard.queue.append((msg, api_response, raw))
+        self._depth += 1
+        shard.ready.set()
+
+    async def _pause(self):
+        """
+        暂停读取websocket，直到积压降到低水位
+        暂停期间如果有API调用在等待响应，仍然继续读取：
+        工作协程可能正在等待这些响应，不读取会导致队列永远无法消费
+        读取到的API响应直接交给等待方，其他事件按溢出策略处理，积压达到硬上限后丢弃
+        """
+        self._resume.clear()
+        self.pause_count += 1
+        hard_cap_dropped = self.hard_cap_dropped
+        logger.warning(
+            f"[Dispatcher]事件队列积压 {self._depth} 条，暂停读取websocket，"
+            f"已丢弃 {self.dropped} 条"
+        )
+        while self.paused:
+            if not has_pending_calls():
+                await self._wait_resume_or_pending_calls()
+                continue
+            message = await self.websocket.recv()
+            msg = self._parse(message)
+            if (
+                msg is None
+                or self._accept_response(msg, message)
+                or self._is_duplicate(msg)
+                or self._shed(msg)
+            ):
+                continue
+            if self._depth >= self.hard_cap:
+                self.dropped += 1
+                self.hard_cap_dropped += 1
+                metrics.inc("events_dropped_total", reason="hard_cap")
+                continue
+            self._enqueue(msg, message)
+        hard_cap_dropped = self.hard_cap_dropped - hard_cap_dropped
+        if hard_cap_dropped:
+            logger.warning(
+                f"[Dispatcher]暂停期间积压达到上限 {self.hard_cap} 条，"
+                f"丢弃 {hard_cap_dropped} 条事件"
+            )
+        logger.info(f"[Dispatcher]事件队列已降至 {self._depth} 条，恢复读取")
+
+    async def _wait_resume_or_pending_calls(self):
+        """
+        等待恢复读取或出现等待响应的API调用
+        """
+        waiters = [
+            asyncio.ensure_future(self._resume.wait()),
+            asyncio.ensure_future(wait_for_pending_calls()),
+        ]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    def _select_shard(self, msg):
+        """
+        选择事件所属的分片，同一会话总是落在同一分片
+        """
+        key = get_conversation_key(msg)
+        if key is None:
+            shard = self.shards[self._next_shard]
+            self._next_shard = (self._next_shard + 1) % self.workers
+            return shard
+        return self.shards[hash(key) % self.workers]
+
+    def _shed(self, msg):
+        """
+        按溢出策略丢弃事件
+        返回值:
+        True: 新事件已被丢弃
+        False: 新事件需要入队
+        """
+        if self.overflow_policy == OVERFLOW_DROP_HEARTBEAT:
+            self._drop_oldest(is_heartbeat)
+            return False
+
+        if self.overflow_policy == OVERFLOW_DROP_LOW_PRIORITY:
+            if is_low_priority(msg):
+                self.dropped += 1
+                metrics.inc("events_dropped_total", reason="overflow")
+                return True
+            self._drop_oldest(is_low_priority)
+            return False
+
+        return False
+
+    def _drop_oldest(self, predicate):
+        """
+        丢弃队列中最早一条满足条件的事件
+        """
+        oldest = None
+        for shard in self.shards:
+            for index, (queued_msg, *_) in enumerate(shard.queue):
+                if predicate(queued_msg):
+                    # 比较各分片中最早的一条，事件时间相同时取先找到的
+                    if oldest is None or queued_msg.get("time", 0) < oldest[2]:
+                        oldest = (shard, index, queued_msg.get("time", 0))
+                    break
+        if oldest is None:
+            return False
+        shard, index, _ = oldest
+        del shard.queue[index]
+        self._depth -= 1
+        self.dropped += 1
+        metrics.inc("events_dropped_total", reason="overflow")
+        return True
+
+    async def _worker(self, index, shard):
+        """
+        分片工作协程，按到达顺序逐条处理本分片的事件
+        """
+        while True:
+            if not shard.queue:
+                shard.ready.clear()
+                await shard.ready.wait()
+                continue
+
+            msg, api_response, raw = shard.queue.popleft()
+            self._depth -= 1
+            if self.paused and self._depth <= self.low_water:
+                self._resume.set()
+
+            try:
+                await self.handler.handle_message(
+                    self.websocket, msg, api_response, raw
+                )
+            except Exception as e:
+                logger.error(f"[Dispatcher]工作协程 {index} 处理事件失败: {e}")
+            self.processed += 1
+            metrics.inc("events_processed_total")
@@ -1,36 +1,226 @@
 import json
+import time
 import asyncio
 import logger
 import os
 import importlib
 import inspect
-from config import OWNER_ID
+from config import (
+    OWNER_ID,
+    HANDLER_TIMEOUT,
+    LOOP_LAG_THRESHOLD,
+    HANDLER_QUARANTINE_THRESHOLD,
+    HANDLER_QUARANTINE_WINDOW,
+    HANDLER_QUARANTINE_TIME,
+)
 from api.message import send_private_msg
+from api.send_scheduler import track_queue_wait
 from utils.generate import generate_text_message
+from utils.dedup import EventDeduplicator
+from utils.metrics import metrics
+from utils.watchdog import LoopWatchdog, ModuleBreaker
+from utils.scheduler import JobScheduler
+from core.switchs import get_group_enabled_modules
+from core.menu_manager import MENU_COMMAND
 
 
 # 核心模块列表 - 这些模块将始终被加载
-# 格式: ("模块路径", "模块中的函数名")
+# 格式: ("模块路径", "模块中的函数名")，函数名为None表示只注册模块声明的定时任务
 # 请不要修改这些模块，除非你知道你在做什么
 CORE_MODULES = [
     # 系统工具
-    ("utils.clean_logs", "clean_logs"),  # 日志清理
+    ("utils.clean_logs", None),  # 日志清理
     # 核心功能
     ("core.online_detect", "handle_events"),  # 在线监测
     ("core.del_self_msg", "handle_events"),  # 自动撤回自己发送的消息
-    ("core.nc_get_rkey", "handle_events"),  # 自动刷新rkey
+    ("core.nc_get_rkey", None),  # 自动刷新rkey
     ("core.menu_manager", "handle_events"),  # 全局菜单命令
     ("core.switchs", "handle_events"),  # 全局开关命令
     ("core.get_group_list", "handle_events"),  # 获取群列表
     ("core.get_group_member_list", "handle_events"),  # 获取群成员列表
+    ("core.metrics_report", "handle_events"),  # 运行指标命令
     # 在这里添加其他必须加载的核心模块
 ]
 
+# 核心模块路径，核心模块超时或阻塞事件循环时只记录，不熔断
+CORE_MODULE_PATHS = frozenset(module_path for module_path, _ in CORE_MODULES)
+
+# 各post_type对应的细分事件类型字段
+DETAIL_TYPE_FIELDS = {
+    "message": "message_type",
+    "message_sent": "message_type",
+    "notice": "notice_type",
+    "request": "request_type",
+    "meta_event": "meta_event_type",
+}
+
+
+def get_event_type(msg):
+    """
+    获取事件类型名称，如 message.group、notice.group_increase，API响应为 response
+    """
+    post_type = msg.get("post_type")
+    if not post_type:
+        return "response"
+    detail_field = DETAIL_TYPE_FIELDS.get(post_type)
+    detail_type = msg.get(detail_field) if detail_field else None
+    return f"{post_type}.{detail_type}" if detail_type else post_type
+
+
+class EventRouter:
+    """
+    事件路由器
+
+    模块可以在模块文件（核心模块）或模块包的__init__.py（modules下的模块）中
+    声明 EVENT_SUBSCRIPTIONS 列表来订阅感兴趣的事件，格式如：
+    EVENT_SUBSCRIPTIONS = [
+        {"post_type": "message"},  # 所有消息事件
+        {"post_type": "notice", "notice_type": "group_increase"},  # 指定通知类型
+        {"post_type": "meta_event", "meta_event_type": "heartbeat"},  # 心跳事件
+        {"echo": "get_group_list"},  # echo以该前缀开头的API响应
+        # 带群号的事件只在本群开启了模块开关时分发
+        {"post_type": "message", "message_type": "group", "switch": (MODULE_NAME, SWITCH_NAME)},
+    ]
+    路由器根据订阅建立索引，每条消息只分发给匹配的处理器
+    未声明 EVENT_SUBSCRIPTIONS 的处理器保持原有行为，接收所有消息
+    通过call_api发出请求的响应由调用方直接获取，只会分发给显式订阅了echo前缀的处理器
+    同一处理器的多条订阅匹配同一事件时，以细分类型的订阅是否声明了switch为准
+    """
+
+    def __init__(self, gate=None):
+        """
+        gate: 开关检查函数，参数为 (消息, 模块名称, 开关名称)，返回是否分发
+        """
+        self.gate = gate
+        # 未声明订阅的处理器，接收所有消息
+        self.catch_all = []
+        # (post_type, 细分类型) -> 处理器列表，细分类型为None表示订阅整个post_type
+        self.event_index = {}
+        # echo前缀 -> 处理器列表
+        self.echo_index = {}
+        # (处理器, (post_type, 细分类型)) -> (模块名称, 开关名称)
+        self.switch_gates = {}
+        # (post_type, 细分类型) -> (匹配的处理器元组, 需要检查开关的处理器字典)，注册时清空
+        self._route_cache = {}
+
+    def register(self, handler, subscriptions=None):
+        """
+        注册处理器
+        handler: 异步处理函数
+        subscriptions: 订阅列表，为空则订阅全部事件
+        """
+        self._route_cache.clear()
+        if not subscriptions:
+            self.catch_all.append(handler)
+            return
+
+        for subscription in subscriptions:
+            echo_prefix = subscription.get("echo")
+            if echo_prefix:
+                self.echo_index.setdefault(echo_prefix, []).append(handler)
+
+            post_type = subscription.get("post_type")
+            if post_type:
+                detail_field = DETAIL_TYPE_FIELDS.get(post_type)
+                detail_type = subscription.get(detail_field) if detail_field else None
+                key = (post_type, detail_type)
+                self.event_index.setdefault(key, []).append(handler)
+                if subscription.get("switch"):
+                    self.switch_gates[(handler, key)] = tuple(subscription["switch"])
+
+    def _build_route(self, key):
+        """
+        计算某事件类型匹配的处理器及其开关
+        """
+        post_type, detail_type = key
+        exact = self.event_index.get(key, []) if detail_type is not None else []
+        matched = self.catch_all + self.event_index.get((post_type, None), []) + exact
+        # 去重并保持注册顺序
+        handlers = tuple(dict.fromkeys(matched))
+
+        gates = {}
+        for handler in handlers:
+            # 细分类型的订阅优先
+            gate_key = key if handler in exact else (post_type, None)
+            gate = self.switch_gates.get((handler, gate_key))
+            if gate:
+                gates[handler] = gate
+        return handlers, gates
+
+    def route(self, msg, include_catch_all=True):
+        """
+        获取需要处理该消息的处理器
+        include_catch_all: 是否包含未声明订阅的处理器
+        """
+        post_type = msg.get("post_type")
+
+        # 事件上报，按(post_type, 细分类型)查索引
+        if post_type:
+            detail_field = DETAIL_TYPE_FIELDS.get(post_type)
+            detail_type = msg.get(detail_field) if detail_field else None
+            key = (post_type, detail_type)
+            cached = self._route_cache.get(key)
+            if cached is None:
+                cached = self._build_route(key)
+                self._route_cache[key] = cached
+            handlers, gates = cached
+
+            # 带群号的事件跳过本群未开启开关的处理器
+            if gates and self.gate is not None and msg.get("group_id"):
+                handlers = tuple(
+                    handler
+                    for handler in handlers
+                    if handler not in gates or self.gate(msg, *gates[handler])
+                )
+            return handlers
+
+        # API响应，按echo前缀匹配
+        catch_all = self.catch_all if include_catch_all else []
+        echo = msg.get("echo")
+        if not isinstance(echo, str) or not self.echo_index:
+            return tuple(catch_all)
+        matched = list(catch_all)
+        for echo_prefix, prefix_handlers in self.echo_index.items():
+            if echo.startswith(echo_prefix):
+                matched += prefix_handlers
+        return tuple(dict.fromkeys(matched))
+
 
 class EventHandler:
-    def __init__(self, websocket):
-        self.websocket = websocket
+    """
+    事件处理器
+    模块只在创建时加载一次，每个进程只创建一个实例，重连后通过bind绑定新的连接
+    """
+
+    def __init__(self):
+        # 当前绑定的websocket连接
+        self.websocket = None
+        # 是否已向管理员上报过模块加载状况，每个进程只上报一次
+        self._reported = False
         self.handlers = []
+        # 处理器 -> 模块名称，用于日志、指标和熔断
+        self.handler_names = {}
+        # 处理器 -> 处理单条消息的超时时间，模块可以声明 HANDLER_TIMEOUT 覆盖默认值
+        self.handler_timeouts = {}
+        # 事件路由器，根据模块声明的订阅分发消息
+        self.router = EventRouter(gate=self._switch_gate)
+        # 重复事件去重，随实例跨重连保留
+        self.dedup = EventDeduplicator()
+        # 正在处理消息的处理器数量
+        self.in_flight = 0
+        metrics.register_gauge("handlers_in_flight", lambda: self.in_flight)
+        # 多次超时或阻塞事件循环的模块暂停处理事件
+        self.breaker = ModuleBreaker(
+            HANDLER_QUARANTINE_THRESHOLD,
+            HANDLER_QUARANTINE_WINDOW,
+            HANDLER_QUARANTINE_TIME,
+        )
+        metrics.register_gauge(
+            "handlers_quarantined", lambda: len(self.breaker.stats())
+        )
+        self.watchdog = None
+        # 模块声明的定时任务，只在连接期间执行
+        self.scheduler = JobScheduler()
         # 用于记录成功加载的模块
         self.loaded_modules = []
         # 用于记录加载失败的模块及原因
@@ -45,8 +235,31 @@ class EventHandler:
         # 记录已加载的模块数量
         logger.success(f"总共加载了 {len(self.handlers)} 个事件处理器")
 
-        # 向管理员上报模块加载状况
-        asyncio.create_task(self._report_loading_status())
+    def bind(self, websocket):
+        """
+        绑定新的websocket连接
+        首次绑定时向管理员上报模块加载状况，重连时不再重复上报
+        """
+        self.websocket = websocket
+        self.scheduler.bind(websocket)
+        if not self._reported:
+            self._reported = True
+            asyncio.create_task(self._report_loading_status())
+
+    def unbind(self):
+        """
+        连接断开，暂停执行定时任务
+        """
+        self.scheduler.unbind()
+
+    def start_watchdog(self):
+        """
+        启动事件循环卡顿监测，需要在事件循环中调用
+        """
+        if LOOP_LAG_THRESHOLD <= 0 or self.watchdog is not None:
+            return
+        self.watchdog = LoopWatchdog(LOOP_LAG_THRESHOLD, on_block=self._on_loop_blocked)
+        self.watchdog.start()
 
     async def _report_loading_status(self):
         """向管理员上报模块加载状况"""
@@ -78,19 +291,20 @@ class EventHandler:
     def _load_core_modules(self):
         """加载核心模块"""
         for module_path, handler_name in CORE_MODULES:
+            full_name = f"{module_path}.{handler_name}" if handler_name else module_path
             try:
                 module = importlib.import_module(module_path)
-                handler = getattr(module, handler_name)
-                self.handlers.append(handler)
+                if handler_name:
+                    handler = getattr(module, handler_name)
+                    self._register(handler, module_path, module)
+                self._register_jobs(module_path, module)
                 # 记录成功加载的模块
-                self.loaded_modules.append(f"{module_path}.{handler_name}")
-                logger.success(f"已加载核心模块: {module_path}.{handler_name}")
+                self.loaded_modules.append(full_name)
+                logger.success(f"已加载核心模块: {full_name}")
             except Exception as e:
                 # 记录加载失败的模块及原因
-                self.failed_modules.append((f"{module_path}.{handler_name}", str(e)))
-                logger.error(
-                    f"加载核心模块失败: {module_path}.{handler_name}, 错误: {e}"
-                )
+                self.failed_modules.append((full_name, str(e)))
+                logger.error(f"加载核心模块失败: {full_name}, 错误: {e}")
 
     def _load_modules_dynamically(self):
         """动态加载modules目录下的所有模块"""
@@ -129,7 +343,10 @@ class EventHandler:
                 if hasattr(module, "handle_events") and inspect.iscoroutinefunction(
                     module.handle_events
                 ):
-                    self.handlers.append(module.handle_events)
+                    # 订阅等声明在模块包的__init__.py中
+                    package = importlib.import_module(f"modules.{module_name}")
+                    self._register(module.handle_events, package.__name__, package)
+                    self._register_jobs(package.__name__, package)
                     # 记录成功加载的模块
                     self.loaded_modules.append(module_name)
                     logger.success(f"已加载模块: {module_name}")
@@ -146,16 +363,165 @@ class EventHandler:
                 self.failed_modules.append((module_name, str(e)))
                 logger.error(f"加载模块失败: {module_name}, 错误: {e}")
 
+    def _switch_gate(self, msg, module_name, switch_name):
+        """
+        判断声明了开关的模块是否需要处理该群事件
+        本群开启了模块开关，或消息是该模块的开关命令、菜单命令时分发
+        """
+        raw_message = msg.get("raw_message")
+        if raw_message:
+            command = raw_message.lower()
+            if command == switch_name.lower():
+                return True
+            if command == f"{switch_name}{MENU_COMMAND}".lower():
+                return True
+        return module_name in get_group_enabled_modules(str(msg.get("group_id")))
+
+    def _register(self, handler, name, declaration):
+        """
+        注册处理器
+        name: 模块名称
+        declaration: 声明 EVENT_SUBSCRIPTIONS、HANDLER_TIMEOUT 的模块对象
+        """
+        self.handlers.append(handler)
+        self.handler_names[handler] = name
+        self.handler_timeouts[handler] = getattr(
+            declaration, "HANDLER_TIMEOUT", HANDLER_TIMEOUT
+        )
+        self.router.register(handler, getattr(declaration, "EVENT_SUBSCRIPTIONS", None))
+
+    def _register_jobs(self, name, declaration):
+        """
+        注册模块声明的 SCHEDULED_JOBS，注册失败的任务记录到加载失败的模块中
+        """
+        self.failed_modules.extend(
+            self.scheduler.add_jobs(name, getattr(declaration, "SCHEDULED_JOBS", None))
+        )
+
+    def _record_violation(self, handler_name, reason):
+        """
+        记录模块超时或阻塞事件循环，多次违规后熔断并通知管理员，核心模块不熔断
+        """
+        metrics.inc("handler_violations_total", handler=handler_name)
+        if handler_name in CORE_MODULE_PATHS:
+            return
+        if not self.breaker.record_violation(handler_name):
+            return
+        metrics.inc("handler_quarantines_total", handler=handler_name)
+        report_msg = (
+            f"模块 {handler_name} {HANDLER_QUARANTINE_WINDOW:g}秒内"
+            f"多次超时或阻塞事件循环，已暂停处理事件 {HANDLER_QUARANTINE_TIME:g} 秒\n"
+            f"最近一次：{reason}"
+        )
+        logger.error(f"[Watchdog]{report_msg}")
+        if self.websocket is not None:
+            asyncio.create_task(self._report_quarantine(report_msg))
+
+    async def _report_quarantine(self, report_msg):
+        """向管理员上报模块熔断"""
+        try:
+            await send_private_msg(
+                self.websocket, OWNER_ID, [generate_text_message(report_msg)]
+            )
+        except Exception as e:
+            logger.error(f"向管理员上报模块熔断失败：{e}")
+
+    def _on_loop_blocked(self, modules, lag):
+        """
+        事件循环阻塞结束后，根据阻塞时的调用栈找出造成阻塞的模块
+        只追究调用栈中最内层的非核心模块，模块调用核心模块的函数造成阻塞时追究调用方，
+        调用栈中只有核心模块时只记录日志
+        """
+        handler_names = set(self.handler_names.values())
+        core_name = None
+        # 调用栈从最内层开始
+        for module in modules:
+            handler_name = next(
+                (
+                    name
+                    for name in handler_names
+                    if module == name or module.startswith(f"{name}.")
+                ),
+                None,
+            )
+            if handler_name is None:
+                continue
+            if handler_name in CORE_MODULE_PATHS:
+                core_name = core_name or handler_name
+                continue
+            logger.error(f"[Watchdog]模块 {handler_name} 阻塞事件循环 {lag:.2f} 秒")
+            self._record_violation(handler_name, f"阻塞事件循环 {lag:.2f} 秒")
+            return
+        if core_name is not None:
+            logger.error(f"[Watchdog]核心模块 {core_name} 阻塞事件循环 {lag:.2f} 秒")
+            self._record_violation(core_name, f"阻塞事件循环 {lag:.2f} 秒")
+
+    async def _run_with_timeout(self, coro, timeout):
+        """
+        执行处理器，超时后取消并抛出 asyncio.TimeoutError
+        在发送队列中排队限速的时间不计入超时时间，批量发送不会被判定为超时
+        """
+        queue_wait = track_queue_wait()
+        task = asyncio.ensure_future(coro)
+        start_time = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                remaining = start_time + timeout + queue_wait.elapsed(now) - now
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait({task}, timeout=remaining)
+                if done:
+                    return task.result()
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        raise asyncio.TimeoutError
+
     async def _safe_handle(self, handler, websocket, msg):
+        handler_name = self.handler_names.get(handler, str(handler))
+        if self.breaker.is_quarantined(handler_name):
+            metrics.inc("handler_skipped_total", handler=handler_name)
+            return
+
+        timeout = self.handler_timeouts.get(handler, HANDLER_TIMEOUT)
+        self.in_flight += 1
+        start_time = time.monotonic()
         try:
-            await handler(websocket, msg)
+            if timeout and timeout > 0:
+                await self._run_with_timeout(handler(websocket, msg), timeout)
+            else:
+                await handler(websocket, msg)
+        except asyncio.TimeoutError:
+            metrics.inc("handler_timeouts_total", handler=handler_name)
+            logger.error(f"模块 {handler_name} 处理消息超时（{timeout}秒），已取消")
+            self._record_violation(handler_name, f"处理消息超时（{timeout}秒）")
         except Exception as e:
-            logger.error(f"模块 {handler} 处理消息时出错: {e}")
+            metrics.inc("handler_errors_total", handler=handler_name)
+            logger.error(f"模块 {handler_name} 处理消息时出错: {e}")
+        finally:
+            self.in_flight -= 1
+            metrics.observe(
+                "handler_seconds", time.monotonic() - start_time, handler=handler_name
+            )
 
-    async def handle_message(self, websocket, message):
-        """处理websocket消息"""
+    async def handle_message(self, websocket, message, api_response=False, raw=None):
+        """
+        处理websocket消息，message可以是原始字符串或已解析的字典
+        api_response: 是否为call_api请求的响应，是则只分发给订阅了echo前缀的处理器
+        raw: 已解析的消息对应的原始字符串，用于记录日志，不传时不记录该消息
+        """
         try:
-            msg = json.loads(message)
+            if isinstance(message, (str, bytes)):
+                raw = message
+                msg = json.loads(message)
+            else:
+                msg = message
 
             # 日志忽略列表，echo字段包含这些字符串时不记录日志
             LOG_IGNORE_ECHO_LIST = [
@@ -172,11 +538,26 @@ class EventHandler:
             if not any(
                 ignore_str in str(echo_value) for ignore_str in LOG_IGNORE_ECHO_LIST
             ):
-                logger.info(f"接收到websocket消息: {msg}")
+                # 原始字符串不会被模块修改，可以留给后台线程格式化
+                if raw is not None:
+                    logger.info("接收到websocket消息: %s", raw)
 
-            # 每个 handler 独立异步后台处理
-            for handler in self.handlers:
-                asyncio.create_task(self._safe_handle(handler, websocket, msg))
+            # 只分发给订阅了该事件的 handler，各 handler 并发处理
+            # 等待全部处理完成，使工作协程数量能够限制同时处理的事件数
+            start_time = time.monotonic()
+            await asyncio.gather(
+                *(
+                    self._safe_handle(handler, websocket, msg)
+                    for handler in self.router.route(
+                        msg, include_catch_all=not api_response
+                    )
+                )
+            )
+            metrics.observe(
+                "event_seconds",
+                time.monotonic() - start_time,
+                event=get_event_type(msg),
+            )
 
         except Exception as e:
             logger.error(f"处理websocket消息的逻辑错误: {e}")
@@ -1,8 +1,17 @@
 import logging
 import colorlog
 import os
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timezone, timedelta
 
+# 日志队列的最大长度，队列满时丢弃新的日志并计数，不阻塞事件循环
+LOG_QUEUE_SIZE = 10000
+
+# 可以留给后台线程格式化的日志参数类型
+IMMUTABLE_ARG_TYPES = (str, bytes, int, float, bool, type(None))
+
 
 # 自定义SUCCESS日志级别 (在INFO和WARNING之间)
 SUCCESS = 25  # INFO是20，WARNING是30
@@ -32,6 +41,60 @@ setattr(logging.Logger, "success", _logger_success)
 setattr(logging.Logger, "napcat", _logger_napcat)
 
 
+class DroppingQueueHandler(QueueHandler):
+    """
+    将日志放入有界队列，由后台线程格式化并写入控制台和文件
+    队列满时丢弃新的日志并计数，恢复后补记一条警告说明丢弃的数量
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        # 累计丢弃的日志数量
+        self.dropped = 0
+        # 尚未在日志中说明的丢弃数量
+        self._unreported = 0
+
+    def prepare(self, record):
+        # 参数都是不可变类型时留给后台线程格式化，
+        # 否则（如事件字典）在调用线程格式化，避免后台线程格式化时对象已被修改
+        if record.args and not (
+            isinstance(record.args, tuple)
+            and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in record.args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self._unreported:
+                self.queue.put_nowait(
+                    logging.LogRecord(
+                        "root",
+                        logging.WARNING,
+                        __file__,
+                        0,
+                        f"日志队列已满，丢弃了 {self._unreported} 条日志",
+                        None,
+                        None,
+                    )
+                )
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+class BlockingStopQueueListener(QueueListener):
+    """
+    停止时阻塞等待放入结束标记，队列满时也能处理完剩余的日志后退出
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
 class Logger:
     def __init__(self, logs_dir="logs", console_level="INFO"):
         self.root_logger = logging.getLogger()
@@ -41,26 +104,39 @@ class Logger:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         self.logs_dir = logs_dir or os.path.join(current_dir, "logs")
         self.log_filename = None
+        self.console_handler = None
+        self.queue_handler = None
+        self._listener = None
 
         # 初始化时自动设置
         self.setup()
+        # 退出时写完队列中剩余的日志
+        atexit.register(self.shutdown)
 
     def setup(self):
-        """设置日志器"""
-        # 清除之前的处理器
+        """
+        设置日志器
+        根日志记录器只挂载队列处理器，控制台和文件处理器在后台线程中执行，
+        格式化和写入不占用事件循环
+        """
+        # 停止之前的后台线程并清除之前的处理器
+        self.shutdown()
         self.root_logger.handlers = []
 
         # 创建控制台和文件处理器
         console_handler, file_handler = self._create_handlers()
+        self.console_handler = console_handler
+
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        self.queue_handler = DroppingQueueHandler(log_queue)
+        self._listener = BlockingStopQueueListener(
+            log_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        self._listener.start()
 
         # 设置根日志记录器的级别为DEBUG（最低级别，确保所有日志都能被记录）
         self.root_logger.setLevel(logging.DEBUG)
-        self.root_logger.addHandler(console_handler)
-        self.root_logger.addHandler(file_handler)
-
-        # 确保日志及时刷新
-        for handler in self.root_logger.handlers:
-            handler.flush()
+        self.root_logger.addHandler(self.queue_handler)
 
         self.success(f"初始化日志器，日志文件名: {self.log_filename}")
 
@@ -113,35 +189,53 @@ class Logger:
 
         return console_handler, file_handler
 
+    def shutdown(self):
+        """
+        停止后台线程，等待队列中剩余的日志写入完成，可以重复调用
+        """
+        if self._listener is None:
+            return
+        listener, self._listener = self._listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+
+    @property
+    def dropped(self):
+        """
+        因队列满而丢弃的日志数量
+        """
+        return self.queue_handler.dropped if self.queue_handler else 0
+
     # 便捷日志方法
-    def debug(self, message):
-        logging.debug(message)
+    # 带参数时使用%格式，参数都是字符串、数字时在后台线程格式化，适合内容较大的日志
+    def debug(self, message, *args):
+        logging.debug(message, *args)
 
-    def info(self, message):
-        logging.info(message)
+    def info(self, message, *args):
+        logging.info(message, *args)
 
-    def warning(self, message):
-        logging.warning(message)
+    def warning(self, message, *args):
+        logging.warning(message, *args)
 
-    def error(self, message):
-        logging.error(message)
+    def error(self, message, *args):
+        logging.error(message, *args)
 
-    def critical(self, message):
-        logging.critical(message)
+    def critical(self, message, *args):
+        logging.critical(message, *args)
 
-    def success(self, message):
-        logging.log(SUCCESS, message)
+    def success(self, message, *args):
+        logging.log(SUCCESS, message, *args)
 
-    def napcat(self, message):
-        logging.log(NAPCAT, message)
+    def napcat(self, message, *args):
+        logging.log(NAPCAT, message, *args)
 
     def set_console_level(self, level):
         """动态设置控制台日志级别"""
         self.console_level = level
         # 只更新控制台处理器的级别，文件处理器保持DEBUG
-        for handler in self.root_logger.handlers:
-            if isinstance(handler, colorlog.StreamHandler):
-                handler.setLevel(level)
+        if self.console_handler is not None:
+            self.console_handler.setLevel(level)
 
     def set_level(self, level):
         """为了向后兼容保留的方法，实际调用set_console_level"""
@@ -153,32 +247,32 @@ logger = Logger()
 
 
 # 便捷函数，使调用更简单
-def debug(message):
-    logger.debug(message)
+def debug(message, *args):
+    logger.debug(message, *args)
 
 
-def info(message):
-    logger.info(message)
+def info(message, *args):
+    logger.info(message, *args)
 
 
-def warning(message):
-    logger.warning(message)
+def warning(message, *args):
+    logger.warning(message, *args)
 
 
-def error(message):
-    logger.error(message)
+def error(message, *args):
+    logger.error(message, *args)
 
 
-def critical(message):
-    logger.critical(message)
+def critical(message, *args):
+    logger.critical(message, *args)
 
 
-def success(message):
-    logger.success(message)
+def success(message, *args):
+    logger.success(message, *args)
 
 
-def napcat(message):
-    logger.napcat(message)
+def napcat(message, *args):
+    logger.napcat(message, *args)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,20 @@ import asyncio
 from datetime import datetime
 from logger import logger
 from bot import connect_to_bot
-from config import OWNER_ID, WS_URL, TOKEN, FEISHU_BOT_URL, FEISHU_BOT_SECRET
+from handle_events import EventHandler
+from utils.metrics import start_metrics_server
+from config import (
+    OWNER_ID,
+    WS_URL,
+    TOKEN,
+    FEISHU_BOT_URL,
+    FEISHU_BOT_SECRET,
+    RECONNECT_MIN_DELAY,
+    RECONNECT_MAX_DELAY,
+    RECONNECT_RESET_AFTER,
+    METRICS_HTTP_HOST,
+    METRICS_HTTP_PORT,
+)
 
 
 def verify_config():
@@ -45,19 +58,39 @@ class Application:
         """运行主程序"""
         # 打印当前运行根目录
         logger.success(f"当前运行根目录: {os.getcwd()}")
+
+        # 模块只在启动时加载一次，重连时复用
+        handler = EventHandler()
+        handler.start_watchdog()
+
+        # 开启指标HTTP接口
+        if METRICS_HTTP_PORT:
+            await start_metrics_server(METRICS_HTTP_HOST, METRICS_HTTP_PORT)
+
+        retry_delay = RECONNECT_MIN_DELAY
         while True:
             try:
-                result = await connect_to_bot()
-                if result is None:
+                connected_seconds = await connect_to_bot(handler)
+                if connected_seconds is None:
                     raise ValueError("连接返回None")
+                # 连接保持足够久才恢复初始重连间隔，连接反复闪断时继续退避
+                if connected_seconds >= RECONNECT_RESET_AFTER:
+                    retry_delay = RECONNECT_MIN_DELAY
+                logger.warning(
+                    f"连接已断开，持续 {connected_seconds:.0f} 秒，{retry_delay:g} 秒后重连"
+                )
             except KeyboardInterrupt:
                 logger.error("检测到用户主动退出程序（Ctrl+C），程序已终止。")
                 break
             except Exception as e:
                 current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                logger.error(f"连接失败，正在重试: {e} 当前时间: {current_time}")
+                logger.error(
+                    f"连接失败，{retry_delay:g} 秒后重试: {e} 当前时间: {current_time}"
+                )
 
-                await asyncio.sleep(2)  # 每2秒重试一次
+            await asyncio.sleep(retry_delay)
+            # 指数退避
+            retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
 
 
 if __name__ == "__main__":
@@ -14,12 +14,32 @@ DATA_DIR = os.path.join("data", MODULE_NAME)
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
+# 订阅的事件，未声明则接收所有事件
+# 群消息和群通知只在本群开启开关时分发，开关命令和菜单命令不受影响
+SWITCH_GATE = (MODULE_NAME, SWITCH_NAME)
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "meta_event"},
+    {"post_type": "message"},
+    {"post_type": "message", "message_type": "group", "switch": SWITCH_GATE},
+    {"post_type": "notice"},
+    *(
+        {"post_type": "notice", "notice_type": notice_type, "switch": SWITCH_GATE}
+        for notice_type in (
+            "group_admin",
+            "group_ban",
+            "group_card",
+            "group_decrease",
+            "group_increase",
+            "group_recall",
+            "group_upload",
+        )
+    ),
+    {"post_type": "request"},
+]
+
 # 模块的一些命令可以在这里定义，方便在其他地方调用，提高代码的复用率
 # ------------------------------------------------------------
 
-# 转发消息给owner的标志，用于响应函数提取
-FORWARD_MESSAGE_TO_OWNER = "forward_message_to_owner"
-
 AUTO_AGREE_FRIEND_VERIFY = "自动同意好友验证"
 TEST_COMMAND = "测试"
 
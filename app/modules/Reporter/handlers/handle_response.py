@@ -1,4 +1,4 @@
-from .. import MODULE_NAME, FORWARD_MESSAGE_TO_OWNER
+from .. import MODULE_NAME
 import logger
 import re
 from api.user import set_friend_add_request, set_group_add_request
@@ -16,26 +16,12 @@ class ResponseHandler:
         self.data = msg.get("data", {})
         self.echo = msg.get("echo", {})
 
-    async def handle(self):
-        try:
-            # 处理获取消息详情的响应
-            if (
-                isinstance(self.echo, str)
-                and self.echo.startswith("get_msg-")
-                and MODULE_NAME in self.echo
-            ):
-                await self._handle_request_response()
-
-            # 处理转发消息给owner的响应
-            if isinstance(self.echo, str) and self.echo.startswith(
-                f"send_private_msg-{MODULE_NAME}-{FORWARD_MESSAGE_TO_OWNER}"
-            ):
-                await self._handle_forward_message_to_owner()
-        except Exception as e:
-            logger.error(f"[{MODULE_NAME}]处理响应失败: {e}")
-
-    async def _handle_request_response(self):
-        """处理请求响应"""
+    async def handle_request_response(self, action, operate_user_id):
+        """
+        处理获取被回复消息详情的响应，同意或拒绝消息中的请求
+        action: 同意/拒绝
+        operate_user_id: 操作者QQ号
+        """
         try:
             # 获取原始消息内容
             message_data = self.data
@@ -44,22 +30,12 @@ class ResponseHandler:
             # 正则提取信息
             request_type_pattern = r"request_type=(friend|group)"
             flag_pattern = r"flag=(\d+)"
-            action_pattern = r"action=([^-\s]+)"
-            operate_user_id_pattern = r"operate_user_id=(\d+)"
 
             # 在原始消息执行正则匹配
             request_type_match = re.search(request_type_pattern, raw_message)
             flag_match = re.search(flag_pattern, raw_message)
 
-            # 在echo正则
-            action_match = re.search(action_pattern, self.echo)
-            operate_user_id_match = re.search(operate_user_id_pattern, self.echo)
-
             # 提取匹配结果
-            if operate_user_id_match:
-                operate_user_id = operate_user_id_match.group(1)
-            if action_match:
-                action = action_match.group(1)
             if request_type_match:
                 request_type = request_type_match.group(1)
             if flag_match:
@@ -95,30 +71,16 @@ class ResponseHandler:
         except Exception as e:
             logger.error(f"[{MODULE_NAME}]处理请求响应失败: {e}")
 
-    async def _handle_forward_message_to_owner(self):
-        """处理转发消息给owner的响应"""
+    async def handle_forward_message_to_owner(self, user_id, original_message_id):
+        """
+        处理转发消息给owner的响应，记录转发消息ID与原始消息的映射
+        user_id: 原始消息发送者QQ号
+        original_message_id: 原始消息ID
+        """
         try:
             # 获取转发消息id
             forwarded_message_id = self.data.get("message_id", "")
 
-            # 正则提取发送者id和原始消息id
-            user_id_pattern = r"user_id=(\d+)"
-            original_message_id_pattern = r"original_message_id=(\d+)"
-
-            # 在echo字段执行正则匹配
-            user_id_match = re.search(user_id_pattern, self.echo)
-            original_message_id_match = re.search(
-                original_message_id_pattern, self.echo
-            )
-
-            # 提取匹配结果
-            user_id = user_id_match.group(1) if user_id_match else None
-            original_message_id = (
-                original_message_id_match.group(1)
-                if original_message_id_match
-                else None
-            )
-
             # 检查必要参数
             if not (user_id and original_message_id and forwarded_message_id):
                 logger.error(
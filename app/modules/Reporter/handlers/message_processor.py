@@ -1,13 +1,13 @@
 import re
 import os
 import json
-import asyncio
 import logger
-from .. import MODULE_NAME, AUTO_AGREE_FRIEND_VERIFY, DATA_DIR, FORWARD_MESSAGE_TO_OWNER
+from .. import MODULE_NAME, AUTO_AGREE_FRIEND_VERIFY, DATA_DIR
 from config import OWNER_ID
 from api.message import send_private_msg, send_private_msg_with_cq, get_msg
 from utils.generate import generate_reply_message, generate_text_message
 from .data_manager import DataManager
+from .handle_response import ResponseHandler
 
 
 class MessageProcessor:
@@ -64,9 +64,12 @@ class MessageProcessor:
                     f"[{MODULE_NAME}]检测到请求处理: {action}, 回复消息ID: {reply_msg_id}"
                 )
 
-                # 发送获取消息详情的API请求
-                note = f"{MODULE_NAME}-action={action}-operate_user_id={self.user_id}"
-                await get_msg(self.websocket, reply_msg_id, note)
+                # 获取被回复消息的详情，根据其中的请求参数执行操作
+                response = await get_msg(self.websocket, reply_msg_id, MODULE_NAME)
+                if response and response.get("status") == "ok":
+                    await ResponseHandler(
+                        self.websocket, response
+                    ).handle_request_response(action, self.user_id)
                 return True
         return False
 
@@ -175,15 +178,9 @@ class MessageProcessor:
                     )
                 ],
             )
-            await asyncio.sleep(0.4)
 
         # 发送消息内容
-        await send_private_msg(
-            self.websocket,
-            OWNER_ID,
-            self.message,
-            note=f"{MODULE_NAME}-{FORWARD_MESSAGE_TO_OWNER}-user_id={self.user_id}-original_message_id={self.message_id}",
-        )
+        response = await send_private_msg(self.websocket, OWNER_ID, self.message)
 
         # 存储消息映射关系（发送者ID, 原始消息ID）
         with DataManager() as data_manager:
@@ -194,6 +191,12 @@ class MessageProcessor:
                 f"[{MODULE_NAME}]已存储上报消息映射：发送者ID={self.user_id}, 原始消息ID={self.message_id}"
             )
 
+        # 记录转发后的消息ID
+        if response and response.get("status") == "ok":
+            await ResponseHandler(
+                self.websocket, response
+            ).handle_forward_message_to_owner(self.user_id, self.message_id)
+
         # 更新上次发送消息的用户ID
         MessageProcessor._last_user_id = self.user_id
 
@@ -4,7 +4,6 @@ from .handlers.handle_meta_event import MetaEventHandler
 from .handlers.handle_message import MessageHandler
 from .handlers.handle_notice import NoticeHandler
 from .handlers.handle_request import RequestHandler
-from .handlers.handle_response import ResponseHandler
 
 
 async def handle_events(websocket, msg):
@@ -17,12 +16,6 @@ async def handle_events(websocket, msg):
         msg: 接收到的消息字典
     """
     try:
-
-        # 处理回应事件
-        if msg.get("status") == "ok":
-            await ResponseHandler(websocket, msg).handle()
-            return
-
         # 基于事件类型分发到不同的处理器
         post_type = msg.get("post_type", "")
 
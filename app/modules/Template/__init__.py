@@ -15,6 +15,42 @@ DATA_DIR = os.path.join("data", MODULE_NAME)
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
+# 订阅的事件，只有匹配的事件会分发到本模块，未声明则接收所有事件
+# 支持按 post_type 及其细分类型（message_type/notice_type/request_type/meta_event_type）订阅
+# 如需处理API响应，请添加 {"echo": "echo前缀"}
+# 订阅中声明 "switch": (模块名称, 开关名称) 后，带群号的事件只在本群开启了模块开关时分发，
+# 开关命令和菜单命令不受影响，同一事件匹配多条订阅时以细分类型的订阅为准
+SWITCH_GATE = (MODULE_NAME, SWITCH_NAME)
+EVENT_SUBSCRIPTIONS = [
+    {"post_type": "meta_event"},
+    {"post_type": "message"},
+    {"post_type": "message", "message_type": "group", "switch": SWITCH_GATE},
+    {"post_type": "notice"},
+    *(
+        {"post_type": "notice", "notice_type": notice_type, "switch": SWITCH_GATE}
+        for notice_type in (
+            "group_admin",
+            "group_ban",
+            "group_card",
+            "group_decrease",
+            "group_increase",
+            "group_recall",
+            "group_upload",
+        )
+    ),
+    {"post_type": "request"},
+]
+
+# 处理单条消息的超时时间（秒），超时后取消处理，未声明则使用全局配置 HANDLER_TIMEOUT
+# 多次超时或阻塞事件循环的模块会被暂时熔断，耗时操作请放到后台任务或线程中执行
+# HANDLER_TIMEOUT = 60
+
+# 定时任务，连接到机器人期间按时执行，不依赖事件触发，格式见 utils/scheduler.py
+# func 为异步函数，参数为 websocket，interval（秒）和 cron（分 时 日 月 周）二选一
+# SCHEDULED_JOBS = [
+#     {"name": "daily_report", "func": daily_report, "cron": "0 8 * * *", "jitter": 60},
+# ]
+
 # 模块的一些命令可以在这里定义，方便在其他地方调用，提高代码的复用率
 # ------------------------------------------------------------
 
@@ -13,8 +13,11 @@ LOGS_DIR = "logs"
 # 天数
 DAYS = 4
 
+# 检查间隔，单位：秒
+CHECK_INTERVAL = 3600
 
-async def clean_logs(websocket, msg):
+
+async def clean_logs(websocket):
     """清理日志"""
     if not os.path.exists(LOGS_DIR):
         return
@@ -48,3 +51,9 @@ async def clean_logs(websocket, msg):
             OWNER_ID,
             f"已删除过期日志文件: \n{deleted_files_str}",
         )
+
+
+# 每小时检查一次过期日志
+SCHEDULED_JOBS = [
+    {"name": "clean_logs", "func": clean_logs, "interval": CHECK_INTERVAL},
+]
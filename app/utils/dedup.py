@@ -0,0 +1,106 @@
+"""
+事件去重
+NapCat重连后可能重复推送消息和通知事件，按事件指纹在有效期内只处理一次
+记录按写入顺序保存，有效期相同，因此最早写入的记录总是最先过期，过期清理和查询均为O(1)
+"""
+
+import time
+from collections import OrderedDict
+from config import EVENT_DEDUP_TTL, EVENT_DEDUP_SIZE
+
+# 指纹中使用的事件字段
+FINGERPRINT_FIELDS = (
+    "time",
+    "group_id",
+    "user_id",
+    "operator_id",
+    "target_id",
+    "message_id",
+    "flag",
+)
+
+# 细分事件类型字段
+DETAIL_TYPE_FIELDS = ("message_type", "notice_type", "request_type", "sub_type")
+
+
+def get_event_fingerprint(msg):
+    """
+    获取事件指纹
+    消息事件使用message_id，通知和请求事件使用事件类型、时间及相关ID组合
+    元事件（心跳、生命周期）和API响应不去重，返回None
+    """
+    post_type = msg.get("post_type")
+    if post_type in ("message", "message_sent"):
+        message_id = msg.get("message_id")
+        if message_id is not None:
+            return (post_type, msg.get("self_id"), message_id)
+    if post_type not in ("message", "message_sent", "notice", "request"):
+        return None
+    return (
+        post_type,
+        msg.get("self_id"),
+        *(msg.get(field) for field in DETAIL_TYPE_FIELDS),
+        *(msg.get(field) for field in FINGERPRINT_FIELDS),
+    )
+
+
+class EventDeduplicator:
+    """
+    有界的事件去重缓存
+    ttl: 记录有效期，单位：秒，小于等于0时不去重
+    maxsize: 最多保存的记录数，超出时淘汰最早的记录
+    """
+
+    def __init__(self, ttl=EVENT_DEDUP_TTL, maxsize=EVENT_DEDUP_SIZE):
+        self.ttl = ttl
+        self.maxsize = max(1, maxsize)
+        # 指纹 -> 过期时间
+        self._seen = OrderedDict()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def is_duplicate(self, msg):
+        """
+        判断事件是否重复，不重复时记录该事件
+        """
+        if self.ttl <= 0:
+            return False
+        fingerprint = get_event_fingerprint(msg)
+        if fingerprint is None:
+            return False
+
+        now = time.monotonic()
+        self._expire(now)
+        if fingerprint in self._seen:
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        self._seen[fingerprint] = now + self.ttl
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        return False
+
+    def _expire(self, now):
+        """
+        清理已过期的记录
+        """
+        while self._seen:
+            fingerprint, expire_at = next(iter(self._seen.items()))
+            if expire_at > now:
+                break
+            del self._seen[fingerprint]
+
+    def stats(self):
+        """
+        获取去重统计信息
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._seen),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+        }
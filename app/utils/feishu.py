@@ -7,6 +7,9 @@ import json
 import logger
 from config import FEISHU_BOT_URL, FEISHU_BOT_SECRET
 
+# 请求超时时间，单位：秒
+FEISHU_REQUEST_TIMEOUT = 10
+
 
 def send_feishu_msg(title: str, content: str) -> dict:
     """
@@ -58,7 +61,12 @@ def send_feishu_msg(title: str, content: str) -> dict:
         if not isinstance(FEISHU_BOT_URL, str):
             logger.error(f"飞书webhook未配置")
             return {"error": "飞书webhook未配置"}
-        response = requests.post(FEISHU_BOT_URL, headers=headers, data=json.dumps(msg))
+        response = requests.post(
+            FEISHU_BOT_URL,
+            headers=headers,
+            data=json.dumps(msg),
+            timeout=FEISHU_REQUEST_TIMEOUT,
+        )
         logger.info(f"飞书发送通知消息成功🎉\n{response.json()}")
         return response.json()
     except Exception as e:
@@ -0,0 +1,281 @@
+"""
+运行指标
+记录各模块处理耗时、各类事件处理耗时、API调用耗时的直方图，以及事件、API调用、错误计数
+直方图使用固定分桶，内存占用固定，分位数按分桶线性插值估算
+可以通过管理员私聊命令查看，也可以开启本地HTTP接口以Prometheus文本格式导出
+"""
+
+import time
+import asyncio
+from bisect import bisect_left
+import logger
+
+# 直方图分桶上界，单位：秒
+HISTOGRAM_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+# Prometheus指标名前缀
+METRIC_PREFIX = "w1ndysbot_"
+
+
+class Histogram:
+    """
+    固定分桶直方图
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        # 最后一个分桶为+Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """
+        记录一次耗时，单位：秒
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        估算分位数，q取值0~1
+        """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+
+class Metrics:
+    """
+    指标注册表
+    指标以 (名称, 标签) 为键，标签为排序后的 (键, 值) 元组
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        # 名称 -> 返回当前值的函数
+        self.gauges = {}
+        self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """
+        计数器增加
+        """
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        记录一次耗时到直方图，单位：秒
+        """
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def register_gauge(self, name, func):
+        """
+        注册一个即时值指标，同名指标会被替换
+        func: 无参数函数，返回当前值
+        """
+        self.gauges[name] = func
+
+    def get_counter(self, name, **labels):
+        """
+        获取计数器的值，不指定标签时返回该名称下所有标签的合计
+        """
+        if labels:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+        return sum(
+            value
+            for (counter_name, _), value in self.counters.items()
+            if counter_name == name
+        )
+
+    def get_gauges(self):
+        """
+        获取所有即时值指标的当前值
+        """
+        values = {}
+        for name, func in self.gauges.items():
+            try:
+                values[name] = func()
+            except Exception as e:
+                logger.error(f"[Metrics]获取指标 {name} 失败: {e}")
+        return values
+
+    def render_prometheus(self):
+        """
+        以Prometheus文本格式导出所有指标
+        """
+        lines = []
+
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+            lines.append(f"{METRIC_PREFIX}{name}{_format_labels(labels)} {value}")
+
+        for name, value in sorted(self.get_gauges().items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+            lines.append(f"{METRIC_PREFIX}{name} {value}")
+
+        typed = set()
+        for (name, labels), histogram in sorted(
+            self.histograms.items(), key=lambda item: item[0]
+        ):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+            cumulative = 0
+            for upper, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + (("le", f"{upper:g}"),))
+                lines.append(
+                    f"{METRIC_PREFIX}{name}_bucket{bucket_labels} {cumulative}"
+                )
+            bucket_labels = _format_labels(labels + (("le", "+Inf"),))
+            lines.append(
+                f"{METRIC_PREFIX}{name}_bucket{bucket_labels} {histogram.count}"
+            )
+            lines.append(
+                f"{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}"
+            )
+            lines.append(
+                f"{METRIC_PREFIX}{name}_count{_format_labels(labels)} {histogram.count}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def format_report(self, top=10):
+        """
+        生成指标报告文本，各直方图按p95从大到小取前top项
+        """
+        uptime = int(time.time() - self.started_at)
+        report = (
+            f"📊 运行指标（已运行 {uptime // 3600}小时{uptime % 3600 // 60}分钟）\n\n"
+        )
+
+        report += (
+            f"事件：接收 {self.get_counter('events_received_total')}，"
+            f"处理 {self.get_counter('events_processed_total')}，"
+            f"丢弃 {self.get_counter('events_dropped_total')}\n"
+            f"API调用：{self.get_counter('api_calls_total')}，"
+            f"失败 {self.get_counter('api_errors_total')}\n"
+            f"模块错误：{self.get_counter('handler_errors_total')}\n"
+        )
+        gauges = self.get_gauges()
+        if gauges:
+            report += "当前：" + "，".join(
+                f"{name} {value}" for name, value in sorted(gauges.items())
+            )
+            report += "\n"
+
+        for name, title in (
+            ("handler_seconds", "模块耗时"),
+            ("event_seconds", "事件耗时"),
+            ("api_call_seconds", "API耗时"),
+            ("job_seconds", "定时任务耗时"),
+        ):
+            rows = [
+                (labels, histogram)
+                for (histogram_name, labels), histogram in self.histograms.items()
+                if histogram_name == name
+            ]
+            if not rows:
+                continue
+            rows.sort(key=lambda row: row[1].quantile(0.95), reverse=True)
+            report += f"\n{title}（p50/p95/p99，毫秒）：\n"
+            for labels, histogram in rows[:top]:
+                label_text = ",".join(str(value) for _, value in labels)
+                report += (
+                    f"{label_text} n={histogram.count} "
+                    f"{histogram.quantile(0.5) * 1000:.1f}/"
+                    f"{histogram.quantile(0.95) * 1000:.1f}/"
+                    f"{histogram.quantile(0.99) * 1000:.1f}\n"
+                )
+
+        return report
+
+
+def _format_labels(labels):
+    """
+    格式化Prometheus标签
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+async def start_metrics_server(host, port):
+    """
+    启动本地HTTP接口，在 /metrics 以Prometheus文本格式导出指标
+    依赖aiohttp，未安装时跳过
+    """
+    try:
+        from aiohttp import web
+    except ImportError:
+        logger.warning("[Metrics]未安装aiohttp，无法开启指标HTTP接口")
+        return None
+
+    async def handle_metrics(request):
+        return web.Response(
+            text=metrics.render_prometheus(),
+            content_type="text/plain",
+            charset="utf-8",
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"[Metrics]指标HTTP接口启动失败: {e}")
+        await runner.cleanup()
+        return None
+    logger.success(f"[Metrics]指标HTTP接口已启动: http://{host}:{port}/metrics")
+    return runner
+
+
+# 全局指标实例
+metrics = Metrics()
+metrics.register_gauge("asyncio_tasks", lambda: len(asyncio.all_tasks()))
+metrics.register_gauge("log_records_dropped", lambda: logger.logger.dropped)
@@ -0,0 +1,416 @@
+"""
+定时任务调度
+模块可以在模块文件（核心模块）或模块包的__init__.py中声明 SCHEDULED_JOBS 注册定时任务，格式如：
+SCHEDULED_JOBS = [
+    # 每300秒执行一次，连接后立即执行第一次
+    {"name": "refresh", "func": refresh, "interval": 300},
+    # cron表达式：分 时 日 月 周，每天4点执行，随机延迟0~60秒
+    {"name": "daily", "func": daily, "cron": "0 4 * * *", "jitter": 60},
+    # 连接后立即执行第一次，之后每次执行结束时调用 get_delay() 获取距离下一次执行的秒数
+    {"name": "renew", "func": renew, "delay": get_delay},
+]
+func: 异步函数，参数为当前的websocket连接
+interval/cron/delay: 三选一，interval单位为秒，delay为返回秒数的同步函数，
+    适合按数据的过期时间安排下一次执行
+jitter: 每次执行随机延迟的最大秒数，避免多个任务同时执行，默认0
+misfire: 任务错过执行时间（断线、事件循环阻塞）时的处理策略，默认 run_once
+    run_once: 恢复后立即补执行一次，错过多次也只执行一次
+    skip: 延迟超过 misfire_grace 秒时跳过本次，等待下一次
+misfire_grace: skip策略允许的最大延迟，单位：秒，默认60
+timeout: 单次执行的超时时间，单位：秒，默认不限制
+
+只有一个调度协程，睡眠到最早的执行时间，与事件数量无关
+同一任务上一次执行尚未结束时跳过本次执行，不会并发执行
+只在连接到机器人时执行任务，断线期间到期的任务按misfire策略处理，
+断线时正在执行的任务会被取消，重连后重新执行
+"""
+
+import time
+import random
+import asyncio
+from datetime import datetime, timedelta
+import logger
+from utils.metrics import metrics
+
+MISFIRE_RUN_ONCE = "run_once"
+MISFIRE_SKIP = "skip"
+
+# cron各字段的取值范围：分、时、日、月、周（0和7都表示周日）
+CRON_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_cron_field(field, low, high):
+    """
+    解析cron的单个字段，支持 * 数字 a-b 列表 以及 /步长
+    返回值: 允许的取值集合
+    """
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"步长必须大于0: {field}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            # 单个数字带步长表示从该值到最大值
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"取值超出范围 {low}-{high}: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronTrigger:
+    """
+    cron触发器，表达式为5个字段：分 时 日 月 周
+    日和周都不是 * 时，满足其中之一即可（与标准cron相同）
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron表达式需要5个字段: {expression}")
+        self.expression = expression
+        (
+            self.minutes,
+            self.hours,
+            self.days,
+            self.months,
+            weekdays,
+        ) = (
+            _parse_cron_field(field, low, high)
+            for field, (low, high) in zip(fields, CRON_FIELD_RANGES)
+        )
+        # 统一为 datetime.weekday() 的取值，周一为0
+        self.weekdays = {(weekday - 1) % 7 for weekday in weekdays}
+        self.day_restricted = fields[2] != "*"
+        self.weekday_restricted = fields[4] != "*"
+
+    def _match_day(self, moment):
+        day_match = moment.day in self.days
+        weekday_match = moment.weekday() in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_time(self, now):
+        """
+        获取now之后的下一次执行时间（时间戳）
+        """
+        moment = datetime.fromtimestamp(now).replace(second=0, microsecond=0)
+        moment += timedelta(minutes=1)
+        # 最多向后查找5年，日期不存在（如2月30日）时返回None
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+                continue
+            if not self._match_day(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+                continue
+            if moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+                continue
+            return moment.timestamp()
+        return None
+
+    def first_time(self, now):
+        return self.next_time(now)
+
+
+class IntervalTrigger:
+    """
+    固定间隔触发器，连接后立即执行第一次
+    """
+
+    def __init__(self, interval):
+        if interval <= 0:
+            raise ValueError(f"执行间隔必须大于0: {interval}")
+        self.interval = interval
+
+    def next_time(self, now):
+        return now + self.interval
+
+    def first_time(self, now):
+        return now
+
+
+class DelayTrigger:
+    """
+    由函数计算间隔的触发器，连接后立即执行第一次，每次执行结束后才计算下一次执行时间
+    """
+
+    # 执行期间不安排下一次执行，由调度器在执行结束后调用 next_time
+    after_run = True
+
+    def __init__(self, delay_func):
+        if not callable(delay_func):
+            raise ValueError(f"delay需要是返回秒数的函数: {delay_func}")
+        self.delay_func = delay_func
+
+    def next_time(self, now):
+        return now + max(0, self.delay_func())
+
+    def first_time(self, now):
+        return now
+
+
+class Job:
+    """
+    定时任务
+    """
+
+    def __init__(
+        self,
+        name,
+        func,
+        trigger,
+        jitter=0,
+        misfire=MISFIRE_RUN_ONCE,
+        misfire_grace=60,
+        timeout=None,
+    ):
+        if misfire not in (MISFIRE_RUN_ONCE, MISFIRE_SKIP):
+            raise ValueError(f"未知的misfire策略: {misfire}")
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.jitter = jitter
+        self.misfire = misfire
+        self.misfire_grace = misfire_grace
+        self.timeout = timeout
+        # 下一次执行时间（时间戳），None表示不再执行
+        self.next_run = None
+        # 正在执行的任务，用于保证同一任务不并发执行
+        self.task = None
+
+        # 统计信息
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_run = None
+
+    def schedule(self, now, first=False):
+        """
+        计算下一次执行时间
+        """
+        next_run = (
+            self.trigger.first_time(now) if first else self.trigger.next_time(now)
+        )
+        if next_run is not None and self.jitter > 0:
+            next_run += random.uniform(0, self.jitter)
+        self.next_run = next_run
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+
+class JobScheduler:
+    """
+    定时任务调度器
+    """
+
+    def __init__(self):
+        # 任务名称 -> 任务
+        self.jobs = {}
+        # 当前连接，断线时为None，暂停执行任务
+        self.websocket = None
+        self._wakeup = None
+        self._task = None
+        metrics.register_gauge(
+            "jobs_running", lambda: sum(job.running for job in self.jobs.values())
+        )
+
+    def add_job(self, name, func, interval=None, cron=None, delay=None, **options):
+        """
+        注册定时任务，同名任务会被替换
+        options: jitter、misfire、misfire_grace、timeout，见模块说明
+        """
+        if [interval, cron, delay].count(None) != 2:
+            raise ValueError(
+                f"定时任务 {name} 需要且只能设置 interval、cron 或 delay 其中之一"
+            )
+        if interval is not None:
+            trigger = IntervalTrigger(interval)
+        elif cron is not None:
+            trigger = CronTrigger(cron)
+        else:
+            trigger = DelayTrigger(delay)
+        job = Job(name, func, trigger, **options)
+        job.schedule(time.time(), first=True)
+        self.jobs[name] = job
+        self._notify()
+        return job
+
+    def add_jobs(self, prefix, declarations):
+        """
+        注册模块声明的 SCHEDULED_JOBS
+        prefix: 模块名称，任务名称为 模块名称.任务名称
+        返回值: 注册失败的任务及原因列表
+        """
+        failed = []
+        for declaration in declarations or []:
+            declaration = dict(declaration)
+            func = declaration.pop("func", None)
+            name = declaration.pop("name", getattr(func, "__name__", "job"))
+            job_name = f"{prefix}.{name}"
+            try:
+                if not asyncio.iscoroutinefunction(func):
+                    raise ValueError("func需要是异步函数")
+                self.add_job(job_name, func, **declaration)
+                logger.success(f"[Scheduler]已注册定时任务: {job_name}")
+            except Exception as e:
+                failed.append((job_name, str(e)))
+                logger.error(f"[Scheduler]注册定时任务 {job_name} 失败: {e}")
+        return failed
+
+    def remove_job(self, name):
+        """
+        移除定时任务，正在执行的不会被取消
+        """
+        self.jobs.pop(name, None)
+        self._notify()
+
+    def bind(self, websocket):
+        """
+        绑定新连接，开始或恢复执行任务
+        """
+        self.websocket = websocket
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._notify()
+
+    def unbind(self):
+        """
+        连接断开，暂停执行任务，取消正在执行的任务并在重连后重新执行
+        """
+        self.websocket = None
+        now = time.time()
+        for job in self.jobs.values():
+            if job.running:
+                job.task.cancel()
+                job.next_run = now
+                logger.info(
+                    f"[Scheduler]连接已断开，定时任务 {job.name} 将在重连后重新执行"
+                )
+
+    def _notify(self):
+        """
+        唤醒调度协程重新计算睡眠时间
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        """
+        调度协程
+        """
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self.websocket is not None:
+                now = time.time()
+                for job in list(self.jobs.values()):
+                    if job.next_run is not None and job.next_run <= now:
+                        self._fire(job, now)
+                next_runs = [
+                    job.next_run
+                    for job in self.jobs.values()
+                    if job.next_run is not None
+                ]
+                if next_runs:
+                    timeout = max(0, min(next_runs) - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, job, now):
+        """
+        执行到期的任务，并计算下一次执行时间
+        """
+        late = now - job.next_run
+        job.schedule(now)
+
+        if job.misfire == MISFIRE_SKIP and late > job.misfire_grace:
+            job.skipped += 1
+            metrics.inc("jobs_skipped_total", job=job.name, reason="misfire")
+            logger.warning(
+                f"[Scheduler]定时任务 {job.name} 延迟 {late:.0f} 秒，跳过本次执行"
+            )
+            return
+        if job.running:
+            job.skipped += 1
+            metrics.inc("jobs_skipped_total", job=job.name, reason="running")
+            logger.warning(
+                f"[Scheduler]定时任务 {job.name} 上一次执行尚未结束，跳过本次执行"
+            )
+            return
+        if getattr(job.trigger, "after_run", False):
+            # 执行结束后再计算下一次执行时间
+            job.next_run = None
+        job.task = asyncio.create_task(self._run_job(job, self.websocket))
+
+    async def _run_job(self, job, websocket):
+        """
+        执行任务，记录耗时和失败次数
+        """
+        job.runs += 1
+        job.last_run = time.time()
+        start_time = time.monotonic()
+        try:
+            if job.timeout:
+                await asyncio.wait_for(job.func(websocket), job.timeout)
+            else:
+                await job.func(websocket)
+        except asyncio.TimeoutError:
+            job.failures += 1
+            metrics.inc("job_errors_total", job=job.name, reason="timeout")
+            logger.error(f"[Scheduler]定时任务 {job.name} 执行超时（{job.timeout}秒）")
+        except Exception as e:
+            job.failures += 1
+            metrics.inc("job_errors_total", job=job.name, reason="error")
+            logger.error(f"[Scheduler]定时任务 {job.name} 执行失败: {e}")
+        finally:
+            metrics.observe("job_seconds", time.monotonic() - start_time, job=job.name)
+        # 被取消（断线）时不执行到这里，重连后按 unbind 安排的时间重新执行
+        if getattr(job.trigger, "after_run", False):
+            try:
+                job.schedule(time.time())
+            except Exception as e:
+                logger.error(
+                    f"[Scheduler]计算定时任务 {job.name} 下一次执行时间失败: {e}"
+                )
+            self._notify()
+
+    def stats(self):
+        """
+        获取各任务的统计信息
+        """
+        now = time.time()
+        return {
+            name: {
+                "next_run_in": (
+                    round(job.next_run - now, 1) if job.next_run is not None else None
+                ),
+                "running": job.running,
+                "runs": job.runs,
+                "failures": job.failures,
+                "skipped": job.skipped,
+            }
+            for name, job in self.jobs.items()
+        }
@@ -0,0 +1,161 @@
+"""
+模块看门狗
+LoopWatchdog: 事件循环卡顿监测，事件循环中的协程定时更新心跳时间，独立线程发现心跳长时间未更新时，
+说明事件循环被同步调用阻塞，立即抓取事件循环线程的调用栈记录日志
+ModuleBreaker: 模块熔断，模块在时间窗口内多次超时或阻塞事件循环后暂停分发事件给该模块，冷却后自动恢复
+"""
+
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+import logger
+
+
+class LoopWatchdog:
+    """
+    事件循环卡顿监测
+    threshold: 阻塞超过该时间视为卡顿，单位：秒
+    on_block: 卡顿结束后在事件循环中调用的回调，参数为 (调用栈中的模块名列表，从最内层开始, 阻塞秒数)
+    """
+
+    def __init__(self, threshold, on_block=None):
+        self.threshold = threshold
+        self.on_block = on_block
+        # 心跳间隔
+        self.interval = max(0.05, threshold / 4)
+        self._last_beat = time.monotonic()
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+
+        # 统计信息
+        self.block_count = 0
+        self.max_lag = 0.0
+
+    def start(self):
+        """
+        启动心跳协程和监测线程，需要在事件循环中调用
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.create_task(self._beat())
+        threading.Thread(target=self._monitor, name="LoopWatchdog", daemon=True).start()
+        logger.info(f"[Watchdog]事件循环卡顿监测已启动，阈值: {self.threshold}秒")
+
+    def stop(self):
+        """
+        停止监测
+        """
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _beat(self):
+        """
+        心跳协程
+        """
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _monitor(self):
+        """
+        监测线程，同一次阻塞只记录一次
+        """
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            lag = time.monotonic() - beat - self.interval
+            if lag < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.block_count += 1
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            modules = []
+            while frame is not None:
+                modules.append(frame.f_globals.get("__name__", ""))
+                frame = frame.f_back
+            logger.warning(
+                f"[Watchdog]事件循环已阻塞 {lag:.2f} 秒，事件循环线程调用栈:\n{stack}"
+            )
+            if self.on_block is not None:
+                self._loop.call_soon_threadsafe(self._report_block, modules, beat)
+
+    def _report_block(self, modules, beat):
+        """
+        阻塞结束后在事件循环中回调，此时可以得到完整的阻塞时长
+        """
+        lag = time.monotonic() - beat - self.interval
+        self.max_lag = max(self.max_lag, lag)
+        try:
+            self.on_block(modules, lag)
+        except Exception as e:
+            logger.error(f"[Watchdog]处理事件循环阻塞回调失败: {e}")
+
+
+class ModuleBreaker:
+    """
+    模块熔断
+    threshold: 时间窗口内违规（超时或阻塞事件循环）达到该次数后熔断
+    window: 统计违规次数的时间窗口，单位：秒
+    cooldown: 熔断持续时间，单位：秒
+    """
+
+    def __init__(self, threshold, window, cooldown):
+        self.threshold = max(1, threshold)
+        self.window = window
+        self.cooldown = cooldown
+        # 模块名 -> 违规时间队列
+        self._violations = {}
+        # 模块名 -> 熔断结束时间
+        self._quarantined = {}
+
+    def record_violation(self, name):
+        """
+        记录一次违规
+        返回值: 本次违规是否导致模块被熔断
+        """
+        now = time.monotonic()
+        violations = self._violations.setdefault(name, deque())
+        violations.append(now)
+        while violations and violations[0] <= now - self.window:
+            violations.popleft()
+
+        if len(violations) < self.threshold or self.is_quarantined(name):
+            return False
+        violations.clear()
+        self._quarantined[name] = now + self.cooldown
+        return True
+
+    def is_quarantined(self, name):
+        """
+        模块是否处于熔断状态，冷却结束后自动恢复
+        """
+        until = self._quarantined.get(name)
+        if until is None:
+            return False
+        if time.monotonic() < until:
+            return True
+        del self._quarantined[name]
+        logger.info(f"[Watchdog]模块 {name} 熔断已结束，恢复处理事件")
+        return False
+
+    def stats(self):
+        """
+        获取当前被熔断的模块及剩余秒数
+        """
+        now = time.monotonic()
+        return {
+            name: round(until - now, 1)
+            for name, until in self._quarantined.items()
+            if until > now
+        }